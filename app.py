@@ -1,7 +1,13 @@
+import streamlit as st
+
 from frontend.streamlit_app import main_app
 
 def main():
-    main_app()
+    if st.query_params.get("view") == "instructor":
+        from frontend.instructor import instructor_app
+        instructor_app()
+    else:
+        main_app()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,226 @@
+import os
+import sqlite3
+import threading
+import time
+
+from backend.utils import query_fingerprint
+
+# Progress analytics database (shared by every app process on this machine)
+ANALYTICS_DB_PATH = os.environ.get(
+    'SQLBOMB_ANALYTICS_DB',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'analytics.db')
+)
+
+# Set SQLBOMB_ANALYTICS=0 to stop recording player progress
+ANALYTICS_ENABLED = os.environ.get('SQLBOMB_ANALYTICS', '1') != '0'
+
+# Cohort of players whose link has no ?cohort=
+DEFAULT_COHORT = 'default'
+
+# Longest query text kept for the wrong query list
+MAX_ANALYTICS_QUERY_CHARS = 500
+
+STAGES = (1, 2, 3)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player TEXT PRIMARY KEY,
+    cohort TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    stage INTEGER NOT NULL,
+    stage_started_at REAL NOT NULL,
+    stage_queries INTEGER NOT NULL DEFAULT 0,
+    queries INTEGER NOT NULL DEFAULT 0,
+    completed_at REAL,
+    last_seen REAL NOT NULL
+);
+-- Players still playing, most queries on their current stage first
+CREATE INDEX IF NOT EXISTS idx_players_struggling ON players(cohort, completed_at, stage_queries);
+
+-- Rollups, updated as players progress so page loads never scan the players
+CREATE TABLE IF NOT EXISTS stage_funnel (
+    cohort TEXT NOT NULL,
+    stage INTEGER NOT NULL,
+    reached INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    completion_queries INTEGER NOT NULL DEFAULT 0,  -- queries run on the stage by the players who completed it
+    PRIMARY KEY (cohort, stage)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS solve_times (
+    cohort TEXT NOT NULL,
+    stage INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,  -- solve time between 2^bucket and 2^(bucket+1) seconds
+    players INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort, stage, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS wrong_queries (
+    cohort TEXT NOT NULL,
+    stage INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    query TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort, stage, fingerprint)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_wrong_queries_count ON wrong_queries(cohort, stage, count);
+"""
+
+def solve_time_bucket(seconds):
+    """Histogram bucket of a solve time: floor(log2(seconds)), 0 for anything under 2s"""
+    return max(0, int(seconds).bit_length() - 1)
+
+class AnalyticsStore:
+    """
+    Per-player progress and cohort rollups in a SQLite database in WAL mode.
+    Every event updates the player's row and the rollups in one small
+    transaction; the instructor views only read the rollups and indexes.
+    Only a player's first run through the mission is counted.
+    """
+
+    def __init__(self, path=ANALYTICS_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Databases from before completion_queries existed
+        if 'completion_queries' not in [column[1] for column in conn.execute("PRAGMA table_info(stage_funnel)")]:
+            conn.execute("ALTER TABLE stage_funnel ADD COLUMN completion_queries INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+
+    def _connection(self):
+        # One connection per thread - sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record_start(self, player, cohort=DEFAULT_COHORT, now=None):
+        """A player started the mission"""
+        now = now or time.time()
+        with self._connection() as conn:
+            inserted = conn.execute(
+                "INSERT INTO players (player, cohort, started_at, stage, stage_started_at, last_seen) "
+                "VALUES (?, ?, ?, 1, ?, ?) ON CONFLICT(player) DO NOTHING",
+                (player, cohort, now, now, now)
+            ).rowcount
+            if inserted:
+                self._bump_funnel(conn, cohort, 1, 'reached')
+
+    def record_query(self, player, stage, query, completed, now=None):
+        """A player ran a query on a stage; completed is whether it found the answer"""
+        now = now or time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "UPDATE players SET queries = queries + 1, stage_queries = stage_queries + 1, last_seen = ? "
+                "WHERE player = ? AND stage = ? AND completed_at IS NULL RETURNING cohort",
+                (now, player, stage)
+            ).fetchone()
+            if row and not completed:
+                conn.execute(
+                    "INSERT INTO wrong_queries (cohort, stage, fingerprint, query, count) VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT(cohort, stage, fingerprint) DO UPDATE SET count = count + 1",
+                    (row[0], stage, query_fingerprint(query), query[:MAX_ANALYTICS_QUERY_CHARS])
+                )
+
+    def record_stage_completion(self, player, stage, now=None):
+        """A player verified a stage and moved on"""
+        now = now or time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT cohort, stage_started_at, stage_queries FROM players "
+                "WHERE player = ? AND stage = ? AND completed_at IS NULL",
+                (player, stage)
+            ).fetchone()
+            if not row:
+                return
+            cohort, stage_started_at, stage_queries = row
+            conn.execute(
+                "UPDATE players SET stage = ?, stage_started_at = ?, stage_queries = 0, last_seen = ?, "
+                "completed_at = ? WHERE player = ?",
+                (stage + 1, now, now, now if stage == STAGES[-1] else None, player)
+            )
+            self._bump_funnel(conn, cohort, stage, 'completed')
+            conn.execute(
+                "UPDATE stage_funnel SET completion_queries = completion_queries + ? WHERE cohort = ? AND stage = ?",
+                (stage_queries, cohort, stage)
+            )
+            if stage < STAGES[-1]:
+                self._bump_funnel(conn, cohort, stage + 1, 'reached')
+            conn.execute(
+                "INSERT INTO solve_times (cohort, stage, bucket, players) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(cohort, stage, bucket) DO UPDATE SET players = players + 1",
+                (cohort, stage, solve_time_bucket(now - stage_started_at))
+            )
+
+    def _bump_funnel(self, conn, cohort, stage, column):
+        conn.execute(
+            f"INSERT INTO stage_funnel (cohort, stage, {column}) VALUES (?, ?, 1) "
+            f"ON CONFLICT(cohort, stage) DO UPDATE SET {column} = {column} + 1",
+            (cohort, stage)
+        )
+
+    def cohorts(self):
+        """Cohorts with at least one player"""
+        return [cohort for (cohort,) in self._connection().execute(
+            "SELECT DISTINCT cohort FROM stage_funnel WHERE stage = 1 ORDER BY cohort")]
+
+    def funnel(self, cohort):
+        """Players who reached and completed each stage, and the queries they needed per completion"""
+        rows = self._connection().execute(
+            "SELECT stage, reached, completed, completion_queries FROM stage_funnel WHERE cohort = ? ORDER BY stage",
+            (cohort,)
+        ).fetchall()
+        return [{'stage': stage, 'reached': reached, 'completed': completed,
+                 'queries_per_completion': queries / completed if completed else None}
+                for stage, reached, completed, queries in rows]
+
+    def solve_times(self, cohort):
+        """Solve time histogram per stage: {stage: [(bucket, players), ...]}"""
+        histogram = {stage: [] for stage in STAGES}
+        for stage, bucket, players in self._connection().execute(
+                "SELECT stage, bucket, players FROM solve_times WHERE cohort = ? ORDER BY stage, bucket", (cohort,)):
+            histogram[stage].append((bucket, players))
+        return histogram
+
+    def common_wrong_queries(self, cohort, stage, limit=10):
+        """Most frequent queries that didn't solve a stage"""
+        rows = self._connection().execute(
+            "SELECT query, count FROM wrong_queries WHERE cohort = ? AND stage = ? ORDER BY count DESC LIMIT ?",
+            (cohort, stage, limit)
+        ).fetchall()
+        return [{'query': query, 'count': count} for query, count in rows]
+
+    def struggling_players(self, cohort, limit=20, now=None):
+        """Unfinished players with the most queries on their current stage"""
+        now = now or time.time()
+        rows = self._connection().execute(
+            "SELECT player, stage, stage_queries, stage_started_at, last_seen FROM players "
+            "WHERE cohort = ? AND completed_at IS NULL ORDER BY stage_queries DESC LIMIT ?",
+            (cohort, limit)
+        ).fetchall()
+        return [{'player': player, 'stage': stage, 'queries_on_stage': queries,
+                 'minutes_on_stage': round((now - started) / 60, 1), 'idle_minutes': round((now - seen) / 60, 1)}
+                for player, stage, queries, started, seen in rows]
+
+def histogram_median(buckets):
+    """Approximate median solve time in seconds from (bucket, players) pairs"""
+    total = sum(players for _, players in buckets)
+    seen = 0
+    for bucket, players in buckets:
+        seen += players
+        if seen * 2 >= total:
+            # Geometric middle of the bucket
+            return 2 ** bucket * 1.41
+    return None
+
+_store = None
+
+def get_analytics():
+    """Return the analytics store, or None if analytics are disabled"""
+    global _store
+    if _store is None and ANALYTICS_ENABLED:
+        _store = AnalyticsStore()
+    return _store
@@ -0,0 +1,290 @@
+"""
+Headless JSON game API - the same game as the Streamlit UI without a
+websocket, script thread and full rerun per interaction.
+
+Usage: python -m backend.api [--host 127.0.0.1] [--port 8600]
+
+All endpoints take and return JSON (POST):
+    /api/new     {"mode": "standard"|"performance"}  -> new player token + stage
+    /api/stage   {"token": ...}                      -> story, hint and progress
+    /api/query   {"token": ..., "query": "SELECT ..."} -> result page + grading
+                                                        (+ "how close am I" feedback)
+    /api/verify  {"token": ..., "answer": ...}       -> verification result
+GET /api/health returns the scheduler counters and the load level.
+
+Player tokens are stateless: they carry the player's progress and are signed
+with SQLBOMB_API_SECRET, so any API process sharing the secret can serve any
+request. Every response that changes progress returns a new token.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+from urllib.parse import urlsplit
+
+from backend.feedback import feedback_message
+from backend.game_logic import validate_query, apply_stage_match, new_game_state, run_performance_query
+from backend.load_shedding import get_load_controller, submit_query, Overloaded, NORMAL_POLICY
+from backend.result_cache import cached_graded_query
+from backend.scheduler import get_rate_limiter, scheduler_stats, RateLimited
+from backend.session_store import new_player_token
+from backend.story import STORYLINE, SAMPLE_QUERIES, VERIFICATION_QUESTIONS
+
+# Secret used to sign player tokens - set it to share tokens between processes
+API_SECRET = os.environ.get('SQLBOMB_API_SECRET', '').encode() or os.urandom(32)
+
+# Largest request body accepted
+MAX_BODY_BYTES = 64 * 1024
+
+class ApiError(Exception):
+    """Error returned to the client as {"error": message} with an HTTP status"""
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.extra = extra
+
+def _sign(payload):
+    return hmac.new(API_SECRET, payload, hashlib.sha256).hexdigest()[:32]
+
+def encode_token(state):
+    """Pack player progress into a signed token"""
+    payload = base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).rstrip(b'=')
+    return f"{payload.decode()}.{_sign(payload)}"
+
+def decode_token(token):
+    """Unpack and check a signed player token"""
+    try:
+        payload, signature = str(token).rsplit('.', 1)
+        if not hmac.compare_digest(signature, _sign(payload.encode())):
+            raise ValueError("bad signature")
+        padded = payload + '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ApiError(401, "Invalid player token")
+
+def _progress(state):
+    """Public view of a player's progress"""
+    return {
+        'mode': state['m'],
+        'stage': state['s'],
+        'bomb_id': state['b'],
+        'verification_needed': bool(state['v']),
+        'game_completed': state['c'],
+    }
+
+def _run_query(query, stage, mode, version=None, policy=NORMAL_POLICY):
+    """
+    Run and grade a query (on a scheduler worker thread) against the player's
+    scenario snapshot, with the limits of the current load policy
+    """
+    if mode == 'performance':
+        results, matched_row, truncated, cost, budget, within_budget = run_performance_query(
+            query, stage, version, policy=policy
+        )
+        if not within_budget:
+            matched_row = None
+        return results, matched_row, truncated, {'cost': cost, 'budget': budget, 'within_budget': within_budget}
+
+    results, matched_row, truncated, cost, _ = cached_graded_query(query, stage, version=version, policy=policy)
+    return results, matched_row, truncated, {'cost': cost}
+
+def api_new(data):
+    mode = data.get('mode', 'standard')
+    if mode not in ('standard', 'performance'):
+        raise ApiError(400, "mode must be 'standard' or 'performance'")
+    # 'd' pins the player to the scenario snapshot current at the start (None without hot reload)
+    state = {'p': new_player_token(), 'm': mode, 's': 1, 'b': None, 'v': 0, 'c': False,
+             'd': new_game_state(mode)['scenario_version']}
+    token = encode_token(state)
+    return {'token': token, **api_stage({'token': token})}
+
+def api_stage(data):
+    state = decode_token(data.get('token'))
+    response = {'progress': _progress(state)}
+    if not state['c']:
+        stage = STORYLINE[state['s']]
+        response.update({
+            'title': stage['title'],
+            'description': stage['description'],
+            'story': stage['story'],
+            'hint': stage['hint'],
+            'sample_query': SAMPLE_QUERIES[state['s']],
+        })
+    if state['v']:
+        response['verification_question'] = VERIFICATION_QUESTIONS[state['v']]['question']
+    return response
+
+async def api_query(data):
+    state = decode_token(data.get('token'))
+    if state['c']:
+        raise ApiError(409, "Mission already completed")
+    if state['v']:
+        raise ApiError(409, "Verify your findings before running more queries",
+                       verification_question=VERIFICATION_QUESTIONS[state['v']]['question'])
+
+    retry_after = get_rate_limiter().try_acquire(state['p'])
+    if retry_after:
+        raise ApiError(429, "Terminal cooling down", retry_after=round(retry_after, 2))
+
+    query = str(data.get('query', ''))
+    if not validate_query(query):
+        raise ApiError(400, "Invalid query. Only SELECT statements are allowed, and certain operations are restricted for security.")
+
+    try:
+        policy = get_load_controller().admit()
+        future = submit_query(state['p'], policy, _run_query, query, state['s'], state['m'], state.get('d'))
+        results, matched_row, truncated, extra = await asyncio.wrap_future(future)
+    except Overloaded as e:
+        raise ApiError(503, "Server busy", retry_after=e.retry_after)
+    except RateLimited as e:
+        raise ApiError(429, "Too many queries in flight", retry_after=e.retry_after)
+
+    # Columns and compact row lists instead of one dict per row
+    columns = list(results[0].keys()) if results and isinstance(results[0], dict) else []
+    rows = [list(row.values()) if isinstance(row, dict) else list(row) for row in results]
+
+    game_state = {'clues_found': [], 'bomb_id': state['b']}
+    stage_completed = apply_stage_match(state['s'], matched_row, game_state)
+    if stage_completed:
+        state['b'] = game_state['bomb_id']
+        state['v'] = state['s']
+
+    response = {
+        'columns': columns,
+        'rows': rows,
+        'truncated': truncated,
+        'stage_completed': stage_completed,
+        'progress': _progress(state),
+        'token': encode_token(state),
+        **extra,
+    }
+    if stage_completed:
+        response['verification_question'] = VERIFICATION_QUESTIONS[state['v']]['question']
+    elif extra['cost'].get('feedback'):
+        feedback = extra['cost']['feedback']
+        response['feedback'] = {**feedback, 'message': feedback_message(feedback)}
+    return response
+
+def api_verify(data):
+    state = decode_token(data.get('token'))
+    if not state['v']:
+        raise ApiError(409, "Nothing to verify yet")
+
+    correct = str(data.get('answer', '')).strip() == VERIFICATION_QUESTIONS[state['v']]['answer']
+    if correct:
+        if state['v'] < 3:
+            state['s'] += 1
+        else:
+            state['c'] = True
+        state['v'] = 0
+    return {'correct': correct, 'progress': _progress(state), 'token': encode_token(state)}
+
+ROUTES = {
+    '/api/new': api_new,
+    '/api/stage': api_stage,
+    '/api/query': api_query,
+    '/api/verify': api_verify,
+}
+
+async def dispatch(method, path, body):
+    """Route a request. Returns: (status, response dict)"""
+    try:
+        if method == 'GET' and path == '/api/health':
+            return 200, {'ok': True, **scheduler_stats(), **get_load_controller().stats()}
+        handler = ROUTES.get(path)
+        if handler is None:
+            raise ApiError(404, "Not found")
+        if method != 'POST':
+            raise ApiError(405, "Use POST")
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise ApiError(400, "Body must be JSON")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Body must be a JSON object")
+
+        result = handler(data)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return 200, result
+    except ApiError as e:
+        return e.status, {'error': e.message, **e.extra}
+    except Exception as e:
+        print(f"API error: {e}")
+        return 500, {'error': "Internal error"}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 429: 'Too Many Requests', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, default=str, separators=(',', ':')).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+async def handle_connection(reader, writer):
+    """Serve HTTP/1.1 requests on one connection (with keep-alive)"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, version = request_line.decode('latin-1').split()
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            length = int(headers.get('content-length') or 0)
+            if length > MAX_BODY_BYTES:
+                writer.write(_response(413, {'error': "Request body too large"}, False))
+                await writer.drain()
+                break
+            body = await reader.readexactly(length) if length else b''
+
+            status, payload = await dispatch(method, urlsplit(target).path, body)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(host='127.0.0.1', port=8600):
+    """Run the API server until cancelled"""
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"SQL Bomb API listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless JSON API for the SQL Bomb Defusal Game")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+
+    if not os.environ.get('SQLBOMB_API_SECRET'):
+        print("SQLBOMB_API_SECRET is not set - player tokens are only valid for this process")
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
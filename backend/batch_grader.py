@@ -0,0 +1,143 @@
+"""
+Grade a batch of SQL submissions in parallel.
+
+Usage:
+    python -m backend.batch_grader SUBMISSIONS [-o REPORT] [--workers N]
+
+SUBMISSIONS is a CSV file with student, stage and query columns, or a JSONL
+file with the same keys. Each submission goes through validate_query, is run
+on a read-only connection held by the worker process with a per-query
+budget, and is graded with the stage predicate (the same one
+check_stage_completion uses). The report is written as CSV or JSONL
+depending on the REPORT extension.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from backend.db import connect_read_only, execute_graded_query
+from backend.game_logic import validate_query
+from backend.query_cost import MAX_ESTIMATED_COST
+
+# Per-query budget for each submission
+MAX_QUERY_VM_STEPS = 5_000_000
+MAX_QUERY_MS = 2000
+
+REPORT_FIELDS = ['student', 'stage', 'valid', 'passed', 'rows', 'vm_steps', 'elapsed_ms', 'error']
+
+# Read-only connection of the current worker process
+_worker_conn = None
+
+def _parse_submission(line):
+    """(student, stage, query, error) of one JSONL line - error is None for a readable line"""
+    try:
+        return _submission(json.loads(line))
+    except ValueError as e:
+        return '', None, '', f"Malformed submission: {e}"
+
+def _submission(row):
+    """(student, stage, query, error) of one CSV row or JSON object - error is None for a readable row"""
+    try:
+        return str(row['student']), int(row['stage']), str(row['query']), None
+    except (KeyError, ValueError, TypeError) as e:
+        student = str(row.get('student') or '') if isinstance(row, dict) else ''
+        return student, None, '', f"Malformed submission: {type(e).__name__} {e}"
+
+def read_submissions(path):
+    """
+    Read (student, stage, query, error) submissions from a CSV or JSONL file.
+    A row that can't be read gets an error, which ends up in its report row.
+    """
+    with open(path, newline='', encoding='utf-8') as submissions_file:
+        if path.endswith(('.jsonl', '.json')):
+            return [_parse_submission(line) for line in submissions_file if line.strip()]
+        return [_submission(row) for row in csv.DictReader(submissions_file)]
+
+def _init_worker(db_path):
+    global _worker_conn
+    _worker_conn = connect_read_only(db_path)
+
+def grade_submission(submission):
+    """Grade one (student, stage, query, error) submission. Returns a report row dict"""
+    student, stage, query, error = submission
+    report = {'student': student, 'stage': stage, 'valid': False, 'passed': False,
+              'rows': 0, 'vm_steps': 0, 'elapsed_ms': 0.0, 'error': ''}
+
+    if error:
+        report['error'] = error
+        return report
+    if stage not in (1, 2, 3):
+        report['error'] = f"Unknown stage {stage}"
+        return report
+    if not validate_query(query):
+        report['error'] = "Invalid query"
+        return report
+
+    report['valid'] = True
+    # The full result is fetched, so row counts and costs are comparable between students.
+    # Rows are only counted, none are kept.
+    _, matched_row, _, cost = execute_graded_query(
+        query, stage, conn=_worker_conn, page_size=0, early_exit=False,
+        max_vm_steps=MAX_QUERY_VM_STEPS, max_elapsed_ms=MAX_QUERY_MS, max_estimated_cost=MAX_ESTIMATED_COST
+    )
+    report['passed'] = matched_row is not None
+    report['rows'] = cost['rows']
+    report['vm_steps'] = cost['vm_steps']
+    report['elapsed_ms'] = round(cost['elapsed_ms'], 2)
+    if cost['aborted']:
+        report['error'] = "Query exceeded its budget"
+    elif cost.get('error'):
+        report['error'] = cost['error']
+    return report
+
+def grade_all(submissions, workers=None, db_path=None):
+    """Grade submissions across a process pool, keeping the input order"""
+    with Pool(processes=workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+        return pool.map(grade_submission, submissions, chunksize=max(1, len(submissions) // ((workers or os.cpu_count() or 1) * 8)))
+
+def write_report(path, reports):
+    """Write the graded report as CSV or JSONL (by extension)"""
+    with open(path, 'w', newline='', encoding='utf-8') as report_file:
+        if path.endswith(('.jsonl', '.json')):
+            for report in reports:
+                report_file.write(json.dumps(report) + '\n')
+        else:
+            writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(reports)
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade SQL submissions in parallel")
+    parser.add_argument('submissions', help="CSV or JSONL file with student, stage, query")
+    parser.add_argument('-o', '--output', default='graded_report.csv', help="report file (.csv or .jsonl)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--db', default=None, help="database to grade against (default: game database)")
+    args = parser.parse_args()
+
+    submissions = read_submissions(args.submissions)
+    start = time.perf_counter()
+    reports = grade_all(submissions, workers=args.workers, db_path=args.db)
+    elapsed = time.perf_counter() - start
+    write_report(args.output, reports)
+
+    passed = Counter(r['stage'] for r in reports if r['passed'])
+    totals = Counter(r['stage'] for r in reports if r['stage'] is not None)
+    print(f"Graded {len(reports)} submissions in {elapsed:.2f}s "
+          f"({len(reports) / elapsed if elapsed else 0:.0f}/s) -> {args.output}")
+    for stage in sorted(totals):
+        print(f"  Stage {stage}: {passed[stage]}/{totals[stage]} passed")
+    malformed = sum(1 for r in reports if r['stage'] is None)
+    if malformed:
+        print(f"  {malformed} submissions could not be read")
+    invalid = sum(1 for r in reports if not r['valid']) - malformed
+    if invalid:
+        print(f"  {invalid} submissions were rejected by the query guard")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
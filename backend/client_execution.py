@@ -0,0 +1,170 @@
+"""
+Support for running player queries in the browser (WASM SQLite) with
+grading on the server.
+
+The scenario database is exported once as a gzip snapshot whose file name
+carries a content hash, so browsers can cache it forever. The browser runs
+the query and sends back only a fingerprint of the result and the candidate
+row it believes completes the stage; the server checks that row with the
+same predicate check_stage_completion uses, then confirms with one lookup in
+its own copy of the scenario that the row exists, so a made-up payload
+doesn't complete the stage.
+
+python -m backend.client_execution --expected FILE writes reference results
+for the headless Node check in frontend/browser_sql/check_headless.mjs.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from contextlib import closing
+
+from backend.db import connect_read_only
+from backend.game_logic import validate_query
+from backend.utils import find_stage_match, row_completes_stage
+
+# Queries used by the headless check, per stage
+CHECK_QUERIES = [
+    (1, "SELECT * FROM bombs"),
+    (1, "SELECT location, signal_strength FROM bombs WHERE signal_strength > 90"),
+    (2, "SELECT * FROM bomb_components WHERE bomb_id = 2"),
+    (2, "SELECT component_name, AVG(bomb_id) AS avg_bomb FROM bomb_components GROUP BY component_name"),
+    (3, "SELECT s.name, a.action_performed, a.bomb_id FROM suspects s JOIN access_logs a ON s.suspect_id = a.suspect_id"),
+    (3, "SELECT name FROM suspects ORDER BY name"),
+]
+
+# Values a SQLite result can hold - anything else in a browser's candidate row is malformed
+SCALAR_TYPES = (type(None), bool, int, float, str)
+
+# Per stage: the lookup that confirms a candidate row exists, and the candidate columns it binds
+# (the values the stage predicate compares exactly). Stage 3 matches the bomb by id or location.
+CANDIDATE_LOOKUPS = {
+    1: ("SELECT 1 FROM bombs WHERE device_signature = ? AND signal_strength = ? AND battery_level = ? "
+        "AND frequency_pattern = ? LIMIT 1",
+        ('device_signature', 'signal_strength', 'battery_level', 'frequency_pattern')),
+    2: ("SELECT 1 FROM bomb_components WHERE bomb_id = ? AND component_name = ? AND activation_code = ? "
+        "AND material = ? LIMIT 1",
+        ('bomb_id', 'component_name', 'activation_code', 'material')),
+    3: ("SELECT 1 FROM suspects s JOIN access_logs a ON a.suspect_id = s.suspect_id "
+        "WHERE s.name = ? AND a.action_performed = ? AND a.bomb_id = ? LIMIT 1",
+        ('name', 'action_performed', 'bomb_id')),
+}
+CANDIDATE_LOOKUP_BY_LOCATION = (
+    "SELECT 1 FROM suspects s JOIN access_logs a ON a.suspect_id = s.suspect_id "
+    "JOIN bombs b ON b.bomb_id = a.bomb_id WHERE s.name = ? AND a.action_performed = ? AND b.location = ? LIMIT 1",
+    ('name', 'action_performed', 'location'))
+
+# Snapshot file names by (db_path, mtime_ns, size), so reruns don't hash the database again
+_snapshot_names = {}
+
+def export_client_snapshot(db_path, out_dir):
+    """
+    Write a gzip copy of a scenario database for browsers.
+    Returns: the snapshot file name (scenario-<hash>.db.gz)
+    """
+    stat = os.stat(db_path)
+    key = (db_path, stat.st_mtime_ns, stat.st_size)
+    name = _snapshot_names.get(key)
+    if name is None:
+        digest = hashlib.sha256()
+        with open(db_path, 'rb') as db_file:
+            for chunk in iter(lambda: db_file.read(1 << 20), b''):
+                digest.update(chunk)
+        name = _snapshot_names[key] = f"scenario-{digest.hexdigest()[:16]}.db.gz"
+    path = os.path.join(out_dir, name)
+
+    if not os.path.exists(path):
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(db_path, 'rb') as source, gzip.open(tmp_path, 'wb', compresslevel=9) as target:
+            shutil.copyfileobj(source, target)
+        os.replace(tmp_path, path)
+    return name
+
+def _canonical_value(value):
+    # Integral floats print differently in Python and JavaScript (3.0 vs 3)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def result_fingerprint(columns, rows):
+    """SHA-256 of a result set, computed the same way as grading.js in the browser"""
+    canonical = [list(columns), [[_canonical_value(v) for v in row] for row in rows]]
+    text = json.dumps(canonical, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def candidate_exists(stage, candidate, db_path=None):
+    """Whether the scenario database has a row with the candidate's graded values"""
+    sql, columns = CANDIDATE_LOOKUPS[stage]
+    if stage == 3 and 'bomb_id' not in candidate:
+        sql, columns = CANDIDATE_LOOKUP_BY_LOCATION
+    with closing(connect_read_only(db_path)) as conn:
+        return conn.execute(sql, [candidate.get(column) for column in columns]).fetchone() is not None
+
+def verify_client_result(stage, payload, db_path=None):
+    """
+    Grade a result reported by the browser against the scenario database at
+    db_path (the game database by default).
+    Returns: (matched_row or None, error message or None)
+    """
+    query = str(payload.get('query', ''))
+    if not validate_query(query):
+        return None, "Invalid query. Only SELECT statements are allowed, and certain operations are restricted for security."
+
+    candidate = payload.get('candidate')
+    if candidate is None:
+        return None, None
+    columns = payload.get('columns') or []
+    if (not isinstance(candidate, dict) or not isinstance(columns, list) or
+            not all(isinstance(column, str) for column in columns) or not set(candidate) <= set(columns) or
+            not all(isinstance(value, SCALAR_TYPES) for value in candidate.values())):
+        return None, "Malformed result from the browser"
+
+    try:
+        completed = row_completes_stage(stage, candidate)
+    except (TypeError, ValueError):
+        # e.g. a text signal_strength compared with a number
+        return None, "Malformed result from the browser"
+    if not completed:
+        return None, None
+    if not candidate_exists(stage, candidate, db_path):
+        return None, "The reported row isn't in the scenario data"
+    return candidate, None
+
+def expected_results(db_path):
+    """Reference columns, rows, fingerprints and candidates for CHECK_QUERIES"""
+    expected = []
+    with closing(sqlite3.connect(db_path)) as conn:
+        for stage, query in CHECK_QUERIES:
+            cursor = conn.execute(query)
+            columns = [desc[0] for desc in cursor.description]
+            rows = [list(row) for row in cursor.fetchall()]
+            matched = find_stage_match(stage, [dict(zip(columns, row)) for row in rows])
+            expected.append({
+                'stage': stage,
+                'query': query,
+                'columns': columns,
+                'rows': rows,
+                'fingerprint': result_fingerprint(columns, rows),
+                'candidate': matched,
+            })
+    return expected
+
+def main():
+    from backend.db import DB_PATH
+
+    parser = argparse.ArgumentParser(description="Reference results for the browser execution check")
+    parser.add_argument('--expected', required=True, help="JSON file to write")
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    with open(args.expected, 'w', encoding='utf-8') as out:
+        json.dump({'snapshot': export_client_snapshot(args.db, os.path.dirname(os.path.abspath(args.expected))),
+                   'queries': expected_results(args.db)}, out, ensure_ascii=False)
+    print(f"Wrote {len(CHECK_QUERIES)} reference results to {args.expected}")
+
+if __name__ == '__main__':
+    main()
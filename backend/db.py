@@ -1,5 +1,12 @@
 import sqlite3
 import os
+import re
+import time
+from contextlib import closing
+from backend.engines import get_engine
+from backend.profiling import profile_call
+from backend.query_cost import rejection_hint, record_estimate_accuracy
+from backend.utils import normalize_sql, row_completes_stage
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'tictictomb.db')
@@ -9,6 +16,7 @@ if not os.path.exists(DB_PATH):
     from init_database import init_database
     init_database()
 
+@profile_call
 def execute_query(query):
     """Execute a query and return results with column names"""
     # Create a new connection for each query to avoid threading issues
@@ -48,3 +56,143 @@ def execute_query(query):
         except Exception as e:
             print(f"Query error: {e}")
             return []
+
+# Maximum number of rows kept for display in the results panel
+RESULT_PAGE_SIZE = 500
+
+# SQLite has no depth limit for recursive CTEs, so they run under these ceilings even when the
+# caller gives no budget, and a recursion that never stops is interrupted. Matched on the
+# normalized query, since SQLite reads WITH /* ... */ RECURSIVE like WITH RECURSIVE
+MAX_RECURSIVE_VM_STEPS = int(os.environ.get('SQLBOMB_MAX_RECURSIVE_STEPS', '50000000'))
+MAX_RECURSIVE_MS = float(os.environ.get('SQLBOMB_MAX_RECURSIVE_MS', '5000'))
+_RECURSIVE_RE = re.compile(r'\bwith\s+recursive\b', re.IGNORECASE)
+
+# Serving mode for several worker processes: scenario files are opened with immutable=1 (no
+# locking) and memory-mapped, so every worker reads one shared copy in the OS page cache instead
+# of filling its own SQLite page cache. Only safe because scenario builds replace files, never
+# modify them in place.
+IMMUTABLE_DB = os.environ.get('SQLBOMB_IMMUTABLE_DB') == '1'
+MMAP_SIZE = int(os.environ.get('SQLBOMB_MMAP_SIZE', str(4 << 30)))
+
+def connect_read_only(db_path=None, engine=None):
+    """Open a read-only connection to the game database"""
+    engine = engine or get_engine()
+    if IMMUTABLE_DB:
+        return engine.connect_immutable(db_path or DB_PATH, MMAP_SIZE)
+    return engine.connect(db_path or DB_PATH, read_only=True)
+
+@profile_call
+def execute_graded_query(query, stage, page_size=RESULT_PAGE_SIZE, db_path=None, max_vm_steps=None,
+                         early_exit=True, max_elapsed_ms=None, conn=None, engine=None, max_estimated_cost=None,
+                         answer_key=None):
+    """
+    Execute a query and grade it against the stage in a single pass.
+    Rows are checked with row_completes_stage as they come off the cursor,
+    only the first page_size rows are kept for display, and fetching stops
+    as soon as the page is full and a matching row has been found (unless
+    early_exit is False, e.g. when the full cost of the query matters).
+
+    The cost of the query is measured in SQLite VM steps (counted with a
+    progress handler) and elapsed time. If max_vm_steps or max_elapsed_ms is
+    given, the query is interrupted once it goes past that budget.
+    With max_estimated_cost, the query's plan is estimated first (see
+    backend.query_cost) and a query estimated to visit more rows, or to
+    materialize too many rows, is not run at all: cost['rejected'] is set
+    and cost['error'] explains why. Recursive CTEs always run under the
+    MAX_RECURSIVE_* ceilings; one interrupted by them has cost['capped'] set.
+    With an answer_key (see backend.feedback), rows are also compared with
+    the stage's canonical answer while they are fetched, and a query that
+    doesn't complete the stage gets cost['feedback'].
+    Pass conn to reuse an open connection instead of connecting to db_path,
+    and engine to run on another query engine than SQLite (see backend.engines).
+    cost['rows'] is the number of rows fetched, also past the page.
+    Returns: (results, matched_row, truncated, cost)
+    """
+    engine = engine or get_engine()
+    capped = False
+    if _RECURSIVE_RE.search(normalize_sql(query)):
+        if max_vm_steps is None or max_vm_steps > MAX_RECURSIVE_VM_STEPS:
+            max_vm_steps = MAX_RECURSIVE_VM_STEPS
+            capped = True
+        if max_elapsed_ms is None or max_elapsed_ms > MAX_RECURSIVE_MS:
+            max_elapsed_ms = MAX_RECURSIVE_MS
+            capped = True
+    if conn is None:
+        with closing(connect_read_only(db_path, engine)) as own_conn:
+            return _fetch_graded(engine, own_conn, query, stage, page_size, max_vm_steps, early_exit,
+                                 max_elapsed_ms, max_estimated_cost, capped, answer_key)
+    return _fetch_graded(engine, conn, query, stage, page_size, max_vm_steps, early_exit,
+                         max_elapsed_ms, max_estimated_cost, capped, answer_key)
+
+def _record_error(cost, error, start, capped):
+    print(f"Query error: {error}")
+    cost['error'] = str(error)
+    if cost['aborted'] and capped:
+        cost['capped'] = True
+        cost['error'] = ("The recursive query was stopped after running too long. Make sure its recursive "
+                         "part stops, e.g. with WHERE depth < 10 or a join that runs out of rows.")
+    cost['elapsed_ms'] = (time.perf_counter() - start) * 1000
+
+def _fetch_graded(engine, conn, query, stage, page_size, max_vm_steps, early_exit, max_elapsed_ms, max_estimated_cost,
+                  capped=False, answer_key=None):
+    results = []
+    matched_row = None
+    truncated = False
+    stopped_early = False
+    estimate = None
+    cost = {'vm_steps': 0, 'elapsed_ms': 0.0, 'aborted': False, 'rows': 0}
+    start = time.perf_counter()
+
+    try:
+        if max_estimated_cost is not None:
+            estimate = engine.estimate_cost(conn, query)
+        if estimate is not None:
+            cost['estimated_cost'] = estimate['cost']
+            hint = rejection_hint(estimate, max_estimated_cost)
+            if hint:
+                cost['rejected'] = True
+                cost['error'] = hint
+                cost['elapsed_ms'] = (time.perf_counter() - start) * 1000
+                return [], None, False, cost
+        cur = engine.execute(conn, query, cost, max_vm_steps, max_elapsed_ms)
+    except Exception as e:
+        _record_error(cost, e, start, capped)
+        return [], None, False, cost
+
+    try:
+        columns = [desc[0] for desc in cur.description] if cur.description else []
+        comparer = answer_key.comparer(columns) if answer_key is not None and columns else None
+
+        fetched = 0
+        for row in engine.iter_rows(cur):
+            fetched += 1
+            if columns:
+                row = dict(zip(columns, row))
+
+            if matched_row is None:
+                if row_completes_stage(stage, row):
+                    matched_row = row
+                elif comparer is not None:
+                    comparer.add(row)
+
+            if len(results) < page_size:
+                results.append(row)
+            else:
+                truncated = True
+                if early_exit and matched_row is not None:
+                    # Nothing left to find - skip the rest of the result set
+                    stopped_early = True
+                    break
+    except Exception as e:
+        _record_error(cost, e, start, capped)
+        return [], None, False, cost
+    finally:
+        engine.finish(conn, cur)
+
+    cost['rows'] = fetched
+    cost['elapsed_ms'] = (time.perf_counter() - start) * 1000
+    if comparer is not None and matched_row is None:
+        cost['feedback'] = comparer.result()
+    if estimate is not None and not cost['aborted'] and not stopped_early:
+        record_estimate_accuracy(query, estimate, cost)
+    return results, matched_row, truncated, cost
@@ -0,0 +1,240 @@
+import os
+import sqlite3
+import threading
+import time
+
+from backend.partitions import attach_partitions
+from backend.query_cost import estimate_query_cost
+from backend.sql_functions import register_functions
+
+# The SQLite progress handler fires every this many VM instructions
+COST_STEP_GRANULARITY = 100
+
+# Disk DuckDB may spill to for sorts, joins and materialized CTEs; a query that needs more fails.
+# SQLite has no such setting, so its intermediates are capped by the estimate (see backend.query_cost)
+MAX_TEMP_STORAGE = os.environ.get('SQLBOMB_MAX_TEMP_STORAGE', '4GB')
+
+class QueryEngine:
+    """
+    Interface for the database engines a scenario can run on.
+    Grading only relies on these methods, so it works the same on every engine.
+    """
+
+    name = None
+
+    def connect(self, db_path, read_only=False):
+        """Open a connection to a scenario database"""
+        raise NotImplementedError
+
+    def connect_immutable(self, db_path, mmap_size):
+        """
+        Open a read-only connection to a database file that never changes in
+        place (it is only ever replaced), memory-mapping up to mmap_size bytes
+        where the engine can
+        """
+        return self.connect(db_path, read_only=True)
+
+    def execute(self, conn, query, cost, max_vm_steps=None, max_elapsed_ms=None):
+        """
+        Start a query under a budget and return a cursor with .description.
+        Cost metrics are collected into the cost dict; if the budget runs
+        out the query is interrupted and cost['aborted'] is set.
+        """
+        raise NotImplementedError
+
+    def iter_rows(self, cursor):
+        """Stream result rows from a cursor"""
+        return iter(cursor)
+
+    def finish(self, conn, cursor):
+        """Release the cursor and budget hooks of a finished query"""
+        cursor.close()
+
+    def explain(self, conn, query):
+        """Return the query plan as a list of text lines"""
+        raise NotImplementedError
+
+    def estimate_cost(self, conn, query):
+        """Estimate the rows a query visits before running it, or None if the engine can't"""
+        return None
+
+class SQLiteEngine(QueryEngine):
+    """Default engine - cost is measured in SQLite VM steps and elapsed time"""
+
+    name = 'sqlite'
+
+    def connect(self, db_path, read_only=False):
+        if read_only:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(db_path)
+        # access_logs of a partitioned scenario is a view over attached files (see backend.partitions)
+        attach_partitions(conn, db_path, read_only=read_only)
+        # list_count/list_min/... and stddev (see backend.sql_functions)
+        return register_functions(conn)
+
+    def connect_immutable(self, db_path, mmap_size):
+        # immutable=1 skips file locking and change detection, and pages read through the
+        # memory map live in the OS page cache, shared by every process serving the file
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        attach_partitions(conn, db_path, immutable=True, mmap_size=mmap_size)
+        return register_functions(conn)
+
+    def execute(self, conn, query, cost, max_vm_steps=None, max_elapsed_ms=None):
+        deadline = time.perf_counter() + max_elapsed_ms / 1000 if max_elapsed_ms is not None else None
+
+        def count_steps():
+            cost['vm_steps'] += COST_STEP_GRANULARITY
+            # A non-zero return value interrupts the query
+            if max_vm_steps is not None and cost['vm_steps'] > max_vm_steps:
+                cost['aborted'] = True
+            elif deadline is not None and time.perf_counter() > deadline:
+                cost['aborted'] = True
+            return cost['aborted']
+
+        conn.set_progress_handler(count_steps, COST_STEP_GRANULARITY)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query)
+        except Exception:
+            self.finish(conn, cursor)
+            raise
+        return cursor
+
+    def finish(self, conn, cursor):
+        cursor.close()
+        conn.set_progress_handler(None, 0)
+
+    def explain(self, conn, query):
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query)]
+
+    def estimate_cost(self, conn, query):
+        return estimate_query_cost(conn, query)
+
+class DuckDBEngine(QueryEngine):
+    """
+    In-process columnar engine for aggregate and join heavy scenarios.
+    DuckDB has no VM step counter, so only elapsed time is budgeted
+    (cost['vm_steps'] is None).
+    """
+
+    name = 'duckdb'
+
+    # Rows fetched from DuckDB per batch while streaming
+    FETCH_BATCH = 1024
+
+    def __init__(self):
+        try:
+            import duckdb
+        except ImportError:
+            raise RuntimeError("The duckdb engine needs the duckdb package: pip install duckdb")
+        self.duckdb = duckdb
+        # Interrupt timers of running queries, by cursor id
+        self._timers = {}
+        self._timers_lock = threading.Lock()
+
+    def connect(self, db_path, read_only=False):
+        conn = self.duckdb.connect(db_path, read_only=read_only)
+        conn.execute(f"SET max_temp_directory_size = '{MAX_TEMP_STORAGE}'")
+        return conn
+
+    def execute(self, conn, query, cost, max_vm_steps=None, max_elapsed_ms=None):
+        cost['vm_steps'] = None
+        # Each query runs on its own cursor so it can be interrupted on its own
+        cursor = conn.cursor()
+        if max_elapsed_ms is not None:
+            def interrupt():
+                cost['aborted'] = True
+                cursor.interrupt()
+            timer = threading.Timer(max_elapsed_ms / 1000, interrupt)
+            with self._timers_lock:
+                self._timers[id(cursor)] = timer
+            timer.start()
+        try:
+            cursor.execute(query)
+        except Exception:
+            self.finish(conn, cursor)
+            raise
+        return cursor
+
+    def iter_rows(self, cursor):
+        while True:
+            batch = cursor.fetchmany(self.FETCH_BATCH)
+            if not batch:
+                return
+            yield from batch
+
+    def finish(self, conn, cursor):
+        with self._timers_lock:
+            timer = self._timers.pop(id(cursor), None)
+        if timer is not None:
+            timer.cancel()
+        cursor.close()
+
+    def explain(self, conn, query):
+        return [row[1] for row in conn.execute("EXPLAIN " + query).fetchall()]
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+ENGINE_CLASSES = {
+    'sqlite': SQLiteEngine,
+    'duckdb': DuckDBEngine,
+}
+
+def get_engine(name='sqlite'):
+    """Return the (shared) engine instance for a name"""
+    with _engines_lock:
+        if name not in _engines:
+            if name not in ENGINE_CLASSES:
+                raise ValueError(f"Unknown query engine {name!r}, expected one of {sorted(ENGINE_CLASSES)}")
+            _engines[name] = ENGINE_CLASSES[name]()
+        return _engines[name]
+
+def _duckdb_type(sqlite_type):
+    """Map a declared SQLite column type to a DuckDB type"""
+    sqlite_type = (sqlite_type or '').upper()
+    if 'INT' in sqlite_type:
+        return 'BIGINT'
+    if sqlite_type in ('REAL', 'FLOAT', 'DOUBLE'):
+        return 'DOUBLE'
+    return 'VARCHAR'
+
+def copy_sqlite_to_duckdb(sqlite_path, duckdb_path, tables, batch_size=50_000):
+    """
+    Copy scenario tables from a SQLite database into a new DuckDB file, so
+    both engines serve the same data. The copy is streamed in batches and
+    written to a temporary file that is moved into place when complete.
+    """
+    import duckdb
+
+    tmp_path = f"{duckdb_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    # Partitioned tables are copied from their view, into one DuckDB table
+    source = get_engine('sqlite').connect(sqlite_path, read_only=True)
+    target = duckdb.connect(tmp_path)
+    try:
+        for table in tables:
+            # table_xinfo includes generated columns, which are copied as plain values
+            columns = [(name, col_type) for _, name, col_type, _, _, _, hidden
+                       in source.execute(f"PRAGMA table_xinfo({table})") if hidden != 1]
+            column_defs = ', '.join(f"{name} {_duckdb_type(col_type)}" for name, col_type in columns)
+            target.execute(f"CREATE TABLE {table} ({column_defs})")
+
+            placeholders = ', '.join('?' for _ in columns)
+            cursor = source.execute(f"SELECT {', '.join(name for name, _ in columns)} FROM {table}")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                target.executemany(f"INSERT INTO {table} VALUES ({placeholders})", batch)
+        target.execute("CHECKPOINT")
+    finally:
+        target.close()
+        source.close()
+
+    os.replace(tmp_path, duckdb_path)
+    return duckdb_path
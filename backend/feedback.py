@@ -0,0 +1,93 @@
+"""
+"How close am I" feedback for queries that don't complete a stage.
+
+A player's result is compared with the stage's canonical answer as sets of
+hashed rows, in the graded columns (STAGE_COLUMNS) both results have. The
+rows are hashed while they come off the cursor, so the comparison costs one
+hash per row and runs no queries of its own. Only the expected rows' hashes
+are kept. The feedback gives counts and column names, never values.
+"""
+from operator import itemgetter
+
+from backend.utils import STAGE_COLUMNS
+
+class AnswerKey:
+    """The canonical answer of a stage, reduced to its graded columns"""
+
+    def __init__(self, stage, rows):
+        self.columns = tuple(column for column in STAGE_COLUMNS[stage] if rows and column in rows[0])
+        self.rows = [{column: row[column] for column in self.columns} for row in rows]
+        # Hashed expected rows for each set of shared columns
+        self._expected = {}
+
+    def comparer(self, columns):
+        """A RowComparer for a result with these column names"""
+        shared = tuple(column for column in self.columns if column in columns)
+        expected = self._expected.get(shared)
+        if expected is None and shared:
+            key = itemgetter(*shared)
+            expected = self._expected[shared] = frozenset(hash(key(row)) for row in self.rows)
+        missing = [column for column in self.columns if column not in columns]
+        return RowComparer(shared, expected, missing)
+
+class RowComparer:
+    """Counts a result's rows that are and aren't in the expected row set"""
+
+    def __init__(self, columns, expected, missing_columns):
+        self.columns = columns
+        self.expected = expected
+        self.missing_columns = missing_columns
+        self.found = set()
+        self.extra = 0
+        # A single column gives the value itself, on both sides
+        self._key = itemgetter(*columns) if columns else None
+
+    def add(self, row):
+        """Compare one result row (a dict of column name -> value)"""
+        if self._key is None:
+            return
+        digest = hash(self._key(row))
+        if digest in self.expected:
+            self.found.add(digest)
+        else:
+            self.extra += 1
+
+    def result(self):
+        """
+        Returns: dict with expected_rows, found_rows, missing_rows and
+        extra_rows (None when no graded column is shared), the graded columns
+        compared and the ones missing from the result
+        """
+        feedback = {
+            'expected_rows': None, 'found_rows': None, 'missing_rows': None, 'extra_rows': None,
+            'compared_columns': list(self.columns), 'missing_columns': self.missing_columns,
+        }
+        if self.columns:
+            feedback.update({
+                'expected_rows': len(self.expected),
+                'found_rows': len(self.found),
+                'missing_rows': len(self.expected) - len(self.found),
+                'extra_rows': self.extra,
+            })
+        return feedback
+
+def feedback_message(feedback):
+    """One or two sentences for the player from a feedback dict"""
+    missing_columns = ', '.join(feedback['missing_columns'])
+    if not feedback['compared_columns']:
+        return f"None of the columns the answer is checked on are in your result. It needs: {missing_columns}."
+
+    expected, found, extra = feedback['expected_rows'], feedback['found_rows'], feedback['extra_rows']
+    message = f"{found} of {expected} answer row{'s' if expected != 1 else ''} found"
+    if extra:
+        message += f", plus {extra} row{'s' if extra != 1 else ''} that aren't part of the answer"
+    message += "."
+    if found < expected and not extra:
+        message += " Your filters are too strict."
+    elif found < expected:
+        message += " Some answer rows are filtered out, and others don't belong."
+    elif extra:
+        message += " Narrow your filters down."
+    if missing_columns:
+        message += f" Also select: {missing_columns}."
+    return message
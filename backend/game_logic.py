@@ -1,23 +1,73 @@
+import os
 import re
-from backend.utils import check_stage_completion
+from backend.db import execute_graded_query
+from backend.feedback import AnswerKey
+from backend.load_shedding import NORMAL_POLICY, Overloaded
+from backend.profiling import profile_call
+from backend.scenario import get_scenario, HOT_RELOAD
+from backend.snapshots import get_snapshots, snapshot_version, on_warm, on_retire
+from backend.utils import find_stage_match
+
+# Reference solutions used to set the cost budget in performance challenge mode
+CANONICAL_QUERIES = {
+    1: "SELECT * FROM bombs WHERE signal_strength > 95 AND battery_level > 90 AND device_signature LIKE 'B9Z%'",
+    2: "SELECT * FROM bomb_components WHERE bomb_id = 2 AND material IN ('Titanium', 'Gold')",
+    3: "SELECT s.name, a.action_performed, a.bomb_id FROM access_logs a "
+       "JOIN suspects s ON s.suspect_id = a.suspect_id "
+       "WHERE a.bomb_id = 2 AND a.action_performed = 'Installation'"
+}
+
+# A player's query may cost this many times the canonical query
+BUDGET_SLACK = 3
+# Floor for the time budget, since very fast queries have noisy timings
+MIN_TIME_BUDGET_MS = 25.0
+# Queries are interrupted once they use this many times their step budget
+BUDGET_ABORT_FACTOR = 10
+
+_stage_budgets = {}
+# Canonical answers for "how close am I" feedback, None where one didn't fit in a result page
+_answer_keys = {}
 
 def start_timer():
     """Start a timer for the game - now just returns a placeholder value"""
     return 1  # Placeholder value since we're removing the timer concept
 
+def new_game_state(mode='standard'):
+    """
+    Return the game state for a fresh mission
+    mode is 'standard' or 'performance' (same stages on the large dataset,
+    graded on query cost as well as the answer)
+    With hot reload on, the mission stays on the scenario snapshot that is
+    current when it starts.
+    """
+    scenario = 'large' if mode == 'performance' else 'standard'
+    return {
+        'mode': mode,
+        'scenario_version': get_snapshots().current_version(scenario) if HOT_RELOAD else None,
+        'game_started': False,
+        'current_stage': 1,
+        'bomb_id': None,
+        'clues_found': [],
+        'game_completed': False,
+        'last_query_results': None,
+        'last_query': None,
+        'last_query_error': None
+    }
+
+@profile_call
 def validate_query(query):
     """
     Validate SQL query for safety and game rules
     - No DROP, DELETE, UPDATE, INSERT statements allowed
-    - No system table access
-    - Only SELECT statements allowed
-    - JOIN operations are allowed
+    - No system table access (FTS5 tables are allowed, their shadow tables aren't)
+    - Only SELECT statements allowed, optionally after a WITH clause
+    - JOIN operations, CTEs (also recursive) and window functions are allowed
     """
     # Convert to lowercase for easier checking
     query_lower = query.lower().strip()
 
-    # Check if it's a SELECT statement
-    if not query_lower.startswith('select'):
+    # Check if it's a SELECT statement - WITH ... DELETE and the like are caught below
+    if not query_lower.startswith(('select', 'with')):
         return False
 
     # Check for forbidden operations - using word boundaries to avoid false positives
@@ -29,7 +79,9 @@ def validate_query(query):
 
     # Check for system tables
     forbidden_tables = [
-        r'\bpg_\w+\b', r'\binformation_schema\b', r'\bsqlite_\w+\b'
+        r'\bpg_\w+\b', r'\binformation_schema\b', r'\bsqlite_\w+\b',
+        # FTS5 shadow tables - full-text tables themselves can be queried with MATCH
+        r'\b\w+_fts_(?:data|idx|content|docsize|config)\b'
     ]
 
     # Check for forbidden operations
@@ -50,41 +102,138 @@ def validate_query(query):
     # Allow JOIN operations and other valid SQL constructs
     return True
 
+@profile_call
+def get_stage_budget(stage, version=None):
+    """
+    Return the performance challenge budget for a stage as a dict with the
+    canonical query's cost and the allowed vm_steps / elapsed_ms.
+    The canonical query is measured once per process on each large dataset
+    snapshot.
+    """
+    engine, db_path = get_scenario('large', version=version)
+    if (db_path, stage) not in _stage_budgets:
+        canonical = _run_canonical(stage, db_path, engine)
+        # Engines without a VM step counter (DuckDB) are only budgeted on time
+        step_budget = None
+        if canonical['vm_steps'] is not None:
+            step_budget = max(canonical['vm_steps'], 1000) * BUDGET_SLACK
+        _stage_budgets[db_path, stage] = {
+            'canonical_vm_steps': canonical['vm_steps'],
+            'canonical_elapsed_ms': canonical['elapsed_ms'],
+            'vm_steps': step_budget,
+            'elapsed_ms': max(canonical['elapsed_ms'] * BUDGET_SLACK, MIN_TIME_BUDGET_MS),
+        }
+    return _stage_budgets[db_path, stage]
+
+def _run_canonical(stage, db_path, engine):
+    """Run a stage's canonical query, keep its answer key and return its cost"""
+    results, _, truncated, cost = execute_graded_query(
+        CANONICAL_QUERIES[stage], stage, db_path=db_path, engine=engine, early_exit=False
+    )
+    _answer_keys[db_path, stage] = AnswerKey(stage, results) if results and not truncated else None
+    return cost
+
+def get_answer_key(stage, scenario='standard', version=None):
+    """
+    Return the canonical answer of a stage on a scenario snapshot for "how
+    close am I" feedback (see backend.feedback), or None if it is too big.
+    It is computed once per process on each snapshot. On the large dataset
+    that happens along with the stage budget, which runs the canonical query
+    anyway.
+    """
+    engine, db_path = get_scenario(scenario, version=version)
+    if (db_path, stage) not in _answer_keys:
+        if scenario == 'large':
+            get_stage_budget(stage, version)
+        else:
+            _run_canonical(stage, db_path, engine)
+    return _answer_keys.get((db_path, stage))
+
+@on_warm
+def _measure_budgets(name, db_path):
+    # Budgets and answer keys of a new snapshot are ready before any session uses it
+    for stage in CANONICAL_QUERIES:
+        if name == 'large':
+            get_stage_budget(stage, version=snapshot_version(db_path))
+        else:
+            get_answer_key(stage, name, version=snapshot_version(db_path))
+
+@on_retire
+def _forget_budgets(name, db_path):
+    # Budgets may be keyed by the snapshot's copy for another engine
+    base = os.path.splitext(db_path)[0]
+    for cache in (_stage_budgets, _answer_keys):
+        for key in [key for key in cache if os.path.splitext(key[0])[0] == base]:
+            del cache[key]
+
+@profile_call
+def run_performance_query(query, stage, version=None, policy=NORMAL_POLICY):
+    """
+    Run a player query on the large dataset with cost measurement, with the
+    limits of a load policy (see backend.load_shedding).
+    Queries that blow far past the budget are interrupted.
+    Costs are measured on every run, so nothing is cached, and a policy that
+    only allows cached results raises Overloaded.
+    Returns: (results, matched_row, truncated, cost, budget, within_budget)
+    """
+    if policy['cached_only']:
+        raise Overloaded(policy['retry_after'])
+    budget = get_stage_budget(stage, version)
+    answer_key = get_answer_key(stage, 'large', version)
+    engine, db_path = get_scenario('large', version=version)
+    abort_factor = policy['abort_factor'] or BUDGET_ABORT_FACTOR
+    results, matched_row, truncated, cost = execute_graded_query(
+        query, stage,
+        page_size=policy['page_size'],
+        db_path=db_path,
+        engine=engine,
+        max_vm_steps=budget['vm_steps'] * abort_factor if budget['vm_steps'] is not None else None,
+        max_elapsed_ms=budget['elapsed_ms'] * abort_factor,
+        early_exit=False,
+        max_estimated_cost=policy['max_estimated_cost'],
+        answer_key=answer_key
+    )
+    within_budget = (not cost['aborted'] and
+                     (budget['vm_steps'] is None or cost['vm_steps'] <= budget['vm_steps']) and
+                     cost['elapsed_ms'] <= budget['elapsed_ms'])
+    return results, matched_row, truncated, cost, budget, within_budget
+
+@profile_call
 def update_game_state(current_stage, results, game_state):
     """
     Update game state based on query results and current stage
     Returns: (bool) whether the stage was completed
     """
-    # Check if the current stage is completed
-    stage_completed = check_stage_completion(current_stage, results)
-
-    if stage_completed:
-        if current_stage == 1:
-            # Found the real bomb
-            # Check if results are dictionaries or tuples
-            is_dict_results = isinstance(results[0], dict) if results else False
-
-            if is_dict_results:
-                # For dictionary results
-                for row in results:
-                    if 'Airport' in str(row.get('location', '')):
-                        game_state['bomb_id'] = row.get('bomb_id')
-                        game_state['clues_found'].append("Stage 1 complete: Bomb identified")
-                        break
-            else:
-                # For tuple results (fallback)
-                for row in results:
-                    if 'Airport' in str(row):
-                        game_state['bomb_id'] = row[0] if len(row) > 0 else None
-                        game_state['clues_found'].append("Stage 1 complete: Bomb identified")
-                        break
-
-        elif current_stage == 2:
-            # Found the defusal code
-            game_state['clues_found'].append("Stage 2 complete: Defusal mechanism found")
-
-        elif current_stage == 3:
-            # Found the culprit
-            game_state['clues_found'].append("Stage 3 complete: Suspect identified")
-
-    return stage_completed
+    # Find the row that completes the current stage (if any)
+    matched_row = find_stage_match(current_stage, results)
+
+    return apply_stage_match(current_stage, matched_row, game_state)
+
+@profile_call
+def apply_stage_match(current_stage, matched_row, game_state):
+    """
+    Update game state from a row that was already graded against the stage,
+    e.g. by execute_graded_query while the results were being fetched.
+    Returns: (bool) whether the stage was completed
+    """
+    if matched_row is None:
+        return False
+
+    if current_stage == 1:
+        # Found the real bomb - the matching row is always the Airport bomb
+        if isinstance(matched_row, dict):
+            game_state['bomb_id'] = matched_row.get('bomb_id')
+        else:
+            # For tuple results (fallback)
+            game_state['bomb_id'] = matched_row[0] if len(matched_row) > 0 else None
+        game_state['clues_found'].append("Stage 1 complete: Bomb identified")
+
+    elif current_stage == 2:
+        # Found the defusal code
+        game_state['clues_found'].append("Stage 2 complete: Defusal mechanism found")
+
+    elif current_stage == 3:
+        # Found the culprit
+        game_state['clues_found'].append("Stage 3 complete: Suspect identified")
+
+    return True
@@ -0,0 +1,29 @@
+import time
+
+# Number of queries remembered per session
+HISTORY_SIZE = 20
+
+# Longest query text kept in a history entry
+MAX_HISTORY_QUERY_CHARS = 4000
+
+def add_history_entry(history, query, stage, rows, elapsed_ms, result_ref, max_size=HISTORY_SIZE):
+    """
+    Append a query to a session's history, dropping the oldest entries so
+    the list never holds more than max_size. Entries keep the query text,
+    timing, row count and a reference into the result cache - never the rows.
+    A query longer than MAX_HISTORY_QUERY_CHARS is cut off and marked
+    truncated, and can't be run again from the history. The history is a
+    plain list so it can be saved with the rest of the session state.
+    """
+    history.append({
+        'query': query[:MAX_HISTORY_QUERY_CHARS],
+        'truncated': len(query) > MAX_HISTORY_QUERY_CHARS,
+        'stage': stage,
+        'rows': rows,
+        'elapsed_ms': round(elapsed_ms, 2),
+        'result_ref': result_ref,
+        'at': round(time.time(), 1),
+    })
+    if len(history) > max_size:
+        del history[:len(history) - max_size]
+    return history
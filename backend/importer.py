@@ -0,0 +1,295 @@
+"""
+Bulk import of CSV and Parquet files into a scenario database.
+
+Usage: python -m backend.importer FILE[:TABLE] ... [--db PATH] [--replace]
+
+Each file is loaded into the table named after it (or TABLE). Rows go into
+the four game tables, checked against their declared column types, or into
+a new scenario table whose column types are inferred from the first rows.
+Files are streamed in batches through executemany, so multi-GB files never
+sit in memory. During the load synchronous writes are off and the tables'
+indexes are dropped, then rebuilt (and ANALYZEd) at the end. The import
+runs on a copy of the database that is moved into place once it's done, so
+served files are replaced, never modified (see SQLBOMB_IMMUTABLE_DB in
+backend.db), and a failed import leaves the database unchanged.
+Parquet files need the pyarrow package.
+"""
+import argparse
+import csv
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+from backend.scenario import INSERT_BATCH_SIZE, STANDARD_DB_PATH
+
+# Rows read before inferring the column types of a new table
+INFER_SAMPLE_ROWS = 1000
+
+# An import stops once this many rows failed validation
+MAX_IMPORT_ERRORS = 100
+
+# Page cache used during the load, in KiB
+IMPORT_CACHE_KIB = 262_144
+
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def _affinity(declared_type):
+    """SQLite column affinity of a declared type (INTEGER, REAL or TEXT)"""
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'INTEGER'
+    if any(name in declared_type for name in ('CHAR', 'CLOB', 'TEXT')):
+        return 'TEXT'
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')):
+        return 'REAL'
+    return 'TEXT'
+
+def _convert(value, affinity):
+    """Convert a CSV or Parquet value to a column's type; raises ValueError if it doesn't fit"""
+    if value is None or value == '':
+        return None
+    if affinity == 'INTEGER':
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, int):
+            return value
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not number.is_integer():
+            raise ValueError(f"{value!r} is not an integer")
+        return int(number)
+    if affinity == 'REAL':
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{value!r} is not a number")
+    return value if isinstance(value, str) else str(value)
+
+def _infer_type(values):
+    """Narrowest of INTEGER, REAL and TEXT that fits every sample value"""
+    present = [value for value in values if value is not None and value != '']
+    for affinity in ('INTEGER', 'REAL'):
+        try:
+            for value in present:
+                _convert(value, affinity)
+            return affinity if present else 'TEXT'
+        except ValueError:
+            continue
+    return 'TEXT'
+
+def read_csv(path):
+    """Stream (columns, rows) from a CSV file with a header line"""
+    csv_file = open(path, newline='', encoding='utf-8')
+    reader = csv.reader(csv_file)
+    try:
+        columns = next(reader)
+    except StopIteration:
+        csv_file.close()
+        raise ValueError(f"{path} is empty")
+
+    def rows():
+        with csv_file:
+            yield from reader
+    return [column.strip() for column in columns], rows()
+
+def read_parquet(path):
+    """Stream (columns, rows) from a Parquet file, one record batch at a time"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Importing Parquet files needs the pyarrow package: pip install pyarrow")
+    parquet_file = pq.ParquetFile(path)
+
+    def rows():
+        for batch in parquet_file.iter_batches(batch_size=INSERT_BATCH_SIZE):
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+    return list(parquet_file.schema_arrow.names), rows()
+
+def read_rows(path):
+    """Stream (columns, rows) from a CSV or Parquet file"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        return read_parquet(path)
+    return read_csv(path)
+
+def _table_columns(cursor, table):
+    """{column: affinity} of an existing table, or None if it doesn't exist"""
+    info = cursor.execute(f'PRAGMA table_info("{table}")').fetchall()
+    return {name: _affinity(declared_type) for _, name, declared_type, *_ in info} or None
+
+def _generated_columns(cursor, table):
+    """Generated columns of a table (e.g. access_epoch), which are computed rather than inserted"""
+    return {name for _, name, _, _, _, _, hidden in cursor.execute(f'PRAGMA table_xinfo("{table}")') if hidden in (2, 3)}
+
+def _check_identifier(name):
+    if not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"{name!r} is not a valid table or column name")
+    return name
+
+def _drop_indexes(cursor, table):
+    """Drop a table's indexes, returning the statements that recreate them"""
+    indexes = cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+def import_file(cursor, path, table, replace=False, max_errors=MAX_IMPORT_ERRORS):
+    """
+    Load one file into a table inside the caller's transaction.
+    Returns: (rows imported, rows rejected, first error messages, index statements to rebuild)
+    """
+    columns, rows = read_rows(path)
+    for column in columns:
+        _check_identifier(column)
+
+    table_columns = _table_columns(cursor, table)
+    if table_columns is None:
+        # New scenario table - infer the column types from a sample of the rows
+        sample = list(itertools.islice(rows, INFER_SAMPLE_ROWS))
+        types = [_infer_type([row[i] if i < len(row) else None for row in sample]) for i in range(len(columns))]
+        cursor.execute(f'CREATE TABLE "{table}" ({", ".join(f"{c} {t}" for c, t in zip(columns, types))})')
+        print(f"Created table {table} ({', '.join(f'{c} {t}' for c, t in zip(columns, types))})")
+        rows = itertools.chain(sample, rows)
+        table_columns = dict(zip(columns, types))
+    else:
+        generated = _generated_columns(cursor, table)
+        if generated.intersection(columns):
+            # Files exported with SELECT * include generated columns - they're recomputed on insert
+            keep = [i for i, column in enumerate(columns) if column not in generated]
+            width = len(columns)
+            columns = [columns[i] for i in keep]
+            rows = ([row[i] for i in keep] if len(row) == width else row for row in rows)
+        unknown = [column for column in columns if column not in table_columns]
+        if unknown:
+            raise ValueError(f"{path}: {table} has no column(s) {', '.join(unknown)}")
+
+    affinities = [table_columns[column] for column in columns]
+    index_statements = _drop_indexes(cursor, table)
+    if replace:
+        cursor.execute(f'DELETE FROM "{table}"')
+
+    imported = 0
+    rejected = 0
+    errors = []
+
+    def converted():
+        nonlocal rejected
+        # Line 1 is the header
+        for line, row in enumerate(rows, start=2):
+            try:
+                if len(row) != len(columns):
+                    raise ValueError(f"expected {len(columns)} values, got {len(row)}")
+                converted_row = []
+                for column, value, affinity in zip(columns, row, affinities):
+                    try:
+                        converted_row.append(_convert(value, affinity))
+                    except ValueError as e:
+                        raise ValueError(f"{column}: {e}")
+                yield converted_row
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < 10:
+                    errors.append(f"{os.path.basename(path)} row {line}: {e}")
+                if rejected > max_errors:
+                    raise ValueError(f"{path}: more than {max_errors} invalid rows, first: {'; '.join(errors)}")
+
+    sql = f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    values = converted()
+    while True:
+        batch = list(itertools.islice(values, INSERT_BATCH_SIZE))
+        if not batch:
+            break
+        cursor.executemany(sql, batch)
+        imported += len(batch)
+
+    return imported, rejected, errors, index_statements
+
+def import_files(sources, db_path=STANDARD_DB_PATH, replace=False, max_errors=MAX_IMPORT_ERRORS):
+    """
+    Import (path, table) pairs into a copy of a database, printing rows/sec
+    per file, and move the copy into place. Returns: {table: rows imported}
+    """
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if os.path.exists(db_path):
+        with closing(sqlite3.connect(db_path)) as source, closing(sqlite3.connect(tmp_path)) as copy:
+            source.backup(copy)
+
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute(f"PRAGMA cache_size=-{IMPORT_CACHE_KIB}")
+
+    totals = {}
+    rebuild = {}
+    start = time.perf_counter()
+    try:
+        cursor.execute("BEGIN")
+        for path, table in sources:
+            _check_identifier(table)
+            file_start = time.perf_counter()
+            imported, rejected, errors, index_statements = import_file(
+                cursor, path, table, replace=replace and table not in totals, max_errors=max_errors
+            )
+            rebuild.setdefault(table, []).extend(index_statements)
+            totals[table] = totals.get(table, 0) + imported
+
+            seconds = time.perf_counter() - file_start
+            print(f"{path} -> {table}: {imported:,} rows in {seconds:.1f}s "
+                  f"({imported / max(seconds, 1e-9):,.0f} rows/sec){f', {rejected} rejected' if rejected else ''}")
+            for error in errors:
+                print(f"  {error}")
+
+        index_start = time.perf_counter()
+        for statements in rebuild.values():
+            for statement in statements:
+                cursor.execute(statement)
+        cursor.execute("ANALYZE")
+        cursor.execute("COMMIT")
+        print(f"Rebuilt indexes and statistics in {time.perf_counter() - index_start:.1f}s")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+    total = sum(totals.values())
+    seconds = time.perf_counter() - start
+    print(f"Imported {total:,} rows in {seconds:.1f}s ({total / max(seconds, 1e-9):,.0f} rows/sec)")
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Import CSV or Parquet files into a scenario database")
+    parser.add_argument('sources', nargs='+', help="FILE or FILE:TABLE (the table defaults to the file name)")
+    parser.add_argument('--db', default=STANDARD_DB_PATH)
+    parser.add_argument('--replace', action='store_true', help="delete the tables' existing rows first")
+    parser.add_argument('--max-errors', type=int, default=MAX_IMPORT_ERRORS)
+    args = parser.parse_args()
+
+    sources = []
+    for source in args.sources:
+        path, _, table = source.rpartition(':')
+        if not path or not _IDENTIFIER_RE.match(table):
+            path, table = source, os.path.splitext(os.path.basename(source))[0]
+        sources.append((path, table))
+
+    try:
+        import_files(sources, args.db, replace=args.replace, max_errors=args.max_errors)
+    except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+        print(f"Import failed: {e}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
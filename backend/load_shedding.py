@@ -0,0 +1,257 @@
+"""
+Adaptive load shedding for workshop peaks.
+
+The load controller turns live signals into a pressure value and a load level.
+The signals are the queries waiting on the scheduler, the p95 query latency
+(queue wait included), and CPU and memory use. Each signal is divided by its
+limit, and the largest ratio is the pressure, so 1.0 means a signal is at its
+limit. Higher levels keep the degradations of the lower ones:
+
+  0 normal
+  1 reduced      extras like st.balloons() are skipped and fewer result rows are kept
+  2 constrained  lower cost estimate limit, standard queries get a time limit and
+                 performance queries are interrupted at their budget
+  3 cached_only  only queries with cached results are answered, without queueing
+  4 shedding     no queries, players get a "retry in N seconds" screen
+
+A level is entered as soon as the pressure reaches its threshold. It is left
+one step at a time, once the pressure has stayed below SHED_RELEASE times the
+threshold for SHED_HOLD_SECONDS, so the level doesn't flap around a threshold.
+CPU and memory ratios can't go much above 1, so on their own they only reach
+the first level. Queue depth and latency drive the others.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from backend.db import RESULT_PAGE_SIZE
+from backend.query_cost import MAX_ESTIMATED_COST
+from backend.scheduler import get_scheduler, QUERY_WORKERS, RateLimited
+
+# Set SQLBOMB_LOAD_SHEDDING=0 to always serve at the normal level
+LOAD_SHEDDING = os.environ.get('SQLBOMB_LOAD_SHEDDING', '1') != '0'
+
+# Limits of the signals: queued queries per worker, p95 latency, and the busy share of CPU and memory
+SHED_QUEUE_PER_WORKER = float(os.environ.get('SQLBOMB_SHED_QUEUE', '4'))
+SHED_P95_MS = float(os.environ.get('SQLBOMB_SHED_P95_MS', '2000'))
+SHED_CPU = float(os.environ.get('SQLBOMB_SHED_CPU', '0.9'))
+SHED_MEMORY = float(os.environ.get('SQLBOMB_SHED_MEMORY', '0.9'))
+
+# Pressure that enters levels 1-4, the share of it that has to be reached to step down,
+# and how long the pressure has to stay there first
+SHED_THRESHOLDS = (1.0, 1.5, 2.0, 3.0)
+SHED_RELEASE = 0.7
+SHED_HOLD_SECONDS = float(os.environ.get('SQLBOMB_SHED_HOLD_SECONDS', '10'))
+
+# Latencies of the last SHED_WINDOW_SECONDS count for the p95, and signals are sampled at most
+# every SHED_SAMPLE_SECONDS
+SHED_WINDOW_SECONDS = 15.0
+SHED_SAMPLE_SECONDS = 0.5
+
+# Degraded settings
+SHED_PAGE_SIZE = 100
+SHED_COST_FACTOR = 0.1
+SHED_MAX_ELAPSED_MS = 2000.0
+SHED_ABORT_FACTOR = 1
+
+# "Retry in N seconds" bounds
+MIN_RETRY_SECONDS = 2
+MAX_RETRY_SECONDS = 30
+
+LEVEL_NAMES = ('normal', 'reduced', 'constrained', 'cached_only', 'shedding')
+REDUCED, CONSTRAINED, CACHED_ONLY, SHEDDING = 1, 2, 3, 4
+
+class Overloaded(RateLimited):
+    """Raised when the server sheds a query to get through a load peak"""
+
+    def __init__(self, retry_after):
+        Exception.__init__(self, f"Server busy, retry in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+def load_policy(level, pressure=0.0, retry_after=0):
+    """
+    Settings for queries at a load level.
+    Returns: dict with the level, its name, the pressure, page_size,
+    max_estimated_cost, max_elapsed_ms (standard mode), abort_factor
+    (performance mode), extras, cached_only and retry_after (seconds)
+    """
+    constrained = level >= CONSTRAINED
+    return {
+        'level': level,
+        'name': LEVEL_NAMES[level],
+        'pressure': pressure,
+        'page_size': SHED_PAGE_SIZE if level >= REDUCED else RESULT_PAGE_SIZE,
+        'max_estimated_cost': MAX_ESTIMATED_COST * SHED_COST_FACTOR if constrained else MAX_ESTIMATED_COST,
+        'max_elapsed_ms': SHED_MAX_ELAPSED_MS if constrained else None,
+        'abort_factor': SHED_ABORT_FACTOR if constrained else None,
+        'extras': level < REDUCED,
+        'cached_only': level >= CACHED_ONLY,
+        'retry_after': retry_after,
+    }
+
+NORMAL_POLICY = load_policy(0)
+
+def _cpu_times():
+    """(idle, total) CPU time of the machine in clock ticks, None where /proc/stat is missing"""
+    try:
+        with open('/proc/stat') as stat:
+            fields = [int(value) for value in stat.readline().split()[1:9]]
+    except (OSError, ValueError):
+        return None
+    return fields[3] + fields[4], sum(fields)
+
+def _memory_used():
+    """Share of the machine's memory in use, None where /proc/meminfo is missing"""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            info = {line.split(':')[0]: int(line.split()[1]) for line in meminfo}
+        return 1 - info['MemAvailable'] / info['MemTotal']
+    except (OSError, ValueError, KeyError, IndexError, ZeroDivisionError):
+        return None
+
+class LoadController:
+    """Tracks the load level of the process, see the module docstring"""
+
+    def __init__(self, scheduler=None, enabled=LOAD_SHEDDING):
+        self.scheduler = scheduler or get_scheduler()
+        self.enabled = enabled
+        self.shed = 0
+        self.transitions = 0
+        # Seconds spent at each level
+        self.level_seconds = [0.0] * len(LEVEL_NAMES)
+        self.signals = {}
+        self._level = 0
+        self._pressure = 0.0
+        self._calm_since = None
+        self._sampled = 0.0
+        self._changed = time.monotonic()
+        self._cpu = _cpu_times()
+        self._lock = threading.Lock()
+
+    def _sample(self):
+        """Current ratio of each signal to its limit"""
+        signals = {'queue': self.scheduler.pending() / (QUERY_WORKERS * SHED_QUEUE_PER_WORKER)}
+
+        latencies = sorted(self.scheduler.latencies(SHED_WINDOW_SECONDS))
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            signals['p95'] = p95 * 1000 / SHED_P95_MS
+
+        cpu, self._cpu = self._cpu, _cpu_times()
+        if cpu is not None and self._cpu is not None and self._cpu[1] > cpu[1]:
+            busy = 1 - (self._cpu[0] - cpu[0]) / (self._cpu[1] - cpu[1])
+            signals['cpu'] = busy / SHED_CPU
+
+        memory = _memory_used()
+        if memory is not None:
+            signals['memory'] = memory / SHED_MEMORY
+        return signals
+
+    def _set_level(self, level, now):
+        self.level_seconds[self._level] += now - self._changed
+        self._changed = now
+        self._level = level
+        self.transitions += 1
+        cause = max(self.signals, key=self.signals.get) if self.signals else 'none'
+        print(f"Load level {LEVEL_NAMES[level]} (pressure {self._pressure:.2f}, mostly {cause})")
+
+    def _update(self, now):
+        self.signals = self._sample()
+        self._pressure = max(self.signals.values(), default=0.0)
+        target = sum(self._pressure >= threshold for threshold in SHED_THRESHOLDS)
+        if target > self._level:
+            self._calm_since = None
+            self._set_level(target, now)
+        elif target < self._level and self._pressure < SHED_THRESHOLDS[self._level - 1] * SHED_RELEASE:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= SHED_HOLD_SECONDS:
+                # One step down, the next one needs another calm period
+                self._calm_since = now
+                self._set_level(self._level - 1, now)
+        else:
+            self._calm_since = None
+
+    def _retry_after(self):
+        """Seconds until the queue has probably drained, and the level could step down"""
+        finished = len(self.scheduler.latencies(SHED_WINDOW_SECONDS))
+        rate = finished / SHED_WINDOW_SECONDS
+        pending = self.scheduler.pending()
+        drain = pending / rate if rate else (MAX_RETRY_SECONDS if pending else 0)
+        return max(MIN_RETRY_SECONDS, min(MAX_RETRY_SECONDS, math.ceil(max(drain, SHED_HOLD_SECONDS))))
+
+    def policy(self):
+        """Settings for a query at the current load level (see load_policy)"""
+        if not self.enabled:
+            return NORMAL_POLICY
+        now = time.monotonic()
+        with self._lock:
+            if now - self._sampled >= SHED_SAMPLE_SECONDS:
+                self._sampled = now
+                self._update(now)
+            level, pressure = self._level, self._pressure
+        return load_policy(level, pressure, self._retry_after() if level >= CACHED_ONLY else 0)
+
+    def admit(self):
+        """
+        Settings for a new query.
+        Raises Overloaded while queries are being shed.
+        """
+        policy = self.policy()
+        if policy['level'] >= SHEDDING:
+            self.reject()
+            raise Overloaded(policy['retry_after'])
+        return policy
+
+    def reject(self):
+        """Count a query that was not answered because of the load"""
+        with self._lock:
+            self.shed += 1
+
+    def stats(self):
+        """Current level, pressure and signals, and the shedding counters"""
+        now = time.monotonic()
+        with self._lock:
+            level_seconds = list(self.level_seconds)
+            level_seconds[self._level] += now - self._changed
+            return {
+                'load_level': LEVEL_NAMES[self._level],
+                'load_pressure': round(self._pressure, 2),
+                'load_signals': {name: round(ratio, 2) for name, ratio in self.signals.items()},
+                'shed': self.shed,
+                'load_transitions': self.transitions,
+                'load_level_seconds': {name: round(seconds, 1) for name, seconds in zip(LEVEL_NAMES, level_seconds)},
+            }
+
+def submit_query(session, policy, fn, *args, **kwargs):
+    """
+    Queue fn(*args, policy=policy, **kwargs) for a session on the scheduler.
+    When the policy only allows cached results, fn runs right away instead,
+    so a cached result doesn't wait behind the queue and a miss is shed at
+    once (the Future then holds Overloaded).
+    Returns: a Future with the result
+    """
+    if not policy['cached_only']:
+        return get_scheduler().submit(session, fn, *args, policy=policy, **kwargs)
+    future = Future()
+    try:
+        future.set_result(fn(*args, policy=policy, **kwargs))
+    except Overloaded as e:
+        get_load_controller().reject()
+        future.set_exception(e)
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_load_controller():
+    """Return the process-wide load controller"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = LoadController()
+    return _controller
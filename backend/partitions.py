@@ -0,0 +1,215 @@
+"""
+Time-partitioned access_logs for very large scenarios.
+
+With SQLBOMB_ACCESS_LOG_PARTITION_DAYS set, build_large_database writes
+access_logs into one database file per time range instead of a table in the
+scenario database. The files sit in a directory next to the scenario
+database and are listed in its access_log_partitions table. Every SQLite
+connection to the scenario attaches them and creates a TEMP view
+access_logs over all partitions (UNION ALL), so players query one
+access_logs as before. Each partition can be built, analyzed and backed up on
+its own.
+
+SQLite pushes a query's WHERE terms into every arm of the view, so a time
+filter on access_epoch costs one index seek in each partition outside the
+range, and joins run per partition on the partition's indexes. Aggregates
+and ORDER BY ... LIMIT over the whole view read it as a co-routine and are
+slower than on one table.
+"""
+import datetime
+import glob
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+# Width of an access_logs partition in days, 0 keeps access_logs in one table
+ACCESS_LOG_PARTITION_DAYS = int(os.environ.get('SQLBOMB_ACCESS_LOG_PARTITION_DAYS', '0'))
+
+PARTITIONED_TABLE = 'access_logs'
+PARTITION_COLUMN = 'access_time'
+MANIFEST_TABLE = 'access_log_partitions'
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_INDEX_RE = re.compile(r'^CREATE INDEX (\w+) ON (\w+)\s*\(', re.IGNORECASE)
+
+# Partitions listed in each scenario database, by (path, mtime)
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+def _partition_dirs(db_path):
+    return [path for path in glob.glob(f"{glob.escape(os.path.splitext(db_path)[0])}.*.partitions")
+            if os.path.isdir(path)]
+
+def remove_partitions(db_path, keep=None):
+    """Delete the partition directories of a scenario database, except keep"""
+    for path in _partition_dirs(db_path):
+        if keep is None or os.path.abspath(path) != os.path.abspath(keep):
+            shutil.rmtree(path, ignore_errors=True)
+
+def partition_files(db_path):
+    """Paths of the partition files a scenario database uses"""
+    directory = os.path.dirname(os.path.abspath(db_path))
+    return [os.path.join(directory, file) for _, file in _manifest(db_path)]
+
+class PartitionWriter:
+    """
+    Routes the access_logs rows of a build into partition files attached to
+    the build connection, one per `days` wide time range. Call finish() after
+    ANALYZE and publish() once the connection is closed.
+    """
+
+    def __init__(self, conn, db_path, days, batch_size=10_000):
+        self.conn = conn
+        self.days = days
+        self.batch_size = batch_size
+        self.directory = f"{os.path.splitext(db_path)[0]}.{int(time.time())}{os.getpid()}.partitions"
+        self.build_directory = f"{self.directory}.tmp"
+
+        self.table_sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (PARTITIONED_TABLE,)
+        ).fetchone()[0]
+        # Generated columns (hidden 2 or 3) are computed in each partition
+        self.columns = [name for _, name, _, _, _, _, hidden in conn.execute(f"PRAGMA table_xinfo({PARTITIONED_TABLE})")
+                        if hidden == 0]
+        self.time_index = self.columns.index(PARTITION_COLUMN)
+        self.max_partitions = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+        shutil.rmtree(self.build_directory, ignore_errors=True)
+        os.makedirs(self.build_directory)
+        # Partition key (start day, or None for rows without a time) -> [schema, epoch_from, epoch_to, rows]
+        self.partitions = {}
+        self._pending = {}
+
+    def _key(self, value):
+        try:
+            day = datetime.date.fromisoformat(value[:10]).toordinal() - _EPOCH_ORDINAL
+        except (TypeError, ValueError):
+            return None
+        return day - day % self.days
+
+    def _open(self, key):
+        if len(self.partitions) >= self.max_partitions:
+            raise ValueError(f"access_logs needs more than {self.max_partitions} partitions (SQLite's limit of "
+                             f"attached databases); make them wider with SQLBOMB_ACCESS_LOG_PARTITION_DAYS")
+        if key is None:
+            schema, epoch_from, epoch_to = f"{PARTITIONED_TABLE}_undated", None, None
+        else:
+            start = datetime.date.fromordinal(key + _EPOCH_ORDINAL)
+            schema, epoch_from, epoch_to = f"{PARTITIONED_TABLE}_{start:%Y%m%d}", key * 86400, (key + self.days) * 86400
+        # ATTACH and the pragmas can't run inside the load's transaction
+        self.conn.commit()
+        self.conn.execute("ATTACH DATABASE ? AS " + schema, (os.path.join(self.build_directory, f"{schema}.db"),))
+        self.conn.execute(f"PRAGMA {schema}.journal_mode=OFF")
+        self.conn.execute(f"PRAGMA {schema}.synchronous=OFF")
+        self.conn.execute(self.table_sql.replace(f"CREATE TABLE {PARTITIONED_TABLE}",
+                                                 f"CREATE TABLE {schema}.{PARTITIONED_TABLE}", 1))
+        self.partitions[key] = [schema, epoch_from, epoch_to, 0]
+
+    def _flush(self, key):
+        rows = self._pending.pop(key)
+        if key not in self.partitions:
+            self._open(key)
+        partition = self.partitions[key]
+        self.conn.executemany(
+            f"INSERT INTO {partition[0]}.{PARTITIONED_TABLE} ({', '.join(self.columns)}) "
+            f"VALUES ({', '.join('?' for _ in self.columns)})", rows
+        )
+        partition[3] += len(rows)
+
+    def insert(self, rows):
+        """Insert rows (values of the table's stored columns, log_id included) into their partitions"""
+        for row in rows:
+            key = self._key(row[self.time_index])
+            pending = self._pending.setdefault(key, [])
+            pending.append(row)
+            if len(pending) >= self.batch_size:
+                self._flush(key)
+        for key in list(self._pending):
+            self._flush(key)
+
+    def discard(self):
+        """Delete the partition files of a failed build"""
+        shutil.rmtree(self.build_directory, ignore_errors=True)
+
+    def owns(self, statement):
+        """Whether a CREATE INDEX statement is on the partitioned table"""
+        match = _INDEX_RE.match(statement)
+        return match is not None and match.group(2) == PARTITIONED_TABLE
+
+    def create_index(self, statement):
+        """Create an index of the partitioned table in every partition"""
+        for schema, _, _, _ in self.partitions.values():
+            self.conn.execute(_INDEX_RE.sub(lambda m: f"CREATE INDEX {schema}.{m.group(1)} ON {m.group(2)}(",
+                                            statement, count=1))
+
+    def finish(self):
+        """List the partitions in the scenario database and detach them"""
+        self.conn.execute(
+            f"CREATE TABLE {MANIFEST_TABLE} (schema_name TEXT PRIMARY KEY, file TEXT, "
+            f"epoch_from INTEGER, epoch_to INTEGER, row_count INTEGER)"
+        )
+        self.conn.executemany(
+            f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?)",
+            [(schema, os.path.join(os.path.basename(self.directory), f"{schema}.db"), epoch_from, epoch_to, rows)
+             for schema, epoch_from, epoch_to, rows in self.partitions.values()]
+        )
+        self.conn.commit()
+        for schema, _, _, _ in self.partitions.values():
+            self.conn.execute(f"DETACH DATABASE {schema}")
+
+    def publish(self):
+        """Move the finished partitions into place, before the scenario database that lists them"""
+        os.replace(self.build_directory, self.directory)
+        return self.directory
+
+def _manifest(db_path):
+    """(schema, file) of each partition listed in a scenario database, oldest first"""
+    key = (db_path, os.path.getmtime(db_path))
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+    if manifest is None:
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+            listed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (MANIFEST_TABLE,)
+            ).fetchone()
+            manifest = conn.execute(
+                f"SELECT schema_name, file FROM {MANIFEST_TABLE} ORDER BY epoch_from IS NULL, epoch_from"
+            ).fetchall() if listed else []
+        with _manifests_lock:
+            _manifests[key] = manifest
+    return manifest
+
+def partition_days(db_path):
+    """Width in days of the access_logs partitions of a scenario database, 0 if it has none"""
+    if not _manifest(db_path):
+        return 0
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+        width = conn.execute(f"SELECT MAX(epoch_to - epoch_from) FROM {MANIFEST_TABLE}").fetchone()[0]
+    return (width or 0) // 86400
+
+def attach_partitions(conn, db_path, read_only=False, immutable=False, mmap_size=None):
+    """
+    Attach the access_logs partitions of a scenario database (if it has any)
+    to a connection in the same mode, and create the access_logs view over them
+    """
+    manifest = _manifest(db_path)
+    if not manifest:
+        return conn
+    directory = os.path.dirname(os.path.abspath(db_path))
+    arms = []
+    for schema, file in manifest:
+        path = os.path.join(directory, file)
+        if immutable:
+            path = f"file:{path}?mode=ro&immutable=1"
+        elif read_only:
+            path = f"file:{path}?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (path,))
+        if mmap_size:
+            conn.execute(f"PRAGMA {schema}.mmap_size = {int(mmap_size)}")
+        arms.append(f"SELECT * FROM {schema}.{PARTITIONED_TABLE}")
+    conn.execute(f"CREATE TEMP VIEW {PARTITIONED_TABLE} AS " + " UNION ALL ".join(arms))
+    return conn
@@ -0,0 +1,136 @@
+"""
+Optional profiling of script reruns and backend calls.
+
+Set SQLBOMB_PROFILE_DIR to a directory to turn it on. Every main_app() rerun
+is then run under cProfile with tracemalloc, and writes to that directory:
+    rerun-NNNNN.prof  raw cProfile stats (open with pstats or snakeviz)
+    rerun-NNNNN.txt   top functions, memory growth and backend call timings
+and summary.txt gets one line per rerun.
+
+Backend calls are recorded for the rerun that made them, also when they run
+on a scheduler worker, so concurrent sessions get separate timings. Only one
+cProfile profiler can run at a time, so a rerun that starts while another
+one is profiled gets its backend call timings but no cProfile stats. Memory
+growth is measured for the whole process.
+
+When SQLBOMB_PROFILE_DIR is not set the decorators return the wrapped
+function unchanged, so profiling costs nothing.
+"""
+import contextvars
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+PROFILE_DIR = os.environ.get('SQLBOMB_PROFILE_DIR')
+PROFILE_ENABLED = bool(PROFILE_DIR)
+
+# How many hot spots to list in each rerun report
+TOP_FUNCTIONS = 20
+TOP_ALLOCATIONS = 10
+
+_rerun_counter = itertools.count(1)
+# Backend calls of the current rerun: a list of (name, elapsed ms, memory delta)
+_rerun_calls = contextvars.ContextVar('rerun_calls', default=None)
+_profiler_lock = threading.Lock()
+
+if PROFILE_ENABLED:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tracemalloc.start()
+
+def profile_call(fn):
+    """Record wall time and memory growth of a backend call (no-op when disabled)"""
+    if not PROFILE_ENABLED:
+        return fn
+
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        mem_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            mem_delta = tracemalloc.get_traced_memory()[0] - mem_before
+            calls = _rerun_calls.get()
+            if calls is not None:
+                calls.append((name, elapsed_ms, mem_delta))
+
+    return wrapper
+
+def profile_rerun(fn):
+    """Profile each call of a script entry point and write a report (no-op when disabled)"""
+    if not PROFILE_ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        rerun = next(_rerun_counter)
+        calls = []
+        token = _rerun_calls.set(calls)
+        snapshot_before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile() if _profiler_lock.acquire(blocking=False) else None
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            return fn(*args, **kwargs)
+        finally:
+            # Streamlit ends a rerun by raising, so always write the report
+            if profiler is not None:
+                profiler.disable()
+                _profiler_lock.release()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _rerun_calls.reset(token)
+            _write_report(rerun, profiler, calls, snapshot_before, elapsed_ms)
+
+    return wrapper
+
+def _write_report(rerun, profiler, calls, snapshot_before, elapsed_ms):
+    base = os.path.join(PROFILE_DIR, f"rerun-{rerun:05}")
+    try:
+        stats_text = io.StringIO()
+        stats = None
+        if profiler is not None:
+            profiler.dump_stats(base + '.prof')
+            stats = pstats.Stats(profiler, stream=stats_text)
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        else:
+            stats_text.write("  (not profiled, another rerun was being profiled)\n")
+
+        memory_diff = tracemalloc.take_snapshot().compare_to(snapshot_before, 'lineno')
+        memory_growth = sum(stat.size_diff for stat in memory_diff)
+        calls = list(calls)
+
+        with open(base + '.txt', 'w') as report:
+            report.write(f"Rerun {rerun}: {elapsed_ms:.1f} ms, memory {memory_growth / 1024:+.1f} KiB\n\n")
+            report.write("Backend calls:\n")
+            for name, call_ms, mem_delta in calls:
+                report.write(f"  {name:<50} {call_ms:9.2f} ms {mem_delta / 1024:+9.1f} KiB\n")
+            report.write("\nTop memory growth:\n")
+            for stat in memory_diff[:TOP_ALLOCATIONS]:
+                report.write(f"  {stat}\n")
+            report.write("\nTop functions by cumulative time:\n")
+            report.write(stats_text.getvalue())
+
+        hottest = _hottest_function(stats)
+        backend_ms = sum(call_ms for _, call_ms, _ in calls)
+        with open(os.path.join(PROFILE_DIR, 'summary.txt'), 'a') as summary:
+            summary.write(f"rerun {rerun:05} {elapsed_ms:9.1f} ms total {backend_ms:9.1f} ms backend "
+                          f"{memory_growth / 1024:+9.1f} KiB  hottest: {hottest}\n")
+    except Exception as e:
+        print(f"Profiling error: {e}")
+
+def _hottest_function(stats):
+    """Function with the most time spent in itself (excluding sub-calls)"""
+    if stats is None or not stats.stats:
+        return "-"
+    (filename, line, name), (_, _, tottime, _, _) = max(stats.stats.items(), key=lambda item: item[1][2])
+    return f"{name} ({os.path.basename(filename)}:{line}) {tottime * 1000:.1f} ms"
@@ -0,0 +1,388 @@
+"""
+Cost estimation of SQLite queries before they run.
+
+The estimate walks EXPLAIN QUERY PLAN as nested loops: each SCAN or SEARCH
+multiplies the rows visited so far by the rows it reads per loop, using
+table and index statistics (sqlite_stat1, or COUNT(*) when a table was
+never analyzed). Full scans inside a join, correlated subqueries and temp
+B-trees for sorting are reported as issues, so a rejected query comes with
+a hint on what to fix.
+
+Rows written to temporary storage (materialized CTEs and subqueries, temp
+B-trees for sorting, DISTINCT and window functions) are estimated as well,
+and a query whose intermediates are too big is rejected even when its cost
+is within the limit.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from backend.utils import query_fingerprint
+
+# Queries estimated to visit more rows than this are rejected before they run
+MAX_ESTIMATED_COST = float(os.environ.get('SQLBOMB_MAX_ESTIMATED_COST', '1e9'))
+
+# Queries estimated to materialize more rows than this in one CTE or subquery, or to write more
+# rows than this to temporary storage in total, are rejected before they run
+MAX_MATERIALIZED_ROWS = int(os.environ.get('SQLBOMB_MAX_MATERIALIZED_ROWS', '2000000'))
+MAX_TEMP_ROWS = int(os.environ.get('SQLBOMB_MAX_TEMP_ROWS', '5000000'))
+
+# Tables at least this big are worth a hint when scanned in a loop
+BIG_TABLE_ROWS = 10_000
+
+# Rows per loop assumed when the plan gives nothing better
+DEFAULT_SEARCH_ROWS = 10
+UNKNOWN_TABLE_ROWS = 1_000
+
+# Share of a full-text table's rows an FTS5 MATCH is assumed to return
+FTS_MATCH_FRACTION = 0.01
+
+# Estimates kept per database file and query fingerprint
+ESTIMATE_CACHE_SIZE = 1024
+
+# SQLite VM steps per estimated row visit, roughly, on the large scenario
+COST_STEPS_PER_ROW = 3
+
+# Optional JSONL log of estimated vs actual cost, for tuning the model
+ESTIMATE_LOG = os.environ.get('SQLBOMB_ESTIMATE_LOG')
+
+_LOOP_RE = re.compile(r'^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS (\S+))?(?: USING (.*)| (VIRTUAL TABLE INDEX .*))?$')
+_TABLE_REF_RE = re.compile(r'(?:\bfrom|\bjoin|,)\s+([A-Za-z_]\w*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_LIMIT_RE = re.compile(r'\blimit\s+(\d+)\s*(?:offset\s+(\d+)\s*)?;?\s*$', re.IGNORECASE)
+_AGGREGATE_RE = re.compile(r'\b(?:count|sum|avg|min|max|total|group_concat)\s*\(', re.IGNORECASE)
+_GROUP_BY_RE = re.compile(r'\bgroup\s+by\b', re.IGNORECASE)
+_NESTED_RE = re.compile(r'\([^()]*\)')
+_KEYWORDS = {
+    'where', 'on', 'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural', 'using',
+    'group', 'order', 'limit', 'having', 'union', 'intersect', 'except', 'window', 'as', 'select',
+}
+
+_lock = threading.Lock()
+_table_stats = {}
+_estimates = OrderedDict()
+_stats = {'estimated': 0, 'cached': 0, 'rejected': 0, 'measured': 0, 'within_10x': 0}
+
+def _database_key(conn):
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return path, (os.path.getmtime(path) if path else None)
+
+def _load_table_stats(conn, db_key):
+    """Row counts per table and sqlite_stat1 numbers per index, cached per database file"""
+    with _lock:
+        stats = _table_stats.get(db_key)
+    if stats is not None:
+        return stats
+
+    tables = {}
+    # Virtual tables can't be counted cheaply - external content FTS tables have their content table's rows
+    virtual_content = {}
+    indexes = {}
+    # Tables and indexes of attached databases (e.g. access_logs partitions) are named schema.name,
+    # as in the query plan
+    for _, schema, _ in conn.execute("PRAGMA database_list").fetchall():
+        if schema == 'temp':
+            continue
+        prefix = '' if schema == 'main' else f"{schema}."
+        for name, sql in conn.execute(
+                f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+            tables[prefix + name] = None
+            if sql and sql.upper().startswith('CREATE VIRTUAL TABLE'):
+                content = re.search(r"content\s*=\s*'?(\w+)", sql)
+                virtual_content[prefix + name] = prefix + content.group(1) if content else None
+        has_stat1 = conn.execute(
+            f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone()
+        if has_stat1:
+            for table, index, stat in conn.execute(f"SELECT tbl, idx, stat FROM {schema}.sqlite_stat1"):
+                numbers = [int(n) for n in stat.split() if n.isdigit()]
+                if prefix + table in tables and numbers:
+                    tables[prefix + table] = numbers[0]
+                if index and numbers:
+                    indexes[prefix + index] = numbers
+    for table, rows in tables.items():
+        if rows is None and table not in virtual_content:
+            schema, _, name = table.rpartition('.')
+            tables[table] = conn.execute(f'SELECT COUNT(*) FROM {schema or "main"}."{name}"').fetchone()[0]
+    for table, content in virtual_content.items():
+        if tables[table] is None:
+            tables[table] = tables.get(content) or UNKNOWN_TABLE_ROWS
+
+    stats = {'tables': tables, 'indexes': indexes}
+    with _lock:
+        _table_stats[db_key] = stats
+    return stats
+
+def _table_aliases(query, tables):
+    """Map each alias (and table name) in the query to its table"""
+    aliases = {}
+    for table, alias in _TABLE_REF_RE.findall(_STRING_RE.sub("''", query)):
+        if table not in tables:
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in _KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+def _rows_per_loop(using, table_rows, indexes, prefix=''):
+    """Rows read per loop by a SEARCH, from the index used and its constraints (prefix: schema. of the table)"""
+    using = using or ''
+    constraints = re.search(r'\((.*)\)\s*$', using)
+    terms = constraints.group(1) if constraints else ''
+    equalities = terms.count('=?') - terms.count('>=?') - terms.count('<=?')
+    has_range = bool(re.search(r'[<>]', terms))
+
+    if 'PRIMARY KEY' in using and equalities:
+        rows = 1
+    elif 'AUTOMATIC' in using:
+        rows = DEFAULT_SEARCH_ROWS
+    elif equalities:
+        index = re.search(r'INDEX (\S+)', using)
+        numbers = indexes.get(prefix + index.group(1)) if index else None
+        rows = numbers[equalities] if numbers and len(numbers) > equalities else DEFAULT_SEARCH_ROWS
+    else:
+        rows = table_rows
+    if has_range:
+        rows = max(1, rows / 4)
+    return rows
+
+def _subquery_text(query, name):
+    """The body of the CTE or FROM subquery called name in a query, or None"""
+    cte = re.search(rf'\b{re.escape(name)}\s*(?:\([^()]*\)\s*)?as\s+(?:not\s+)?(?:materialized\s+)?\(',
+                    query, re.IGNORECASE)
+    derived = re.search(rf'\)\s*(?:as\s+)?{re.escape(name)}\b', query, re.IGNORECASE)
+    if cte:
+        # Forward from the opening parenthesis to its closing one
+        depth = 0
+        for end in range(cte.end(), len(query)):
+            depth += {'(': 1, ')': -1}.get(query[end], 0)
+            if depth < 0:
+                return query[cte.end():end]
+    elif derived:
+        # Back from the closing parenthesis before the alias to its opening one
+        depth = 0
+        for start in range(derived.start(), -1, -1):
+            depth += {')': 1, '(': -1}.get(query[start], 0)
+            if depth == 0:
+                return query[start + 1:derived.start()]
+    return None
+
+def _grouped_rows(body, rows, nodes, details, indexes):
+    """Rows a subquery returns once its GROUP BY or aggregate is applied to rows input rows"""
+    # Only the top level of the subquery counts, not the subqueries inside it
+    top = body
+    while '(' in top:
+        top = _NESTED_RE.sub('\0', top)
+    top = top.replace('\0', '()')
+    if not _GROUP_BY_RE.search(top):
+        # SELECT COUNT(*) FROM ... returns one row, unless it is a window function
+        if _AGGREGATE_RE.search(top) and not re.search(r'\bover\b', top, re.IGNORECASE):
+            return 1
+        return rows
+    for node in nodes:
+        if details[node].startswith('USE TEMP B-TREE FOR GROUP BY'):
+            break
+        # Grouping in index order: the index statistics give the rows per group
+        index = re.match(r'SCAN (?:(\w+)\.)?\S+(?: AS \S+)? USING (?:COVERING )?INDEX (\S+)$', details[node])
+        numbers = indexes.get(f"{index.group(1)}.{index.group(2)}" if index.group(1) else index.group(2)) if index else None
+        if numbers and len(numbers) > 1:
+            return max(1, min(rows, numbers[0] / max(numbers[1], 1)))
+    return max(1, rows / DEFAULT_SEARCH_ROWS)
+
+def _estimate_children(node_id, children, details, resolve, derived, issues, temp):
+    """
+    Estimate the cost (row visits) of the plan nodes under node_id, which run
+    as nested loops in order. Rows written to temporary storage are added up
+    in temp. Returns: (cost, output rows)
+    """
+    cost = 0
+    loops = 1
+    loop_names = []
+    other_rows = 0
+
+    for child in children.get(node_id, []):
+        detail = details[child]
+        match = _LOOP_RE.match(detail)
+
+        if detail.startswith('SCAN CONSTANT ROW'):
+            continue
+        if match:
+            kind, name, alias, using, virtual = match.groups()
+            table = resolve(alias or name)
+            if table is None and (alias or name) in derived:
+                table_rows = derived[alias or name]
+            elif table is None:
+                table_rows = UNKNOWN_TABLE_ROWS
+            else:
+                table_rows = resolve.tables[table]
+
+            if virtual and re.search(r':\S*M', virtual):
+                # FTS5 MATCH - answered from the full-text index (idxStr has an M per MATCH term)
+                per_loop = max(DEFAULT_SEARCH_ROWS, table_rows * FTS_MATCH_FRACTION)
+            elif kind == 'SCAN':
+                per_loop = table_rows
+                if loops > 1 and table_rows >= BIG_TABLE_ROWS:
+                    issues.append(
+                        f"{table or name} ({table_rows:,} rows) is scanned in full for each of about "
+                        f"{int(loops):,} rows of {', '.join(loop_names)}. Join it with an ON condition, "
+                        f"ideally on an id column such as bomb_id or suspect_id."
+                    )
+            else:
+                prefix = name.rpartition('.')[0] + '.' if '.' in name else ''
+                per_loop = _rows_per_loop(using, table_rows, resolve.indexes, prefix)
+                if using and 'AUTOMATIC' in using:
+                    # SQLite builds a temporary index over the whole table first
+                    cost += table_rows
+
+            loops *= max(per_loop, 1)
+            cost += loops
+            loop_names.append(table or name)
+        elif detail.startswith(('MATERIALIZE', 'CO-ROUTINE')):
+            sub_cost, sub_rows = _estimate_children(child, children, details, resolve, derived, issues, temp)
+            cost += sub_cost
+            name = detail.split()[-1]
+            body = _subquery_text(resolve.query, name)
+            if body is not None:
+                sub_rows = _grouped_rows(body, sub_rows, children.get(child, []), details, resolve.indexes)
+            derived[name] = sub_rows
+            if detail.startswith('MATERIALIZE'):
+                # Built once in full, whatever LIMIT the outer query has
+                temp['materialize_cost'] += sub_cost
+                temp['materialized_rows'] = max(temp['materialized_rows'], sub_rows)
+                temp['temp_rows'] += sub_rows
+                if sub_rows > MAX_MATERIALIZED_ROWS:
+                    temp['issues'].append(
+                        f"{name} materializes about {int(sub_rows):,} rows (the limit is {MAX_MATERIALIZED_ROWS:,}). "
+                        f"Filter or aggregate inside the WITH clause, before the rows are stored."
+                    )
+        elif detail.startswith('CORRELATED'):
+            sub_cost, _ = _estimate_children(child, children, details, resolve, derived, issues, temp)
+            if loops > 1 and sub_cost >= BIG_TABLE_ROWS:
+                issues.append(
+                    f"A correlated subquery re-runs for each of about {int(loops):,} rows "
+                    f"(about {int(sub_cost):,} row visits each). Rewrite it as a JOIN or GROUP BY."
+                )
+            cost += loops * sub_cost
+        elif detail.startswith('USE TEMP B-TREE'):
+            if loops >= BIG_TABLE_ROWS * 10:
+                what = detail.replace('USE TEMP B-TREE FOR ', '')
+                issues.append(f"{what} sorts about {int(loops):,} rows in a temporary B-tree. Filter before sorting.")
+            cost += loops * math.log2(max(loops, 2))
+            temp['temp_rows'] += loops
+        else:
+            # Subqueries, compound SELECT parts and recursive CTE steps run once each
+            sub_cost, sub_rows = _estimate_children(child, children, details, resolve, derived, issues, temp)
+            cost += sub_cost
+            other_rows += sub_rows
+
+    return cost, (loops if loop_names else other_rows or loops)
+
+def estimate_query_cost(conn, query):
+    """
+    Estimate how many rows a query visits, from its plan and table statistics.
+    Estimates are cached per database file and query fingerprint.
+    Returns: {'cost', 'issues', 'plan', 'materialized_rows', 'temp_rows'}
+    """
+    db_key = _database_key(conn)
+    cache_key = (db_key, query_fingerprint(query))
+    with _lock:
+        estimate = _estimates.get(cache_key)
+        if estimate is not None:
+            _estimates.move_to_end(cache_key)
+            _stats['cached'] += 1
+            return estimate
+
+    stats = _load_table_stats(conn, db_key)
+    plan = conn.execute("EXPLAIN QUERY PLAN " + query).fetchall()
+    children = {}
+    details = {}
+    for node_id, parent, _, detail in plan:
+        children.setdefault(parent, []).append(node_id)
+        details[node_id] = detail
+
+    aliases = _table_aliases(query, stats['tables'])
+    def resolve(name):
+        return aliases.get(name) or (name if name in stats['tables'] else None)
+    resolve.tables = stats['tables']
+    resolve.indexes = stats['indexes']
+    resolve.query = _STRING_RE.sub("''", query)
+
+    issues = []
+    temp = {'materialize_cost': 0, 'materialized_rows': 0, 'temp_rows': 0, 'issues': []}
+    cost, rows = _estimate_children(0, children, details, resolve, {}, issues, temp)
+
+    # A final LIMIT stops the loops early, unless every row has to be sorted or aggregated first
+    text = _STRING_RE.sub("''", query)
+    limit = _LIMIT_RE.search(text)
+    if limit and rows > 0 and not _AGGREGATE_RE.search(text) and not any(
+            details[node].startswith('USE TEMP B-TREE') for node in children.get(0, [])):
+        wanted = int(limit.group(1)) + int(limit.group(2) or 0)
+        if wanted < rows:
+            cost = temp['materialize_cost'] + (cost - temp['materialize_cost']) * wanted / rows
+            issues = []
+    if temp['temp_rows'] > MAX_TEMP_ROWS and not temp['issues']:
+        temp['issues'].append(
+            f"About {int(temp['temp_rows']):,} rows go to temporary storage for sorting and materialized "
+            f"CTEs (the limit is {MAX_TEMP_ROWS:,})."
+        )
+    estimate = {'cost': int(cost), 'issues': temp['issues'] + issues, 'plan': [detail for _, _, _, detail in plan],
+                'materialized_rows': int(temp['materialized_rows']), 'temp_rows': int(temp['temp_rows'])}
+
+    with _lock:
+        _stats['estimated'] += 1
+        _estimates[cache_key] = estimate
+        if len(_estimates) > ESTIMATE_CACHE_SIZE:
+            _estimates.popitem(last=False)
+    return estimate
+
+def rejection_hint(estimate, max_cost=MAX_ESTIMATED_COST):
+    """Return why a query is too expensive to run, or None if it may run"""
+    too_big = (estimate['materialized_rows'] > MAX_MATERIALIZED_ROWS or estimate['temp_rows'] > MAX_TEMP_ROWS)
+    if estimate['cost'] <= max_cost and not too_big:
+        return None
+
+    with _lock:
+        _stats['rejected'] += 1
+    if estimate['cost'] > max_cost:
+        hint = (f"This query would visit about {estimate['cost']:,} rows (the limit is {int(max_cost):,}), "
+                f"so it was not run.")
+    else:
+        hint = "This query's intermediate results would be too big, so it was not run."
+    if estimate['issues']:
+        hint += " " + " ".join(estimate['issues'])
+    else:
+        hint += " Add a WHERE clause or join condition to narrow it down."
+    return hint
+
+def record_estimate_accuracy(query, estimate, cost):
+    """Compare an estimate with the measured cost of a query that ran to the end"""
+    # Small queries cost less than one progress handler tick, so they say nothing about accuracy
+    if cost.get('vm_steps') is None or estimate['cost'] < BIG_TABLE_ROWS:
+        return
+    ratio = cost['vm_steps'] / (max(estimate['cost'], 1) * COST_STEPS_PER_ROW)
+    with _lock:
+        _stats['measured'] += 1
+        if 0.1 <= ratio <= 10:
+            _stats['within_10x'] += 1
+
+    if ESTIMATE_LOG:
+        line = json.dumps({'t': round(time.time(), 3), 'q': query_fingerprint(query), 'est': estimate['cost'],
+                           'steps': cost['vm_steps'], 'ms': round(cost['elapsed_ms'], 3)})
+        with _lock, open(ESTIMATE_LOG, 'a', encoding='utf-8') as log:
+            log.write(line + "\n")
+
+def forget_database(path):
+    """Drop the statistics and estimates cached for a database file"""
+    with _lock:
+        for key in [key for key in _table_stats if key[0] == path]:
+            del _table_stats[key]
+        for key in [key for key in _estimates if key[0][0] == path]:
+            del _estimates[key]
+
+def estimate_stats():
+    """Counters of the estimator: estimates made, cache hits, rejections and accuracy"""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,184 @@
+"""
+Replay a recorded query trace against the backend and report latencies.
+
+Usage:
+    python -m backend.replay TRACE_FILE [--speed 10] [--concurrency 8]
+
+--speed 1 keeps the original pacing, --speed 10 replays ten times faster and
+--speed 0 sends every query as soon as a worker is free. Each session's queries
+are replayed in their recorded order; --concurrency sessions run at once.
+Performance-mode queries run on the large dataset under their stage budget,
+like in the game, and complete only within it. Queries run on the scenario
+snapshot version they were recorded on, while it still exists.
+
+With --scheduled, queries go the way they do in the app: through the load
+controller, the query scheduler and the result cache. Queries shed under load
+are counted as 'shed' and left out of the latencies, and the report shows the
+time spent at each load level (see backend.load_shedding).
+"""
+import argparse
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.db import execute_graded_query
+from backend.game_logic import validate_query, run_performance_query
+from backend.load_shedding import get_load_controller, submit_query, Overloaded
+from backend.result_cache import cached_graded_query
+from backend.scenario import get_scenario
+from backend.scheduler import RateLimited
+from backend.trace import read_trace
+
+# Outcomes that only exist in scheduled replays, never compared with the recording
+SCHEDULED_OUTCOMES = ('shed', 'throttled', 'stopped')
+
+def _outcome(results, matched_row):
+    if not results:
+        return 'empty', 0
+    return ('completed' if matched_row is not None else 'rows'), len(results)
+
+def replay_query(query, stage, mode='standard', version=None):
+    """Run a query the way the game does and return its outcome"""
+    if not validate_query(query):
+        return 'invalid', 0
+
+    if mode == 'performance':
+        results, matched_row, _, _, _, within_budget = run_performance_query(query, stage, version)
+        # Over budget doesn't complete the stage in the game either
+        return _outcome(results, matched_row if within_budget else None)
+    engine, db_path = get_scenario('standard', version=version)
+    results, matched_row, _, _ = execute_graded_query(query, stage, db_path=db_path, engine=engine)
+    return _outcome(results, matched_row)
+
+def replay_scheduled_query(session, query, stage, mode='standard', version=None):
+    """Run a query the way the app does, under the current load level, and return its outcome"""
+    if not validate_query(query):
+        return 'invalid', 0
+
+    try:
+        policy = get_load_controller().admit()
+        if mode == 'performance':
+            results, matched_row, _, cost, _, within_budget = submit_query(
+                session, policy, run_performance_query, query, stage, version).result()
+            matched_row = matched_row if within_budget else None
+        else:
+            results, matched_row, _, cost, _ = submit_query(
+                session, policy, cached_graded_query, query, stage, version=version).result()
+    except Overloaded:
+        return 'shed', 0
+    except RateLimited:
+        return 'throttled', 0
+    if cost.get('rejected') or cost.get('capped'):
+        return 'stopped', 0
+    return _outcome(results, matched_row)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def replay(actions, speed=1.0, concurrency=8, scheduled=False):
+    """
+    Replay the query actions of a trace.
+    Returns: dict with per-query latencies (ms), outcome counts and mismatches,
+    and with scheduled=True the load controller's stats
+    """
+    queries = [a for a in actions if a.get('a') == 'query']
+    if not queries:
+        return {'latencies': [], 'outcomes': Counter(), 'mismatches': 0, 'elapsed': 0.0}
+
+    # Keep each session's queries together and in order
+    sessions = defaultdict(list)
+    for action in sorted(queries, key=lambda a: a['t']):
+        sessions[action['s']].append(action)
+
+    trace_start = min(a['t'] for a in queries)
+    latencies = []
+    outcomes = Counter()
+    mismatches = 0
+    lock = threading.Lock()
+    replay_start = time.perf_counter()
+
+    def run_session(session_actions):
+        nonlocal mismatches
+        for action in session_actions:
+            if speed > 0:
+                # Wait until this query's (scaled) original offset
+                delay = (action['t'] - trace_start) / speed - (time.perf_counter() - replay_start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            start = time.perf_counter()
+            # Entries recorded before the mode was logged replay in standard mode
+            mode, version = action.get('m', 'standard'), action.get('d')
+            if scheduled:
+                outcome, _ = replay_scheduled_query(action['s'], action['q'], action['g'], mode, version)
+            else:
+                outcome, _ = replay_query(action['q'], action['g'], mode, version)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with lock:
+                outcomes[outcome] += 1
+                if outcome in SCHEDULED_OUTCOMES:
+                    continue
+                latencies.append(elapsed_ms)
+                # Recorded errors come from the UI layer and can't be compared
+                if action.get('o') not in ('error', None) and action['o'] != outcome:
+                    mismatches += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run_session, sessions.values()))
+
+    report = {
+        'latencies': latencies,
+        'outcomes': outcomes,
+        'mismatches': mismatches,
+        'elapsed': time.perf_counter() - replay_start,
+    }
+    if scheduled:
+        report['load'] = get_load_controller().stats()
+    return report
+
+def print_report(report):
+    """Print the latency distribution and outcome summary of a replay"""
+    latencies = sorted(report['latencies'])
+    count = len(latencies)
+    print(f"Replayed {count} queries in {report['elapsed']:.2f}s "
+          f"({count / report['elapsed'] if report['elapsed'] else 0:.0f} queries/s)")
+    if not count:
+        return
+
+    print("Latency (ms):")
+    print(f"  mean {sum(latencies) / count:8.2f}")
+    for pct in (50, 90, 95, 99):
+        print(f"  p{pct:<3} {percentile(latencies, pct):8.2f}")
+    print(f"  max  {latencies[-1]:8.2f}")
+
+    print("Outcomes: " + ", ".join(f"{name}={n}" for name, n in sorted(report['outcomes'].items())))
+    print(f"Outcome mismatches vs. recording: {report['mismatches']}")
+
+    load = report.get('load')
+    if load:
+        print(f"Load levels: {load['load_transitions']} changes, " +
+              ", ".join(f"{name} {seconds:.1f}s" for name, seconds in load['load_level_seconds'].items() if seconds))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded query trace against the backend")
+    parser.add_argument('trace', help="trace file written with SQLBOMB_TRACE_FILE")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="time acceleration (1 = original pacing, 0 = no waiting)")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="number of sessions replayed at once")
+    parser.add_argument('--scheduled', action='store_true',
+                        help="run queries the way the app does (load controller, scheduler and result cache)")
+    args = parser.parse_args()
+
+    report = replay(read_trace(args.trace), speed=args.speed, concurrency=args.concurrency,
+                    scheduled=args.scheduled)
+    print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+
+from backend.db import execute_graded_query
+from backend.game_logic import get_answer_key
+from backend.load_shedding import NORMAL_POLICY, Overloaded
+from backend.scenario import get_scenario
+from backend.snapshots import on_retire
+from backend.utils import query_fingerprint
+
+# Bounds of the shared result cache (per process)
+RESULT_CACHE_ENTRIES = int(os.environ.get('SQLBOMB_RESULT_CACHE_ENTRIES', '256'))
+RESULT_CACHE_ROWS = int(os.environ.get('SQLBOMB_RESULT_CACHE_ROWS', '200000'))
+
+class ResultCache:
+    """
+    LRU cache of graded results shared by every session in the process.
+    Entries are keyed by database, query fingerprint and stage, and bounded by
+    both entry count and total cached rows. Cached results are shared, so
+    callers must not modify them.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_ENTRIES, max_rows=RESULT_CACHE_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        rows = len(entry[0])
+        if rows > self.max_rows:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._rows -= len(old[0])
+            self._entries[key] = entry
+            self._rows += rows
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted[0])
+
+    def drop_database(self, db_path):
+        """Drop the entries of a database file (or of its copies for other engines)"""
+        base = os.path.splitext(db_path)[0]
+        with self._lock:
+            for key in [key for key in self._entries if os.path.splitext(key[1])[0] == base]:
+                self._rows -= len(self._entries.pop(key)[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+_cache = ResultCache()
+
+# Results of a retired scenario snapshot can't be asked for again
+on_retire(lambda name, path: _cache.drop_database(path))
+
+def get_result_cache():
+    """Return the process-wide result cache"""
+    return _cache
+
+def cached_graded_query(query, stage, scenario='standard', version=None, policy=NORMAL_POLICY):
+    """
+    execute_graded_query through the shared result cache, on the scenario
+    snapshot version the session started on (see backend.snapshots), with the
+    limits of a load policy (see backend.load_shedding).
+    Results that don't complete the stage carry "how close am I" feedback in
+    cost['feedback'] (see backend.feedback), which is cached along with them.
+    On a hit the cost dict is a copy with 'cached': True. A cached result
+    with fewer rows than the policy's page size is only used when the result
+    wasn't cut off.
+    Raises Overloaded on a miss when the policy only allows cached results.
+    Returns: (results, matched_row, truncated, cost, fingerprint)
+    """
+    engine, db_path = get_scenario(scenario, version=version)
+    fingerprint = query_fingerprint(query)
+    # The file's modification time keeps results of a rebuilt database apart
+    key = (engine.name, db_path, os.path.getmtime(db_path), fingerprint, stage)
+    page_size = policy['page_size']
+
+    entry = _cache.get(key)
+    if entry is not None and (not entry[2] or len(entry[0]) >= page_size or policy['cached_only']):
+        results, matched_row, truncated, cost = entry
+        if len(results) > page_size:
+            results, truncated = results[:page_size], True
+        return results, matched_row, truncated, {**cost, 'cached': True}, fingerprint
+    if policy['cached_only']:
+        raise Overloaded(policy['retry_after'])
+
+    results, matched_row, truncated, cost = execute_graded_query(
+        query, stage, page_size=page_size, db_path=db_path, engine=engine,
+        max_estimated_cost=policy['max_estimated_cost'], max_elapsed_ms=policy['max_elapsed_ms'],
+        answer_key=get_answer_key(stage, scenario, version)
+    )
+    if cost['aborted'] and policy['max_elapsed_ms'] is not None:
+        cost['capped'] = True
+        cost['error'] = (f"The server is busy, so queries are stopped after {policy['max_elapsed_ms'] / 1000:.0f}s "
+                         f"for now. Narrow the query down or try again in a minute.")
+    if not cost.get('error') and not cost['aborted']:
+        _cache.put(key, (results, matched_row, truncated, cost))
+    return results, matched_row, truncated, cost, fingerprint
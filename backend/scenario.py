@@ -0,0 +1,365 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from backend.engines import get_engine, copy_sqlite_to_duckdb
+from backend.partitions import ACCESS_LOG_PARTITION_DAYS, PartitionWriter, partition_days, remove_partitions
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+
+# schema.sql and sample_data.sql that scenario databases are built from
+SCENARIO_SOURCE_DIR = os.environ.get('SQLBOMB_SCENARIO_DIR', DATABASE_DIR)
+
+# Serve versioned snapshots that are rebuilt when the sources change (see backend.snapshots)
+HOT_RELOAD = os.environ.get('SQLBOMB_HOT_RELOAD') == '1'
+
+# Standard (tiny) dataset and the large dataset used by the performance challenge mode
+STANDARD_DB_PATH = os.path.join(DATABASE_DIR, 'tictictomb.db')
+LARGE_DB_PATH = os.path.join(DATABASE_DIR, 'tictictomb_large.db')
+
+# Query engine per scenario: "sqlite" or "duckdb" (a DuckDB copy of the same data)
+SCENARIO_ENGINES = {
+    'standard': os.environ.get('SQLBOMB_STANDARD_ENGINE', 'sqlite'),
+    'large': os.environ.get('SQLBOMB_LARGE_ENGINE', 'sqlite'),
+}
+
+# Tables copied between engines
+SCENARIO_TABLES = ['bombs', 'bomb_readings', 'bomb_components', 'suspects', 'access_logs', 'intel_notes']
+
+# FTS5 tables over scenario text (see schema.sql); each is kept in sync by triggers named <table>_*
+FULL_TEXT_TABLES = ['intel_notes_fts']
+
+# Row counts of the large dataset, scaled by SQLBOMB_LARGE_SCALE (e.g. 0.1 or 10)
+LARGE_SCALE = float(os.environ.get('SQLBOMB_LARGE_SCALE', '1'))
+LARGE_BOMBS = 100_000
+LARGE_SUSPECTS = 20_000
+LARGE_ACCESS_LOGS = 1_000_000
+LARGE_INTEL_NOTES = 300_000
+
+# Fixed seed so every build of the large dataset is identical
+SCENARIO_SEED = 1337
+
+# Rows are generated and inserted in batches of this size
+INSERT_BATCH_SIZE = 10_000
+
+# Indexes that make efficient solutions possible on the large dataset
+LARGE_INDEXES = [
+    "CREATE INDEX idx_bombs_signal ON bombs(signal_strength)",
+    "CREATE INDEX idx_components_bomb ON bomb_components(bomb_id)",
+    "CREATE INDEX idx_access_logs_bomb ON access_logs(bomb_id, access_epoch)",
+    "CREATE INDEX idx_access_logs_suspect ON access_logs(suspect_id)",
+]
+
+PLACES = ['Warehouse', 'Train Station', 'Shopping Mall', 'City Hall', 'Bus Terminal',
+          'Stadium', 'Hospital', 'Harbor', 'Library', 'Power Plant', 'Airport Parking',
+          'University', 'Museum', 'Bridge', 'Office Tower']
+SIGNATURE_PREFIXES = ['A7X', 'B9Z', 'C3Y', 'D5F', 'E2K']
+COMPONENTS = ['Timer', 'Wiring', 'Detonator', 'Circuit']
+MATERIALS = ['Plastic', 'Copper', 'Aluminum', 'Metal', 'Silver', 'Steel', 'Iron', 'Titanium', 'Gold']
+ACTIONS = ['Maintenance', 'Inspection', 'Testing', 'Installation']
+ITEMS = ['toolbox', 'backpack', 'laptop bag', 'crate', 'parcel', 'thermos']
+# Aliases are followed by a number in generated notes, so most of them are rare search terms
+ALIASES = ['Kestrel', 'Lotus', 'Viper', 'Nomad', 'Falcon', 'Ghost', 'Raven', 'Cobalt', 'Jackal', 'Orchid']
+NOTE_TEMPLATES = [
+    'Informant overheard the alias "{alias}" near the {place}',
+    '{name} seen leaving the {place} with a {item}',
+    'Camera footage at the {place} shows someone carrying a {item}, possibly {name}',
+    'Badge of {name} used at the {place} gate, cleared by security',
+    'Contractor registered as "{alias}" delivered a {item} to the {place}',
+    'Routine check at the {place}, nothing unusual reported',
+]
+# No "Sarah" or "Connor" so no decoy suspect can be mistaken for the culprit
+FIRST_NAMES = ['John', 'Mike', 'Emily', 'David', 'Lisa', 'Anna', 'James', 'Maria', 'Omar',
+               'Priya', 'Chen', 'Lucas', 'Nina', 'Ivan', 'Grace', 'Tom']
+LAST_NAMES = ['Doe', 'Johnson', 'Chen', 'Miller', 'Wong', 'Smith', 'Garcia', 'Patel',
+              'Kim', 'Novak', 'Brown', 'Silva', 'Ito', 'Khan', 'Weber', 'Rossi']
+
+def _random_time(rng, day_from=1, day_to=8):
+    """Random 'YYYY-MM-DD HH:MM' timestamp in March 2025"""
+    return f"2025-03-{rng.randint(day_from, day_to):02} {rng.randint(0, 23):02}:{rng.choice((0, 15, 30, 45)):02}"
+
+def _generate_bombs(rng, count):
+    """Decoy bombs - none of them satisfies the stage 1 objective"""
+    for n in range(count):
+        location = f"{rng.choice(PLACES)} {n + 1}"
+        prefix = rng.choice(SIGNATURE_PREFIXES)
+        if 'Airport' in location and prefix == 'B9Z':
+            prefix = 'B9Y'
+        base_voltage = rng.randint(205, 222)
+        base_freq = rng.randint(10, 39) / 10
+        yield (
+            location,
+            ','.join(str(base_voltage + rng.randint(-3, 3)) for _ in range(3)),
+            _random_time(rng, 1, 7),
+            rng.randint(50, 99),
+            rng.randint(40, 99),
+            ','.join(f"{base_freq + rng.choice((-0.1, 0, 0.1)):.1f}" for _ in range(3)),
+            f"{prefix}{rng.randint(10, 99)}",
+        )
+
+def _generate_components(rng, first_bomb_id, last_bomb_id):
+    """Components of the decoy bombs"""
+    for bomb_id in range(first_bomb_id, last_bomb_id + 1):
+        for component in COMPONENTS[:rng.randint(3, 4)]:
+            yield (bomb_id, component, rng.choice(MATERIALS), f"{rng.randint(100, 999)}")
+
+def _generate_suspects(rng, count):
+    """Decoy suspects"""
+    for _ in range(count):
+        yield (
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            rng.randint(1, 5),
+            _random_time(rng),
+        )
+
+def _generate_access_logs(rng, count, suspect_count, bomb_count):
+    """Access logs - only Sarah Connor's original log installs the Airport bomb"""
+    for _ in range(count):
+        bomb_id = rng.randint(1, bomb_count)
+        action = rng.choice(ACTIONS)
+        if bomb_id == 2 and action == 'Installation':
+            action = 'Inspection'
+        yield (rng.randint(1, suspect_count), bomb_id, _random_time(rng), action)
+
+def _generate_intel_notes(rng, count, suspect_count, bomb_count):
+    """Free-text notes for full-text search - none of them mentions the alias Spade"""
+    for _ in range(count):
+        note = rng.choice(NOTE_TEMPLATES).format(
+            alias=f"{rng.choice(ALIASES)}{rng.randint(1, 999)}",
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            place=rng.choice(PLACES).lower(),
+            item=rng.choice(ITEMS),
+        )
+        yield (rng.randint(1, suspect_count), rng.choice((None, rng.randint(1, bomb_count))), _random_time(rng), note)
+
+def _insert_batches(cursor, sql, rows):
+    """executemany in fixed-size batches so generators are never fully materialized"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+
+def _load_sources(cursor):
+    """Run schema.sql and sample_data.sql from the scenario sources"""
+    with open(os.path.join(SCENARIO_SOURCE_DIR, 'schema.sql')) as schema_file:
+        cursor.executescript(schema_file.read())
+    with open(os.path.join(SCENARIO_SOURCE_DIR, 'sample_data.sql')) as data_file:
+        cursor.executescript(data_file.read())
+
+def build_standard_database(db_path=STANDARD_DB_PATH):
+    """Build the standard dataset into a temporary file and move it into place"""
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        _load_sources(conn.cursor())
+        conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return db_path
+
+def build_large_database(db_path=LARGE_DB_PATH, scale=LARGE_SCALE, seed=SCENARIO_SEED,
+                         partition_days=ACCESS_LOG_PARTITION_DAYS):
+    """
+    Build the large dataset: the original sample data plus generated decoys,
+    so the stage solutions are unchanged. The database is written to a
+    temporary file and moved into place, so readers never see a partial build.
+    With partition_days, access_logs is split into files of that many days
+    (see backend.partitions).
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    bombs = int(LARGE_BOMBS * scale)
+    suspects = int(LARGE_SUSPECTS * scale)
+    access_logs = int(LARGE_ACCESS_LOGS * scale)
+
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    partitions = None
+    conn = sqlite3.connect(tmp_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
+
+        _load_sources(cursor)
+        # Indexes from schema.sql are rebuilt after the load, which is much faster than maintaining them
+        schema_indexes = cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        ).fetchall()
+        for name, _ in schema_indexes:
+            cursor.execute(f"DROP INDEX {name}")
+        # Full-text indexes too, which are much faster to rebuild in one go than row by row from triggers
+        sync_triggers = [
+            (name, sql) for name, sql in cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+            if name.startswith(tuple(f"{table}_" for table in FULL_TEXT_TABLES))
+        ]
+        for name, _ in sync_triggers:
+            cursor.execute(f"DROP TRIGGER {name}")
+
+        sample_bombs = cursor.execute("SELECT COUNT(*) FROM bombs").fetchone()[0]
+        sample_suspects = cursor.execute("SELECT COUNT(*) FROM suspects").fetchone()[0]
+        sample_logs = cursor.execute("SELECT COALESCE(MAX(log_id), 0) FROM access_logs").fetchone()[0]
+
+        if partition_days:
+            # The sample logs move to the partitions, and the table is replaced by a view when connecting
+            partitions = PartitionWriter(conn, db_path, partition_days, INSERT_BATCH_SIZE)
+            partitions.insert(cursor.execute(f"SELECT {', '.join(partitions.columns)} FROM access_logs").fetchall())
+            cursor.execute("DROP TABLE access_logs")
+
+        _insert_batches(
+            cursor,
+            "INSERT INTO bombs (location, voltage_readings, last_maintained, signal_strength, "
+            "battery_level, frequency_pattern, device_signature) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            _generate_bombs(rng, bombs)
+        )
+        _insert_batches(
+            cursor,
+            "INSERT INTO bomb_components (bomb_id, component_name, material, activation_code) VALUES (?, ?, ?, ?)",
+            _generate_components(rng, sample_bombs + 1, sample_bombs + bombs)
+        )
+        _insert_batches(
+            cursor,
+            "INSERT INTO suspects (name, access_level, last_login) VALUES (?, ?, ?)",
+            _generate_suspects(rng, suspects)
+        )
+        logs = _generate_access_logs(rng, access_logs, sample_suspects + suspects, sample_bombs + bombs)
+        if partitions:
+            partitions.insert((log_id, *log) for log_id, log in enumerate(logs, sample_logs + 1))
+        else:
+            _insert_batches(
+                cursor,
+                "INSERT INTO access_logs (suspect_id, bomb_id, access_time, action_performed) VALUES (?, ?, ?, ?)",
+                logs
+            )
+        _insert_batches(
+            cursor,
+            "INSERT INTO intel_notes (suspect_id, bomb_id, noted_at, note) VALUES (?, ?, ?, ?)",
+            _generate_intel_notes(rng, int(LARGE_INTEL_NOTES * scale), sample_suspects + suspects, sample_bombs + bombs)
+        )
+        conn.commit()
+
+        for statement in [sql for _, sql in schema_indexes + sync_triggers] + LARGE_INDEXES:
+            if partitions and partitions.owns(statement):
+                partitions.create_index(statement)
+            else:
+                cursor.execute(statement)
+        for table in FULL_TEXT_TABLES:
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+        # Also analyzes the attached partitions
+        cursor.execute("ANALYZE")
+        conn.commit()
+        if partitions:
+            partitions.finish()
+    except BaseException:
+        # A failed build leaves nothing behind
+        conn.close()
+        os.remove(tmp_path)
+        if partitions:
+            partitions.discard()
+        raise
+    finally:
+        conn.close()
+
+    partition_dir = partitions.publish() if partitions else None
+    os.replace(tmp_path, db_path)
+    # Connections opened before the swap already have the old partitions attached
+    remove_partitions(db_path, keep=partition_dir)
+    print(f"Built large dataset at {db_path} in {time.perf_counter() - start:.1f}s")
+    return db_path
+
+def _table_columns(conn):
+    return {table: [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")] for table in SCENARIO_TABLES}
+
+def _schema_outdated(db_path):
+    """Whether a database was built from an older schema.sql (missing tables or columns)"""
+    with closing(sqlite3.connect(':memory:')) as current:
+        with open(os.path.join(SCENARIO_SOURCE_DIR, 'schema.sql')) as schema_file:
+            current.executescript(schema_file.read())
+        try:
+            # Connected through the engine, so partitioned tables are seen through their view
+            with closing(get_engine('sqlite').connect(db_path, read_only=True)) as built:
+                return _table_columns(built) != _table_columns(current)
+        except sqlite3.Error:
+            # e.g. a partition file is missing
+            return True
+
+# Databases found up to date, by (path, mtime, schema.sql mtime), so the check runs once per build
+_up_to_date = set()
+_ensure_lock = threading.Lock()
+
+def _ensure_database(db_path, build, outdated):
+    """Build a scenario database with build(db_path) unless it was checked since its last build"""
+    schema_path = os.path.join(SCENARIO_SOURCE_DIR, 'schema.sql')
+    if os.path.exists(db_path) and (db_path, os.path.getmtime(db_path), os.path.getmtime(schema_path)) in _up_to_date:
+        return db_path
+    # One thread checks (and builds), the others wait for it
+    with _ensure_lock:
+        if not os.path.exists(db_path) or outdated(db_path):
+            build(db_path)
+        _up_to_date.add((db_path, os.path.getmtime(db_path), os.path.getmtime(schema_path)))
+    return db_path
+
+def ensure_standard_database(db_path=STANDARD_DB_PATH):
+    """Build the standard dataset if it doesn't exist yet or was built from an older schema"""
+    def outdated(path):
+        if _schema_outdated(path):
+            print(f"{path} was built from an older schema.sql, rebuilding it (imported data is lost)")
+            return True
+        return False
+    return _ensure_database(db_path, build_standard_database, outdated)
+
+def ensure_large_database(db_path=LARGE_DB_PATH):
+    """
+    Build the large dataset if it doesn't exist yet, was built from an older
+    schema or is partitioned differently than SQLBOMB_ACCESS_LOG_PARTITION_DAYS
+    """
+    return _ensure_database(db_path, build_large_database, lambda path: (
+        _schema_outdated(path) or partition_days(path) != ACCESS_LOG_PARTITION_DAYS))
+
+def ensure_duckdb_copy(sqlite_path):
+    """Return the DuckDB copy of a scenario database, creating it if needed"""
+    duckdb_path = os.path.splitext(sqlite_path)[0] + '.duckdb'
+    if not os.path.exists(duckdb_path) or os.path.getmtime(duckdb_path) < os.path.getmtime(sqlite_path):
+        start = time.perf_counter()
+        copy_sqlite_to_duckdb(sqlite_path, duckdb_path, SCENARIO_TABLES)
+        print(f"Copied {sqlite_path} to DuckDB in {time.perf_counter() - start:.1f}s")
+    return duckdb_path
+
+def get_scenario(name, engine_name=None, version=None):
+    """
+    Return (engine, db_path) for a scenario ("standard" or "large"), building
+    the scenario data on first use. engine_name overrides SCENARIO_ENGINES.
+    With hot reload on, db_path is the snapshot of the given version (the
+    current one if version is None or no longer exists).
+    """
+    engine_name = engine_name or SCENARIO_ENGINES[name]
+    if HOT_RELOAD:
+        from backend.snapshots import get_snapshots
+        sqlite_path = get_snapshots().path_for(name, version)
+    elif name == 'large':
+        sqlite_path = ensure_large_database()
+    else:
+        sqlite_path = ensure_standard_database()
+
+    if engine_name == 'duckdb':
+        return get_engine('duckdb'), ensure_duckdb_copy(sqlite_path)
+    return get_engine(engine_name), sqlite_path
@@ -0,0 +1,171 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+# Per-session rate limit: sustained queries per second and burst size
+RATE_LIMIT = float(os.environ.get('SQLBOMB_RATE_LIMIT', '1'))
+RATE_BURST = int(os.environ.get('SQLBOMB_RATE_BURST', '5'))
+
+# Number of queries executed at once, and queries a session may have waiting
+QUERY_WORKERS = int(os.environ.get('SQLBOMB_QUERY_WORKERS', str(min(4, os.cpu_count() or 1))))
+MAX_PENDING_PER_SESSION = int(os.environ.get('SQLBOMB_MAX_PENDING', '2'))
+
+# Drop idle buckets once more than this many sessions are tracked
+MAX_TRACKED_SESSIONS = 10_000
+
+# Query latencies (queue wait included) kept for percentiles
+LATENCY_SAMPLES = 1000
+
+class RateLimited(Exception):
+    """Raised when a session has to wait before running another query"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """Token bucket per session: `rate` tokens per second, up to `burst` saved up"""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.throttled = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, session):
+        """
+        Take a token for the session.
+        Returns: 0.0 if the query may run, otherwise the seconds until it may
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(session, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens >= 1:
+                self._buckets[session] = (tokens - 1, now)
+                if len(self._buckets) > MAX_TRACKED_SESSIONS:
+                    self._prune(now)
+                return 0.0
+
+            self._buckets[session] = (tokens, now)
+            self.throttled += 1
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket at all
+        full_after = self.burst / self.rate
+        for session, (_, last) in list(self._buckets.items()):
+            if now - last >= full_after:
+                del self._buckets[session]
+
+class FairScheduler:
+    """
+    Run queries on a small pool of worker threads, taking turns between
+    sessions (round-robin) so one busy session can't starve the others.
+    """
+
+    def __init__(self, workers=QUERY_WORKERS, max_pending=MAX_PENDING_PER_SESSION):
+        self.max_pending = max_pending
+        self.executed = 0
+        self.rejected = 0
+        self._queues = OrderedDict()
+        # (finish time, seconds from submit to finish) of recent queries
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"query-worker-{i}", daemon=True).start()
+
+    def submit(self, session, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for a session. It runs in a copy of the
+        caller's context (contextvars), e.g. for per-rerun profiling.
+        Returns: a Future with the result
+        Raises RateLimited if the session already has max_pending queries waiting.
+        """
+        future = Future()
+        with self._cond:
+            queue = self._queues.get(session)
+            if queue is None:
+                queue = self._queues[session] = deque()
+            elif len(queue) >= self.max_pending:
+                self.rejected += 1
+                raise RateLimited(1.0)
+            queue.append((future, contextvars.copy_context().run, (fn,) + args, kwargs, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def run(self, session, fn, *args, **kwargs):
+        """Queue a call for a session and wait for its result"""
+        return self.submit(session, fn, *args, **kwargs).result()
+
+    def pending(self):
+        """Number of queued queries across all sessions"""
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def latencies(self, window):
+        """Seconds from submit to finish of the queries that finished in the last `window` seconds"""
+        since = time.monotonic() - window
+        with self._cond:
+            return [seconds for finished, seconds in self._latencies if finished >= since]
+
+    def _next_job(self):
+        with self._cond:
+            while not self._queues:
+                self._cond.wait()
+            # Take one job from the session at the front, then send it to the back
+            session, queue = self._queues.popitem(last=False)
+            job = queue.popleft()
+            if queue:
+                self._queues[session] = queue
+            return job
+
+    def _worker(self):
+        while True:
+            future, fn, args, kwargs, submitted = self._next_job()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            with self._cond:
+                self.executed += 1
+                now = time.monotonic()
+                self._latencies.append((now, now - submitted))
+
+_rate_limiter = None
+_scheduler = None
+_init_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter"""
+    global _rate_limiter
+    with _init_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+def get_scheduler():
+    """Return the process-wide query scheduler (workers start on first use)"""
+    global _scheduler
+    with _init_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+    return _scheduler
+
+def scheduler_stats():
+    """Counters for monitoring throttling and queueing"""
+    limiter = get_rate_limiter()
+    scheduler = get_scheduler()
+    return {
+        'throttled': limiter.throttled,
+        'rejected': scheduler.rejected,
+        'executed': scheduler.executed,
+        'pending': scheduler.pending(),
+    }
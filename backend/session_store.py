@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from backend.profiling import profile_call
+
+# Session database file path (shared by every app process on this machine)
+SESSION_DB_PATH = os.environ.get(
+    'SQLBOMB_SESSION_DB',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'sessions.db')
+)
+
+# Which store to use: "sqlite" (default, shared across processes) or "memory"
+SESSION_STORE = os.environ.get('SQLBOMB_SESSION_STORE', 'sqlite')
+
+# Session keys that make up a player's progress
+SESSION_KEYS = ('game_state', 'verification_needed', 'verification_stage')
+
+def new_player_token():
+    """Create a new random player token"""
+    return uuid.uuid4().hex
+
+class SessionStore:
+    """Interface for stores that keep player progress outside the app process"""
+
+    def load(self, token):
+        """Return the saved session dict for a token, or None"""
+        raise NotImplementedError
+
+    def save(self, token, session):
+        """Save the session dict for a token"""
+        raise NotImplementedError
+
+    def delete(self, token):
+        """Forget a token"""
+        raise NotImplementedError
+
+    def scenario_versions(self, since):
+        """Scenario snapshot versions of the sessions saved since a time.time()"""
+        raise NotImplementedError
+
+class MemorySessionStore(SessionStore):
+    """Process-local store - only useful for a single app process"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._updated = {}
+        self._lock = threading.Lock()
+
+    def load(self, token):
+        with self._lock:
+            data = self._sessions.get(token)
+        return json.loads(data) if data else None
+
+    def save(self, token, session):
+        data = json.dumps(session, default=str)
+        with self._lock:
+            self._sessions[token] = data
+            self._updated[token] = time.time()
+
+    def delete(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+            self._updated.pop(token, None)
+
+    def scenario_versions(self, since):
+        with self._lock:
+            recent = [data for token, data in self._sessions.items() if self._updated[token] >= since]
+        return {json.loads(data).get('game_state', {}).get('scenario_version') for data in recent} - {None}
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store sessions as JSON in a SQLite database in WAL mode, so several
+    app processes can read and write player progress concurrently.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        # Create the table once up front
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _connection(self):
+        # One connection per thread - sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @profile_call
+    def load(self, token):
+        row = self._connection().execute(
+            "SELECT state FROM sessions WHERE token = ?", (token,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @profile_call
+    def save(self, token, session):
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO sessions (token, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(token) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (token, json.dumps(session, default=str), time.time())
+        )
+        conn.commit()
+
+    def delete(self, token):
+        conn = self._connection()
+        conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        conn.commit()
+
+    def scenario_versions(self, since):
+        rows = self._connection().execute(
+            "SELECT DISTINCT json_extract(state, '$.game_state.scenario_version') FROM sessions "
+            "WHERE updated_at >= ?", (since,)
+        )
+        return {version for version, in rows if version is not None}
+
+_store = None
+
+def get_session_store():
+    """Return the configured session store (created on first use)"""
+    global _store
+    if _store is None:
+        if SESSION_STORE == 'memory':
+            _store = MemorySessionStore()
+        else:
+            _store = SQLiteSessionStore()
+    return _store
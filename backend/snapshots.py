@@ -0,0 +1,301 @@
+"""
+Hot reload of scenario data through versioned, immutable snapshots.
+
+A snapshot is a read-only database file named after a hash of the sources
+it was built from (schema.sql, sample_data.sql and, for the large scenario,
+the generator settings). A watcher thread polls the sources; when their hash
+changes it builds the new snapshot in a child process, so the serving
+process never stalls on the build, warms it up, then switches new sessions
+to it. Sessions keep the version they started on (game_state
+['scenario_version']) until they finish, and caches keyed by a snapshot's
+path are dropped only when that snapshot is retired.
+
+python -m backend.snapshots NAME PATH builds one snapshot (used by the watcher).
+"""
+import glob
+import hashlib
+import shutil
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import closing
+
+from backend.engines import get_engine
+from backend.partitions import ACCESS_LOG_PARTITION_DAYS, partition_files, remove_partitions
+from backend.query_cost import forget_database
+from backend.scenario import (
+    DATABASE_DIR, SCENARIO_SOURCE_DIR, SCENARIO_TABLES, SCENARIO_ENGINES, LARGE_SCALE, SCENARIO_SEED,
+    build_standard_database, build_large_database, ensure_duckdb_copy,
+)
+from backend.session_store import get_session_store
+
+SNAPSHOT_DIR = os.environ.get('SQLBOMB_SNAPSHOT_DIR', os.path.join(DATABASE_DIR, 'snapshots'))
+
+# How often the watcher checks the scenario sources, in seconds
+SNAPSHOT_POLL_INTERVAL = float(os.environ.get('SQLBOMB_SNAPSHOT_POLL', '2'))
+
+# Old snapshots are retired once unused this long, and deleted once replaced this long ago. A
+# snapshot that a session saved within SNAPSHOT_RETENTION still uses is kept.
+SNAPSHOT_IDLE_RETIRE = 30 * 60
+SNAPSHOT_RETENTION = 6 * 3600
+
+# A build lock older than this is left over from a crashed build
+STALE_BUILD_LOCK = 15 * 60
+
+SCENARIO_SOURCES = {
+    'standard': ['schema.sql', 'sample_data.sql'],
+    'large': ['schema.sql', 'sample_data.sql'],
+}
+
+# Called with (name, db_path) before a snapshot goes live, and after it is retired
+_warm_hooks = []
+_retire_hooks = []
+
+def on_warm(hook):
+    """Register a function to prepare a new snapshot before sessions use it"""
+    _warm_hooks.append(hook)
+    return hook
+
+def on_retire(hook):
+    """Register a function that drops what was cached for a retired snapshot"""
+    _retire_hooks.append(hook)
+    return hook
+
+def source_version(name):
+    """Content hash of everything a scenario snapshot is built from"""
+    digest = hashlib.sha256(name.encode())
+    for source in SCENARIO_SOURCES[name]:
+        with open(os.path.join(SCENARIO_SOURCE_DIR, source), 'rb') as source_file:
+            digest.update(source_file.read())
+    if name == 'large':
+        digest.update(f"{LARGE_SCALE}:{SCENARIO_SEED}:{ACCESS_LOG_PARTITION_DAYS}".encode())
+        with open(os.path.join(os.path.dirname(__file__), 'scenario.py'), 'rb') as generator:
+            digest.update(generator.read())
+    return digest.hexdigest()[:12]
+
+def snapshot_path(name, version):
+    return os.path.join(SNAPSHOT_DIR, f"{name}-{version}.db")
+
+def replaced_marker(path):
+    """
+    File whose mtime is when a snapshot stopped being current. Every process
+    sees it, unlike the in-process use times.
+    """
+    return f"{path}.replaced"
+
+def _mark_replaced(path):
+    """Record that a snapshot was replaced now, unless a process already did"""
+    try:
+        os.close(os.open(replaced_marker(path), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        pass
+
+def snapshot_version(path):
+    """Version of a snapshot from its path (the inverse of snapshot_path)"""
+    return os.path.splitext(os.path.basename(path))[0].rsplit('-', 1)[1]
+
+def build_snapshot(name, version):
+    """
+    Build a snapshot in a child process (unless another process already is)
+    and make it read-only. Returns: its path, or None if another process is building it
+    """
+    path = snapshot_path(name, version)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    lock_path = f"{path}.lock"
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock_path) < STALE_BUILD_LOCK:
+            return None
+        os.replace(lock_path, f"{lock_path}.stale")
+        return build_snapshot(name, version)
+
+    try:
+        start = time.perf_counter()
+        try:
+            subprocess.run([sys.executable, '-m', 'backend.snapshots', name, path], check=True,
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        except BaseException:
+            # The builders clean up after themselves, but not when the child was killed
+            for leftover in glob.glob(f"{glob.escape(path)}.*.tmp"):
+                os.remove(leftover)
+            for leftover in glob.glob(f"{glob.escape(os.path.splitext(path)[0])}.*.partitions.tmp"):
+                shutil.rmtree(leftover, ignore_errors=True)
+            raise
+        for file in [path] + partition_files(path):
+            os.chmod(file, 0o444)
+        print(f"Built {name} snapshot {version} in {time.perf_counter() - start:.1f}s")
+    finally:
+        os.remove(lock_path)
+    return path
+
+def warm_snapshot(name, path):
+    """Read every table once so the first sessions on a snapshot find it in the page cache"""
+    engine = get_engine('sqlite')
+    with closing(engine.connect(path, read_only=True)) as conn:
+        for table in SCENARIO_TABLES:
+            conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+    for hook in _warm_hooks:
+        hook(name, path)
+
+class SnapshotManager:
+    """Tracks the current snapshot per scenario and the older ones still in use"""
+
+    def __init__(self, names=('standard', 'large')):
+        self.names = names
+        self._current = {}
+        self._last_used = {}
+        # Version whose build failed, per scenario - not retried until the sources change again
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def current_version(self, name):
+        """Version new sessions start on, building the first snapshot if needed"""
+        with self._lock:
+            current = self._current.get(name)
+        if current is None:
+            version = source_version(name)
+            path = build_snapshot(name, version)
+            while path is None:
+                # Another process is building it
+                time.sleep(0.5)
+                path = build_snapshot(name, version)
+            self._swap(name, version, path)
+            current = (version, path)
+        return current[0]
+
+    def path_for(self, name, version=None):
+        """Path of a snapshot version, or of the current snapshot if it's gone"""
+        path = snapshot_path(name, version) if version else None
+        if path is None or not os.path.exists(path):
+            path = snapshot_path(name, self.current_version(name))
+        with self._lock:
+            self._last_used[path] = time.monotonic()
+        return path
+
+    def check(self):
+        """Build, warm and switch to new snapshots for scenarios whose sources changed"""
+        for name in self.names:
+            with self._lock:
+                current = self._current.get(name)
+            if current is None:
+                # Not used in this process yet - built on first use
+                continue
+            version = source_version(name)
+            if version != current[0] and version != self._failed.get(name):
+                try:
+                    path = build_snapshot(name, version)
+                except Exception:
+                    self._failed[name] = version
+                    print(f"Build of {name} snapshot {version} failed, it is retried once the sources change")
+                    raise
+                if path is not None:
+                    self._swap(name, version, path)
+        self.collect_garbage()
+
+    def _swap(self, name, version, path):
+        warm_snapshot(name, path)
+        with self._lock:
+            previous = self._current.get(name)
+            self._current[name] = (version, path)
+            self._last_used.setdefault(path, time.monotonic())
+        # The snapshot may be current again after the sources were reverted
+        if os.path.exists(replaced_marker(path)):
+            os.remove(replaced_marker(path))
+        if previous and previous[1] != path:
+            _mark_replaced(previous[1])
+            print(f"Scenario {name} now serves snapshot {version} (was {previous[0]})")
+
+    def collect_garbage(self):
+        """Retire snapshots no session has used for a while and delete long-replaced files"""
+        now = time.monotonic()
+        with self._lock:
+            live = {path for _, path in self._current.values()}
+            idle = [path for path, used in self._last_used.items()
+                    if path not in live and now - used > SNAPSHOT_IDLE_RETIRE]
+            for path in idle:
+                del self._last_used[path]
+        for path in idle:
+            name = os.path.basename(path).split('-')[0]
+            for hook in _retire_hooks:
+                hook(name, path)
+
+        if not os.path.isdir(SNAPSHOT_DIR):
+            return
+        in_use = None
+        for file_name in os.listdir(SNAPSHOT_DIR):
+            path = os.path.join(SNAPSHOT_DIR, file_name)
+            if (not file_name.endswith('.db') or file_name.split('-')[0] not in SCENARIO_SOURCES or
+                    path in live or path in self._last_used):
+                continue
+            marker = replaced_marker(path)
+            if not os.path.exists(marker):
+                # Left over from before this process started - its retention starts now
+                _mark_replaced(path)
+                continue
+            if time.time() - os.path.getmtime(marker) <= SNAPSHOT_RETENTION:
+                continue
+            if in_use is None:
+                # Sessions of other processes, which this process's use times don't cover
+                in_use = get_session_store().scenario_versions(time.time() - SNAPSHOT_RETENTION)
+            if snapshot_version(path) in in_use:
+                continue
+            os.remove(path)
+            remove_partitions(path)
+            # The DuckDB copy of a DuckDB scenario (see ensure_duckdb_copy)
+            duckdb_path = os.path.splitext(path)[0] + '.duckdb'
+            if os.path.exists(duckdb_path):
+                os.remove(duckdb_path)
+            os.remove(marker)
+
+    def start_watcher(self):
+        """Poll the scenario sources in a background thread"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(SNAPSHOT_POLL_INTERVAL)
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"Snapshot reload failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='snapshot-watcher', daemon=True)
+        self._watcher.start()
+
+@on_warm
+def _warm_engine_copy(name, path):
+    if SCENARIO_ENGINES[name] == 'duckdb':
+        ensure_duckdb_copy(path)
+
+# backend.query_cost is imported by backend.engines, so its hook is registered here
+on_retire(lambda name, path: forget_database(path))
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_snapshots():
+    """Return the snapshot manager, starting its watcher on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SnapshotManager()
+            _manager.start_watcher()
+    return _manager
+
+def main():
+    name, path = sys.argv[1], sys.argv[2]
+    if name == 'large':
+        build_large_database(path)
+    else:
+        build_standard_database(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+In-process publish/subscribe bus for the instructor's live spectator view.
+
+Players publish events (mission start, queries, stage completions) from
+their script thread. publish() only appends to an inbox, so the players'
+hot path costs the same with 0 or 20 spectators. A dispatcher thread drains
+the inbox, keeps the latest state of each player, and fans events out to
+each subscription's bounded buffer. Queries from the same player coalesce
+while a spectator hasn't read them, and a buffer that is still full drops
+its oldest events (counted in Subscription.dropped).
+
+Only players served by this process are seen.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Events a spectator may have unread before the oldest are dropped
+SPECTATOR_BUFFER = int(os.environ.get('SQLBOMB_SPECTATOR_BUFFER', '200'))
+
+# Latest state is kept for this many players (least recently active dropped first)
+SPECTATOR_MAX_PLAYERS = 10_000
+
+# Longest query text carried in an event
+MAX_EVENT_QUERY_CHARS = 200
+
+class Subscription:
+    """A spectator's view of one cohort's events, read with poll()"""
+
+    def __init__(self, bus, cohort, max_pending=SPECTATOR_BUFFER):
+        self.cohort = cohort
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.coalesced = 0
+        self._bus = bus
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._keys = itertools.count()
+
+    def _offer(self, event):
+        # Called on the dispatcher thread
+        if event['type'] == 'query':
+            key = ('query', event['player'])
+        else:
+            key = next(self._keys)
+        with self._cond:
+            if key in self._pending:
+                # A newer query replaces the unread one; it moves to the end
+                del self._pending[key]
+                self.coalesced += 1
+            self._pending[key] = event
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._cond.notify()
+
+    def poll(self, timeout=None):
+        """Unread events, oldest first, waiting up to timeout seconds for one"""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            events = list(self._pending.values())
+            self._pending.clear()
+        return events
+
+    def close(self):
+        self._bus._unsubscribe(self)
+
+class SpectatorBus:
+    """Fans player events out to the spectators of their cohort"""
+
+    def __init__(self, max_players=SPECTATOR_MAX_PLAYERS):
+        self.max_players = max_players
+        self.published = 0
+        self._inbox = deque()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._players = OrderedDict()
+        self._dispatcher = None
+
+    def publish(self, event_type, player, cohort, stage, **details):
+        """Queue an event - never blocks on spectators"""
+        event = {'type': event_type, 'player': player, 'cohort': cohort, 'stage': stage,
+                 'time': time.time(), **details}
+        if 'query' in event:
+            event['query'] = event['query'][:MAX_EVENT_QUERY_CHARS]
+        self._inbox.append(event)
+        self.published += 1
+        if not self._wake.is_set():
+            self._wake.set()
+        if self._dispatcher is None:
+            self._start()
+
+    def subscribe(self, cohort, max_pending=SPECTATOR_BUFFER):
+        subscription = Subscription(self, cohort, max_pending)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def players(self, cohort):
+        """Latest state of each player in a cohort, most recently active first"""
+        with self._lock:
+            return [dict(state) for state in reversed(self._players.values()) if state['cohort'] == cohort]
+
+    def _start(self):
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name='spectator-bus', daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._inbox:
+                event = self._inbox.popleft()
+                with self._lock:
+                    self._update_player(event)
+                    subscriptions = [s for s in self._subscriptions if s.cohort == event['cohort']]
+                for subscription in subscriptions:
+                    subscription._offer(event)
+
+    def _update_player(self, event):
+        state = self._players.pop(event['player'], None) or {
+            'player': event['player'], 'cohort': event['cohort'], 'queries': 0, 'last_query': None,
+            'last_outcome': None, 'started_at': event['time'],
+        }
+        state['stage'] = event['stage']
+        state['last_seen'] = event['time']
+        if event['type'] == 'query':
+            state['queries'] += 1
+            state['last_query'] = event.get('query')
+            state['last_outcome'] = event.get('outcome')
+        elif event['type'] == 'stage_completed':
+            state['stage'] = event['stage'] + 1
+            state['last_outcome'] = f"solved stage {event['stage']}"
+        elif event['type'] == 'mission_completed':
+            state['last_outcome'] = "mission complete"
+        self._players[event['player']] = state
+        while len(self._players) > self.max_players:
+            self._players.popitem(last=False)
+
+_bus = SpectatorBus()
+
+def get_spectator_bus():
+    return _bus
@@ -0,0 +1,101 @@
+"""
+SQL functions registered on every SQLite connection to the scenario data.
+
+voltage_readings and frequency_pattern hold comma-separated numbers, so the
+list functions take one of those columns:
+
+    list_count(x)   number of values
+    list_min(x)     smallest value
+    list_max(x)     largest value
+    list_avg(x)     mean
+    list_stddev(x)  sample standard deviation (NULL for fewer than 2 values)
+
+and stddev(value) is the matching aggregate, e.g. over bomb_readings.
+A list that isn't numbers gives NULL. The scalar functions are registered as
+deterministic, so SQLite may evaluate them once per row and factor them out
+of loops. DuckDB connections don't get them (DuckDB's own list_min and the
+like take LIST values), so the app only advertises them on SQLite scenarios.
+"""
+import math
+from functools import lru_cache
+
+# Parsed lists are cached, since queries usually call several list functions on the same value
+PARSE_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_list(text):
+    """Values of a comma-separated number list as a tuple of floats, or None if it isn't one"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return (float(text),)
+    try:
+        return tuple(float(item) for item in str(text).split(',') if item.strip())
+    except ValueError:
+        return None
+
+def _numeric(value):
+    # Integral results stay integers, like the values in voltage_readings
+    return int(value) if value.is_integer() else value
+
+def list_count(text):
+    values = parse_list(text)
+    return None if values is None else len(values)
+
+def list_min(text):
+    values = parse_list(text)
+    return _numeric(min(values)) if values else None
+
+def list_max(text):
+    values = parse_list(text)
+    return _numeric(max(values)) if values else None
+
+def list_avg(text):
+    values = parse_list(text)
+    return sum(values) / len(values) if values else None
+
+def sample_stddev(values):
+    """Sample standard deviation, or None for fewer than 2 values"""
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
+def list_stddev(text):
+    values = parse_list(text)
+    return None if values is None else sample_stddev(values)
+
+class StdDev:
+    """stddev() aggregate - Welford's online algorithm, NULLs are skipped"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+LIST_FUNCTIONS = {
+    'list_count': list_count,
+    'list_min': list_min,
+    'list_max': list_max,
+    'list_avg': list_avg,
+    'list_stddev': list_stddev,
+}
+
+def register_functions(conn):
+    """Register the list functions and the stddev aggregate on a sqlite3 connection"""
+    for name, function in LIST_FUNCTIONS.items():
+        conn.create_function(name, 1, function, deterministic=True)
+    conn.create_aggregate('stddev', 1, StdDev)
+    return conn
@@ -0,0 +1,98 @@
+# Game storyline with rich narrative
+STORYLINE = {
+    1: {
+        "title": "Stage 1: Identify the Real Bomb",
+        "description": "There are multiple bombs planted across the city. Use SQL queries to analyze the data and identify the real explosive device.",
+        "story": """Agent, this is Commander Hayes from Central Command. We've detected multiple explosive devices across the city, but our intel suggests only one is real - the others are decoys designed to mislead us.
+
+The Ace of Spades terrorist cell is known for their signature bomb design. Their devices always have cutting-edge components with high signal strength and battery levels. They also use a consistent frequency pattern to ensure detonation, and each bomb has a unique device signature code.
+
+Most importantly, their bombs are always maintained right before deployment - usually within 24 hours. The timestamp in our database will help you identify when each bomb was last serviced.
+
+Your mission is to find the real bomb and save the city.""",
+        "hint": "INTELLIGENCE REPORT #A-7: Our bomb squad technicians report that the Ace of Spades' real bombs always have signal strength above 95, battery levels above 90, and a perfectly consistent frequency pattern (all values identical). Their device signatures typically start with 'B9Z'. Check maintenance logs for recent activity - likely within the last day or two."
+    },
+    2: {
+        "title": "Stage 2: Defuse the Bomb",
+        "description": "You've found the bomb! Now analyze its components to discover the defusal passcode.",
+        "story": """Excellent work locating the real bomb, Agent! Our EOD (Explosive Ordnance Disposal) team is on site, but they need your help to safely defuse the device.
+
+The bomb has multiple components, but our specialists believe the deactivation mechanism is connected to either the detonator or the main circuit board. Each component has an activation code, but only one will safely disarm the bomb.
+
+The Ace of Spades always uses premium materials for their critical components - typically titanium or gold for the parts that control deactivation. The other components are made of cheaper materials to save costs.
+
+Find the defusal code hidden in the activation_code field of the critical component to safely disarm the bomb!""",
+        "hint": "FIELD REPORT #C-12: I've analyzed the bomb's construction. Look for components made of either titanium or gold - those are the high-value parts. The defusal code will be in the activation_code field of either the Detonator or Circuit component. Be precise - entering the wrong code could trigger immediate detonation."
+    },
+    3: {
+        "title": "Stage 3: Find the Culprit",
+        "description": "The bomb has technical fingerprints. Trace them back to the suspect using maintenance records.",
+        "story": """The bomb is defused! Great work, Agent. Now we need to catch whoever planted it before they escape the city.
+
+Each bomb in the Ace of Spades' arsenal requires specialized knowledge to install. Our database contains access logs that record who interacted with each bomb and what actions they performed.
+
+We believe the person who performed the 'Installation' action on our target bomb is the culprit. Cross-reference the access logs with our suspect database to identify who we're looking for.
+
+This is our chance to finally bring a key member of the Ace of Spades to justice. Find the name of the person responsible for planting the bomb at the Airport.""",
+        "hint": "CONFIDENTIAL MEMO #F-23: The access_logs table contains records of all interactions with the bombs. The action_performed field will show 'Installation' for the person who planted the device. You'll need to join the suspects table with access_logs and filter for the bomb_id you identified in Stage 1. The suspect's name is what we need to make an arrest."
+    }
+}
+
+# Advanced sample queries that teach SQL concepts without revealing solutions
+SAMPLE_QUERIES = {
+    1: "-- Finding patterns in data\nSELECT location, signal_strength, battery_level, frequency_pattern\nFROM bombs\nWHERE signal_strength > 80 AND battery_level > 60\nORDER BY signal_strength DESC;",
+    2: "-- Analyzing relationships between entities\nSELECT bc.component_name, bc.material, bc.activation_code\nFROM bomb_components bc\nJOIN bombs b ON bc.bomb_id = b.bomb_id\nWHERE b.location = 'Train Station'\nAND bc.material IN ('Steel', 'Copper');",
+    3: "-- Complex multi-table join with filtering\nSELECT s.name, s.access_level, a.action_performed, b.location\nFROM suspects s\nJOIN access_logs a ON s.suspect_id = a.suspect_id\nJOIN bombs b ON a.bomb_id = b.bomb_id\nWHERE s.access_level >= 3\nAND a.access_epoch > unixepoch('2025-03-01')\nORDER BY a.access_epoch DESC;"
+}
+
+# Character profiles to enhance the storyline
+CHARACTERS = {
+    "commander": {
+        "name": "Commander Hayes",
+        "role": "Your mission director at Central Command",
+        "description": "A veteran intelligence officer with 25 years of experience. Known for his calm demeanor in crisis situations."
+    },
+    "tech": {
+        "name": "Dr. Eliza Chen",
+        "role": "Technical Specialist",
+        "description": "The agency's leading expert on explosive devices and database forensics. She provides technical guidance throughout your mission."
+    },
+    "field": {
+        "name": "Agent Rodriguez",
+        "role": "Field Operative",
+        "description": "Your eyes on the ground. Rodriguez is at the bomb sites, relaying information back to you as you work to solve the case."
+    },
+    "villain": {
+        "name": "The Ace of Spades",
+        "role": "Terrorist Organization",
+        "description": "A sophisticated cyber-terrorist group known for combining explosive devices with digital triggers. They've evaded capture for years."
+    }
+}
+
+# Verification questions asked after a stage's query finds the answer
+VERIFICATION_QUESTIONS = {
+    1: {
+        "question": "Which location contains the real bomb? (Enter the exact location)",
+        "answer": "Airport"
+    },
+    2: {
+        "question": "What is the defusal code for the bomb? (Enter the exact code)",
+        "answer": "221"
+    },
+    3: {
+        "question": "Who is the culprit behind the bomb? (Enter the exact name)",
+        "answer": "Sarah Connor"
+    }
+}
+
+# Game tables and their columns, as shown to players
+SCHEMA_TABLES = {
+    "bombs": ["bomb_id", "location", "voltage_readings", "last_maintained", "signal_strength",
+              "battery_level", "frequency_pattern", "device_signature", "maintained_epoch"],
+    "bomb_readings": ["bomb_id", "kind", "seq", "value"],
+    "bomb_components": ["component_id", "bomb_id", "component_name", "material", "activation_code"],
+    "suspects": ["suspect_id", "name", "access_level", "last_login", "login_epoch"],
+    "access_logs": ["log_id", "suspect_id", "bomb_id", "access_time", "action_performed", "access_epoch"],
+    "intel_notes": ["note_id", "suspect_id", "bomb_id", "noted_at", "note"],
+    "intel_notes_fts": ["note (full-text index, rowid = note_id)"]
+}
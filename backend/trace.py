@@ -0,0 +1,90 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+# Set SQLBOMB_TRACE_FILE to record player actions (recording is off by default)
+TRACE_FILE = os.environ.get('SQLBOMB_TRACE_FILE')
+
+# Flush the buffer once it holds this many actions or this many seconds have passed
+TRACE_BUFFER_SIZE = int(os.environ.get('SQLBOMB_TRACE_BUFFER', '64'))
+TRACE_FLUSH_INTERVAL = 5.0
+
+class TraceRecorder:
+    """
+    Append player actions to a JSON-lines trace file with buffered writes.
+    Each line is one action with short keys to keep the log compact:
+      s = session token, t = unix timestamp, a = action ("query" or "verify"),
+      g = stage, q = query text or answer, o = outcome, n = row count,
+      ms = elapsed milliseconds, m = game mode ("standard" or "performance"),
+      d = scenario snapshot version (with hot reload)
+    """
+
+    def __init__(self, path, buffer_size=TRACE_BUFFER_SIZE, flush_interval=TRACE_FLUSH_INTERVAL):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def record(self, session, action, stage, text, outcome, rows=None, elapsed_ms=None, mode=None, version=None):
+        """Buffer one action, flushing to disk when the buffer is full or stale"""
+        entry = {'s': session, 't': round(time.time(), 3), 'a': action, 'g': stage, 'q': text, 'o': outcome}
+        if rows is not None:
+            entry['n'] = rows
+        if elapsed_ms is not None:
+            entry['ms'] = round(elapsed_ms, 2)
+        if mode is not None:
+            entry['m'] = mode
+        if version is not None:
+            entry['d'] = version
+        line = json.dumps(entry, separators=(',', ':'))
+
+        with self._lock:
+            self._buffer.append(line)
+            if (len(self._buffer) < self.buffer_size and
+                    time.monotonic() - self._last_flush < self.flush_interval):
+                return
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            self._write(lines)
+
+    def flush(self):
+        """Write any buffered actions to disk"""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            self._write(lines)
+
+    def _write(self, lines):
+        if not lines:
+            return
+        try:
+            # Append mode with a single write keeps concurrent processes from interleaving lines
+            with open(self.path, 'a', encoding='utf-8') as trace_file:
+                trace_file.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            print(f"Trace write error: {e}")
+
+def read_trace(path):
+    """Read the actions in a trace file, skipping any partially written lines"""
+    actions = []
+    with open(path, encoding='utf-8') as trace_file:
+        for line in trace_file:
+            try:
+                actions.append(json.loads(line))
+            except ValueError:
+                continue
+    return actions
+
+_recorder = None
+
+def get_recorder():
+    """Return the trace recorder, or None when recording is disabled"""
+    global _recorder
+    if _recorder is None and TRACE_FILE:
+        _recorder = TraceRecorder(TRACE_FILE)
+    return _recorder
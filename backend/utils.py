@@ -1,3 +1,8 @@
+import hashlib
+import re
+
+from backend.sql_functions import parse_list
+
 def start_timer():
     """Start a timer for the game - now just returns a placeholder value"""
     return 1  # Placeholder value since we're removing the timer concept
@@ -11,13 +16,62 @@ def format_time(seconds):
     mins, secs = divmod(seconds, 60)
     return f"{mins:02}:{secs:02}"
 
+def format_vm_steps(steps):
+    """Format a VM step count (None for engines that don't count steps)"""
+    return "n/a" if steps is None else f"{steps:,}"
+
+# Quoted strings and identifiers, comments (an unclosed /* runs to the end, like in SQLite) and whitespace
+_SQL_TOKEN_RE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])|(?:--[^\n]*|/\*.*?(?:\*/|\Z)|\s+)+""",
+                           re.DOTALL)
+
+def normalize_sql(query):
+    """
+    The query with comments and whitespace runs outside quoted text replaced
+    by a single space, the way SQLite reads them. Quoted strings and
+    identifiers are kept as they are.
+    """
+    return _SQL_TOKEN_RE.sub(lambda m: m.group(1) or ' ', query).strip()
+
+def query_fingerprint(query):
+    """
+    Stable short id for a query: comments and whitespace are normalized
+    (see normalize_sql) and a trailing ';' dropped, so trivially reformatted
+    queries share cache entries. Case is kept because it matters inside
+    string literals.
+    """
+    normalized = normalize_sql(query).rstrip(';').strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
 def check_stage_completion(stage, results):
     """Check if the current stage is completed based on query results"""
-    if not results:
-        return False
+    return find_stage_match(stage, results) is not None
 
-    # Check if results are dictionaries or tuples
-    is_dict_results = isinstance(results[0], dict) if results else False
+def find_stage_match(stage, results):
+    """Return the first result row that completes the stage, or None"""
+    if not results:
+        return None
+
+    for row in results:
+        if row_completes_stage(stage, row):
+            return row
+
+    return None
+
+# Columns row_completes_stage grades each stage on
+STAGE_COLUMNS = {
+    1: ('location', 'signal_strength', 'battery_level', 'frequency_pattern', 'device_signature', 'last_maintained'),
+    2: ('bomb_id', 'component_name', 'activation_code', 'material'),
+    3: ('name', 'action_performed', 'bomb_id'),
+}
+
+def row_completes_stage(stage, row):
+    """
+    Check a single result row against the stage objective.
+    Rows may be dictionaries (column name -> value) or plain tuples, so the
+    predicate can be applied while rows are still being fetched from the cursor.
+    """
+    # Check if the row is a dictionary or a tuple
+    is_dict_row = isinstance(row, dict)
 
     if stage == 1:
         # Stage 1: Identify the real bomb (Airport)
@@ -28,36 +82,28 @@ def check_stage_completion(stage, results):
         # - Device signature starting with 'B9Z'
         # - Recently maintained (2025-03-08)
 
-        if is_dict_results:
-            # For dictionary results
-            for row in results:
-                location = str(row.get('location', ''))
-                signal = row.get('signal_strength', 0)
-                battery = row.get('battery_level', 0)
-                freq_pattern = str(row.get('frequency_pattern', ''))
-                signature = str(row.get('device_signature', ''))
-                maintained = str(row.get('last_maintained', ''))
-
-                # Check if this is the Airport bomb with the right characteristics
-                if ('Airport' in location and
+        if is_dict_row:
+            location = str(row.get('location', ''))
+            signal = row.get('signal_strength', 0)
+            battery = row.get('battery_level', 0)
+            frequencies = parse_list(row.get('frequency_pattern'))
+            signature = str(row.get('device_signature', ''))
+            maintained = str(row.get('last_maintained', ''))
+
+            # Check if this is the Airport bomb with the right characteristics
+            return ('Airport' in location and
                     signal > 95 and
                     battery > 90 and
-                    '3.7,3.7,3.7' in freq_pattern and
+                    bool(frequencies) and min(frequencies) == max(frequencies) and
                     signature.startswith('B9Z') and
-                    '2025-03-08' in maintained):
-                    return True
-        else:
-            # For tuple results - more complex check
-            for row in results:
-                row_str = str(row)
-                # This is a simplified check for tuple results
-                if ('Airport' in row_str and
-                    'B9Z31' in row_str and
-                    '2025-03-08' in row_str and
-                    '3.7,3.7,3.7' in row_str):
-                    return True
-
-        return False
+                    '2025-03-08' in maintained)
+
+        # For tuple rows - this is a simplified check
+        row_str = str(row)
+        return ('Airport' in row_str and
+                'B9Z31' in row_str and
+                '2025-03-08' in row_str and
+                '3.7,3.7,3.7' in row_str)
 
     elif stage == 2:
         # Stage 2: Find the defusal code
@@ -65,60 +111,44 @@ def check_stage_completion(stage, results):
         # in the right context - it should be from bomb_id 2 (Airport) and
         # specifically from the Detonator or Circuit component
 
-        if is_dict_results:
-            # For dictionary results
-            for row in results:
-                bomb_id = row.get('bomb_id', 0)
-                component = str(row.get('component_name', ''))
-                code = str(row.get('activation_code', ''))
-                material = str(row.get('material', ''))
+        if is_dict_row:
+            bomb_id = row.get('bomb_id', 0)
+            component = str(row.get('component_name', ''))
+            code = str(row.get('activation_code', ''))
+            material = str(row.get('material', ''))
 
-                # Check if this is the right component with the right code
-                if (bomb_id == 2 and
+            # Check if this is the right component with the right code
+            return (bomb_id == 2 and
                     code == '221' and
                     (component == 'Detonator' or component == 'Circuit') and
-                    (material == 'Titanium' or material == 'Gold')):
-                    return True
-        else:
-            # For tuple results
-            for row in results:
-                row_str = str(row)
-                # This is a simplified check for tuple results
-                if ('221' in row_str and
-                    ('Detonator' in row_str or 'Circuit' in row_str) and
-                    ('Titanium' in row_str or 'Gold' in row_str)):
-                    return True
-
-        return False
+                    (material == 'Titanium' or material == 'Gold'))
+
+        # For tuple rows - this is a simplified check
+        row_str = str(row)
+        return ('221' in row_str and
+                ('Detonator' in row_str or 'Circuit' in row_str) and
+                ('Titanium' in row_str or 'Gold' in row_str))
 
     elif stage == 3:
         # Stage 3: Identify the culprit (Sarah Connor)
         # The culprit is Sarah Connor, but we need to make sure they found the connection
         # to the Airport bomb (bomb_id 2) with an Installation action
 
-        if is_dict_results:
-            # For dictionary results
-            for row in results:
-                name = str(row.get('name', ''))
-                action = str(row.get('action_performed', ''))
-                bomb_id = row.get('bomb_id', 0)
-                location = str(row.get('location', ''))
+        if is_dict_row:
+            name = str(row.get('name', ''))
+            action = str(row.get('action_performed', ''))
+            bomb_id = row.get('bomb_id', 0)
+            location = str(row.get('location', ''))
 
-                # Check if this is Sarah Connor with the right action on the right bomb
-                if (name == 'Sarah Connor' and
+            # Check if this is Sarah Connor with the right action on the right bomb
+            return (name == 'Sarah Connor' and
                     action == 'Installation' and
-                    (bomb_id == 2 or 'Airport' in location)):
-                    return True
-        else:
-            # For tuple results
-            for row in results:
-                row_str = str(row)
-                # This is a simplified check for tuple results
-                if ('Sarah Connor' in row_str and
-                    'Installation' in row_str and
-                    ('Airport' in row_str or 'bomb_id.*2' in row_str)):
-                    return True
-
-        return False
+                    (bomb_id == 2 or 'Airport' in location))
+
+        # For tuple rows - this is a simplified check
+        row_str = str(row)
+        return ('Sarah Connor' in row_str and
+                'Installation' in row_str and
+                ('Airport' in row_str or 'bomb_id.*2' in row_str))
 
     return False
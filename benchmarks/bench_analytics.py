@@ -0,0 +1,100 @@
+"""
+Instructor page latency at scale: fills an analytics database with simulated
+players (each starting, running wrong queries and solving some stages), then
+times a full dashboard load from the rollup tables and the same numbers
+computed by scanning the player table.
+
+Usage: python -m benchmarks.bench_analytics [--players 50000] [--loads 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend.analytics import AnalyticsStore, STAGES
+
+# Near-miss queries players tend to write, per stage
+WRONG_QUERIES = {
+    1: ["SELECT * FROM bombs", "SELECT * FROM bombs WHERE location = 'Airport'",
+        "SELECT * FROM bombs WHERE signal_strength > 90"],
+    2: ["SELECT * FROM bomb_components", "SELECT * FROM bomb_components WHERE bomb_id = 1",
+        "SELECT * FROM bomb_components WHERE material = 'Gold'"],
+    3: ["SELECT * FROM suspects", "SELECT * FROM access_logs WHERE bomb_id = 2",
+        "SELECT * FROM access_logs WHERE action_performed = 'Installation'"],
+}
+
+def populate(store, players, cohorts, seed=7):
+    """Simulate players through the record_* calls. Returns: per-event latencies in ms"""
+    rng = random.Random(seed)
+    latencies = []
+    # Simulated time ends around now
+    now = time.time() - players * 250
+
+    def timed(call, *args):
+        start = time.perf_counter()
+        call(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    for n in range(players):
+        player = f"player-{n}"
+        now += 0.5
+        timed(store.record_start, player, f"cohort-{n % cohorts}", now)
+        for stage in STAGES:
+            for _ in range(rng.randint(0, 6)):
+                # A few players invent their own wrong queries
+                query = rng.choice(WRONG_QUERIES[stage]) if rng.random() < 0.9 else f"SELECT {rng.random()}"
+                now += rng.uniform(5, 60)
+                timed(store.record_query, player, stage, query, False, now)
+            if rng.random() < 0.25:
+                break  # Still stuck on this stage
+            now += rng.uniform(5, 120)
+            timed(store.record_query, player, stage, "solution", True, now)
+            timed(store.record_stage_completion, player, stage, now)
+    return latencies
+
+def load_dashboard(store, cohort):
+    """Everything the instructor page reads"""
+    store.cohorts()
+    store.funnel(cohort)
+    store.solve_times(cohort)
+    for stage in STAGES:
+        store.common_wrong_queries(cohort, stage)
+    store.struggling_players(cohort)
+
+def load_by_scanning(store, cohort):
+    """Funnel and struggling players computed from the player rows, without rollups"""
+    conn = store._connection()
+    conn.execute("SELECT stage, COUNT(*) FROM players NOT INDEXED WHERE cohort = ? GROUP BY stage", (cohort,)).fetchall()
+    conn.execute("SELECT player, stage_queries FROM players NOT INDEXED WHERE cohort = ? AND completed_at IS NULL "
+                 "ORDER BY stage_queries DESC LIMIT 20", (cohort,)).fetchall()
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=50_000)
+    parser.add_argument('--cohorts', type=int, default=1)
+    parser.add_argument('--loads', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalyticsStore(os.path.join(tmp, 'analytics.db'))
+        start = time.perf_counter()
+        latencies = populate(store, args.players, args.cohorts)
+        print(f"Recorded {len(latencies):,} events for {args.players:,} players in {time.perf_counter() - start:.1f}s "
+              f"(per event p50 {percentile(latencies, 0.5):.3f} ms, p95 {percentile(latencies, 0.95):.3f} ms)")
+
+        for label, load in (("dashboard from rollups", load_dashboard), ("player table scans", load_by_scanning)):
+            timings = []
+            for _ in range(args.loads):
+                load_start = time.perf_counter()
+                load(store, "cohort-0")
+                timings.append((time.perf_counter() - load_start) * 1000)
+            print(f"{label:<24} p50 {statistics.median(timings):8.2f} ms   p95 {percentile(timings, 0.95):8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Throughput of the headless JSON API compared with a Streamlit rerun.
+
+The API is started in-process on a free port and driven by asyncio clients
+over keep-alive connections, each playing query -> query -> ... in a loop.
+The Streamlit path is measured with streamlit's AppTest (one script rerun per
+click), when streamlit is installed.
+
+Usage: python -m benchmarks.bench_api [--clients 32] [--duration 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# The benchmark measures raw throughput, so lift the per-player rate limit
+os.environ.setdefault('SQLBOMB_RATE_LIMIT', '1000000')
+os.environ.setdefault('SQLBOMB_RATE_BURST', '1000000')
+os.environ.setdefault('SQLBOMB_MAX_PENDING', '1000')
+
+QUERY = "SELECT * FROM bombs WHERE signal_strength > 90"
+
+async def _request(reader, writer, path, payload):
+    body = json.dumps(payload).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+async def _client(port, deadline, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    token = (await _request(reader, writer, '/api/new', {}))['token']
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await _request(reader, writer, '/api/query', {'token': token, 'query': QUERY})
+        latencies.append((time.perf_counter() - start) * 1000)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+    writer.close()
+
+async def bench_api(clients, duration):
+    from backend.api import handle_connection
+
+    server = await asyncio.start_server(handle_connection, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+    start = time.perf_counter()
+    async with server:
+        await asyncio.gather(*[_client(port, start + duration, latencies) for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, sorted(latencies)
+
+def bench_streamlit(duration):
+    """Queries per second through a full Streamlit script rerun, or None"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app.py'), default_timeout=30)
+    app.run()
+    app.button(key="start_mission").click().run()
+
+    done = 0
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        app.text_area(key="sql_query_input").input(QUERY)
+        app.button(key="execute_query_button").click().run()
+        done += 1
+    return done / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    api_qps, latencies = asyncio.run(bench_api(args.clients, args.duration))
+    p50 = latencies[len(latencies) // 2] if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    print(f"JSON API:  {api_qps:8.0f} queries/s  (p50 {p50:.1f} ms, p95 {p95:.1f} ms, {args.clients} clients)")
+
+    streamlit_qps = bench_streamlit(args.duration)
+    if streamlit_qps is None:
+        print("Streamlit: not installed - skipped")
+    else:
+        print(f"Streamlit: {streamlit_qps:8.0f} queries/s  (single session, one rerun per click)")
+        print(f"API speedup: {api_qps / streamlit_qps:.1f}x")
+
+if __name__ == '__main__':
+    main()
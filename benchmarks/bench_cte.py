@@ -0,0 +1,124 @@
+"""
+Multi-stage questions solved with CTEs and window functions against their
+nested-subquery equivalents. Builds a large dataset in a temporary directory,
+then prints the latency, VM steps and cost estimate of each variant, and
+whether the estimate would let it run. Both variants of a question must
+return the same rows. Recursive queries that never stop, written in the
+forms SQLite accepts, must all be stopped by the MAX_RECURSIVE_* ceilings.
+
+Usage: python -m benchmarks.bench_cte [--scale 2] [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from backend.db import execute_graded_query, MAX_RECURSIVE_MS
+from backend.engines import get_engine
+from backend.query_cost import estimate_query_cost, rejection_hint
+from backend.scenario import build_large_database, LARGE_ACCESS_LOGS
+
+QUESTIONS = {
+    "last suspect to touch each strong-signal bomb": [
+        ("nested",
+         "SELECT a.bomb_id, a.suspect_id FROM access_logs a "
+         "WHERE a.bomb_id IN (SELECT bomb_id FROM bombs WHERE signal_strength > 95) "
+         "AND a.access_epoch = (SELECT MAX(access_epoch) FROM access_logs l WHERE l.bomb_id = a.bomb_id)"),
+        ("window",
+         "SELECT bomb_id, suspect_id FROM ("
+         "SELECT a.bomb_id, a.suspect_id, RANK() OVER (PARTITION BY a.bomb_id ORDER BY a.access_epoch DESC) AS r "
+         "FROM bombs b JOIN access_logs a ON a.bomb_id = b.bomb_id WHERE b.signal_strength > 95"
+         ") WHERE r = 1"),
+    ],
+    "suspects with 1.5 times the average accesses": [
+        ("nested",
+         "SELECT suspect_id, COUNT(*) FROM access_logs GROUP BY suspect_id "
+         "HAVING COUNT(*) > 1.5 * (SELECT AVG(c) FROM (SELECT COUNT(*) AS c FROM access_logs GROUP BY suspect_id))"),
+        ("CTE",
+         "WITH counts AS (SELECT suspect_id, COUNT(*) AS c FROM access_logs GROUP BY suspect_id) "
+         "SELECT suspect_id, c FROM counts WHERE c > 1.5 * (SELECT AVG(c) FROM counts)"),
+    ],
+    "installers of B9Z bombs with titanium or gold parts": [
+        ("nested",
+         "SELECT DISTINCT s.name, a.bomb_id FROM access_logs a JOIN suspects s ON s.suspect_id = a.suspect_id "
+         "WHERE a.action_performed = 'Installation' AND a.bomb_id IN ("
+         "SELECT bomb_id FROM bomb_components WHERE material IN ('Titanium', 'Gold') AND bomb_id IN ("
+         "SELECT bomb_id FROM bombs WHERE device_signature LIKE 'B9Z%' AND signal_strength > 90))"),
+        ("CTE",
+         "WITH suspicious AS (SELECT bomb_id FROM bombs WHERE device_signature LIKE 'B9Z%' AND signal_strength > 90), "
+         "armed AS (SELECT DISTINCT c.bomb_id FROM suspicious JOIN bomb_components c ON c.bomb_id = suspicious.bomb_id "
+         "WHERE c.material IN ('Titanium', 'Gold')) "
+         "SELECT DISTINCT s.name, a.bomb_id FROM armed JOIN access_logs a ON a.bomb_id = armed.bomb_id "
+         "JOIN suspects s ON s.suspect_id = a.suspect_id WHERE a.action_performed = 'Installation'"),
+    ],
+    "most active suspects of each access level": [
+        ("nested",
+         "SELECT s.access_level, s.suspect_id FROM suspects s "
+         "JOIN (SELECT suspect_id, COUNT(*) AS n FROM access_logs GROUP BY suspect_id) c ON c.suspect_id = s.suspect_id "
+         "WHERE (s.access_level, c.n) IN (SELECT s2.access_level, MAX(c2.n) FROM suspects s2 "
+         "JOIN (SELECT suspect_id, COUNT(*) AS n FROM access_logs GROUP BY suspect_id) c2 ON c2.suspect_id = s2.suspect_id "
+         "GROUP BY s2.access_level)"),
+        ("window",
+         "WITH activity AS (SELECT s.access_level, s.suspect_id, COUNT(*) AS n FROM suspects s "
+         "JOIN access_logs a ON a.suspect_id = s.suspect_id GROUP BY s.suspect_id), "
+         "ranked AS (SELECT access_level, suspect_id, RANK() OVER (PARTITION BY access_level ORDER BY n DESC) AS r "
+         "FROM activity) "
+         "SELECT access_level, suspect_id FROM ranked WHERE r = 1"),
+    ],
+}
+
+# Recursions without a stop condition; comments are whitespace to SQLite
+RUNAWAY_QUERIES = {
+    "plain": "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT * FROM n",
+    "block comment": "WITH /* x */ RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT * FROM n",
+    "line comment": "WITH -- x\nRECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT * FROM n",
+    "lower case, no space": "with/**/recursive n(i) as (select 1 union all select i + 1 from n) select count(*) from n",
+}
+
+def run(engine, conn, query):
+    """One run: (elapsed ms, VM steps, sorted rows)"""
+    cost = {'vm_steps': 0, 'aborted': False}
+    start = time.perf_counter()
+    cursor = engine.execute(conn, query, cost)
+    try:
+        rows = sorted(cursor)
+    finally:
+        engine.finish(conn, cursor)
+    return (time.perf_counter() - start) * 1000, cost['vm_steps'], rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=2)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = get_engine('sqlite')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_large_database(os.path.join(tmp, 'large.db'), scale=args.scale)
+        print(f"access_logs: {int(LARGE_ACCESS_LOGS * args.scale):,} generated rows")
+        with closing(engine.connect(db_path, read_only=True)) as conn:
+            for question, variants in QUESTIONS.items():
+                print(f"\n{question}")
+                answers = set()
+                for label, query in variants:
+                    estimate = estimate_query_cost(conn, query)
+                    verdict = "rejected" if rejection_hint(estimate) else "runs"
+                    runs = [run(engine, conn, query) for _ in range(args.runs)]
+                    elapsed = statistics.median(ms for ms, _, _ in runs)
+                    _, steps, rows = runs[-1]
+                    answers.add(tuple(rows))
+                    print(f"  {label:<7} {elapsed:9.1f} ms  {steps:>13,} VM steps  {len(rows):>6,} rows  "
+                          f"estimate {estimate['cost']:>13,} ({verdict}, {estimate['temp_rows']:,} temp rows)")
+                if len(answers) > 1:
+                    print("  RESULTS DIFFER")
+
+            print(f"\nrunaway recursion (ceiling {MAX_RECURSIVE_MS:.0f} ms)")
+            for label, query in RUNAWAY_QUERIES.items():
+                _, _, _, cost = execute_graded_query(query, 1, conn=conn, early_exit=False)
+                verdict = "capped" if cost.get('capped') else "NOT CAPPED"
+                print(f"  {label:<21} {cost['elapsed_ms']:9.1f} ms  {cost['vm_steps']:>13,} VM steps  {verdict}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare query engines on the large scenario: the canonical stage queries
+plus a few aggregate and join heavy queries players tend to write.
+Grading results must be identical on every engine.
+
+Usage: python -m benchmarks.bench_engines [--engines sqlite,duckdb] [--runs 5]
+"""
+import argparse
+import statistics
+from contextlib import closing
+
+from backend.db import execute_graded_query
+from backend.game_logic import CANONICAL_QUERIES
+from backend.scenario import get_scenario
+
+QUERIES = [
+    (f"canonical stage {stage}", stage, query) for stage, query in CANONICAL_QUERIES.items()
+] + [
+    ("actions per type", 3,
+     "SELECT action_performed, COUNT(*) AS n FROM access_logs GROUP BY action_performed"),
+    ("busiest suspects", 3,
+     "SELECT s.name, COUNT(*) AS visits FROM suspects s JOIN access_logs a ON s.suspect_id = a.suspect_id "
+     "GROUP BY s.name ORDER BY visits DESC LIMIT 10"),
+    ("installers of strong bombs", 3,
+     "SELECT s.name, a.action_performed, a.bomb_id, b.location FROM access_logs a "
+     "JOIN suspects s ON s.suspect_id = a.suspect_id JOIN bombs b ON b.bomb_id = a.bomb_id "
+     "WHERE a.action_performed = 'Installation' AND b.signal_strength > 95"),
+    ("materials of strong bombs", 2,
+     "SELECT bc.material, COUNT(*) AS n, AVG(b.battery_level) AS battery FROM bomb_components bc "
+     "JOIN bombs b ON b.bomb_id = bc.bomb_id WHERE b.signal_strength > 90 GROUP BY bc.material"),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engines', default='sqlite,duckdb')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    engines = []
+    for name in args.engines.split(','):
+        try:
+            engine, db_path = get_scenario('large', engine_name=name)
+            engine.connect(db_path, read_only=True).close()
+            engines.append((name, engine, db_path))
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+
+    print(f"{'query':<30}" + "".join(f"{name:>14}" for name, _, _ in engines) + "   (median ms)")
+    for label, stage, query in QUERIES:
+        timings = []
+        outcomes = set()
+        for _, engine, db_path in engines:
+            runs = []
+            with closing(engine.connect(db_path, read_only=True)) as conn:
+                for _ in range(args.runs):
+                    results, matched_row, truncated, cost = execute_graded_query(
+                        query, stage, conn=conn, engine=engine, early_exit=False
+                    )
+                    runs.append(cost['elapsed_ms'])
+            timings.append(statistics.median(runs))
+            outcomes.add(matched_row is not None)
+        note = "" if len(outcomes) <= 1 else "   GRADING DIFFERS"
+        print(f"{label:<30}" + "".join(f"{ms:>14.1f}" for ms in timings) + note)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Queries per stage completion with and without "how close am I" feedback,
+and what the row comparison costs.
+
+Simulated players build each stage's query from a column list and WHERE
+terms, some of which filter the answer out. Players without feedback drop a
+WHERE term when the result is empty, and otherwise add a random column or
+add or drop a random WHERE term. Players with feedback add the columns it
+names, and drop a WHERE term when answer rows are missing. Both go through
+the analytics store, which reports queries per completion the same way the
+instructor dashboard does.
+
+The overhead part times queries that don't complete a stage on the large
+dataset, with and without an answer key.
+
+Usage: python -m benchmarks.bench_feedback [--players 200] [--runs 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from backend.analytics import AnalyticsStore, STAGES
+from backend.db import execute_graded_query, connect_read_only
+from backend.game_logic import get_answer_key
+from backend.scenario import get_scenario
+
+# Per stage: FROM clause, selectable columns, WHERE terms that keep the answer and terms that drop it
+STAGE_QUERIES = {
+    1: ("bombs",
+        ["bomb_id", "location", "voltage_readings", "last_maintained", "signal_strength", "battery_level",
+         "frequency_pattern", "device_signature"],
+        ["signal_strength > 95", "battery_level > 90", "device_signature LIKE 'B9Z%'", "location = 'Airport'"],
+        ["signal_strength < 90", "battery_level < 80", "device_signature LIKE 'A7X%'", "location = 'Stadium'",
+         "last_maintained < '2025-03-05'"]),
+    2: ("bomb_components",
+        ["component_id", "bomb_id", "component_name", "material", "activation_code"],
+        ["bomb_id = 2", "material IN ('Titanium', 'Gold')", "activation_code = '221'",
+         "component_name IN ('Detonator', 'Circuit')"],
+        ["bomb_id = 7", "material = 'Silver'", "activation_code = '789'", "component_name = 'Timer'"]),
+    3: ("access_logs a JOIN suspects s ON s.suspect_id = a.suspect_id",
+        ["s.name", "a.action_performed", "a.bomb_id", "a.access_time", "s.access_level"],
+        ["a.bomb_id = 2", "a.action_performed = 'Installation'", "s.access_level = 5"],
+        ["a.bomb_id = 7", "a.action_performed = 'Testing'", "s.name = 'John Doe'", "a.access_time < '2025-03-05'"]),
+}
+MAX_QUERIES = 500
+
+# Slow queries that don't complete stage 3, for the overhead part
+OVERHEAD_QUERIES = {
+    "all access logs": "SELECT s.name, a.action_performed, a.bomb_id FROM access_logs a "
+                       "JOIN suspects s ON s.suspect_id = a.suspect_id WHERE a.action_performed = 'Testing'",
+    "all bombs": "SELECT bomb_id, location FROM bombs",
+}
+
+def _sql(table, columns, terms):
+    where = f" WHERE {' AND '.join(sorted(terms))}" if terms else ""
+    return f"SELECT {', '.join(columns)} FROM {table}{where}"
+
+def play_stage(stage, guided, rng, store, player):
+    """Query until the stage completes. Returns: the number of queries run"""
+    table, all_columns, keep_terms, drop_terms = STAGE_QUERIES[stage]
+    all_terms = keep_terms + drop_terms
+    columns = rng.sample(all_columns, 2)
+    terms = set(rng.sample(all_terms, 2))
+    answer_key = get_answer_key(stage)
+    for queries in range(1, MAX_QUERIES + 1):
+        query = _sql(table, columns, terms)
+        results, matched_row, _, cost = execute_graded_query(query, stage, answer_key=answer_key if guided else None)
+        store.record_query(player, stage, query, matched_row is not None)
+        if matched_row is not None:
+            store.record_stage_completion(player, stage)
+            return queries
+
+        feedback = cost.get('feedback')
+        if feedback and feedback['missing_columns']:
+            columns += [c for c in all_columns if c.split('.')[-1] in feedback['missing_columns']]
+        elif ((feedback and feedback['missing_rows']) or not results) and terms:
+            terms.discard(rng.choice(sorted(terms)))
+        elif rng.random() < 0.5 and len(columns) < len(all_columns):
+            columns.append(rng.choice([c for c in all_columns if c not in columns]))
+        else:
+            terms.symmetric_difference_update({rng.choice(all_terms)})
+    return MAX_QUERIES
+
+def simulate(players, tmp):
+    store = AnalyticsStore(os.path.join(tmp, 'analytics.db'))
+    for guided in (False, True):
+        cohort = 'feedback' if guided else 'yes/no'
+        rng = random.Random(11)
+        for n in range(players):
+            player = f"{cohort}-{n}"
+            store.record_start(player, cohort)
+            for stage in STAGES:
+                play_stage(stage, guided, rng, store, player)
+        per_stage = "   ".join(f"stage {row['stage']} {row['queries_per_completion']:5.1f}" for row in store.funnel(cohort))
+        print(f"{cohort:<9} queries per completion: {per_stage}")
+
+def overhead(runs):
+    _, db_path = get_scenario('large')
+    with closing(connect_read_only(db_path)) as conn:
+        for label, query in OVERHEAD_QUERIES.items():
+            stage = 3 if 'access_logs' in query else 1
+            answer_key = get_answer_key(stage, 'large')
+            timings = {}
+            for keyed in (False, True):
+                samples = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    results, _, _, cost = execute_graded_query(query, stage, conn=conn,
+                                                               answer_key=answer_key if keyed else None)
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[keyed] = statistics.median(samples)
+            rows = cost['feedback']['found_rows'] + cost['feedback']['extra_rows']
+            print(f"{label:<16} {rows:>9,} rows   {timings[False]:8.1f} ms without feedback   "
+                  f"{timings[True]:8.1f} ms with ({(timings[True] / timings[False] - 1) * 100:+.0f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        simulate(args.players, tmp)
+    overhead(args.runs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Keyword searches over intel notes: LIKE '%...%' against FTS5 MATCH on the
+intel_notes_fts index. Builds a large dataset with millions of notes in a
+temporary directory. Both forms of a search must return the same notes.
+
+Usage: python -m benchmarks.bench_fulltext [--scale 5] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from backend.engines import get_engine
+from backend.scenario import build_large_database, LARGE_INTEL_NOTES
+
+FTS_JOIN = "SELECT n.note_id FROM intel_notes_fts JOIN intel_notes n ON n.note_id = intel_notes_fts.rowid "
+
+SEARCHES = {
+    "rare alias": [
+        ("LIKE", "SELECT note_id FROM intel_notes WHERE note LIKE '%kestrel417%'"),
+        ("MATCH", FTS_JOIN + "WHERE intel_notes_fts MATCH 'kestrel417'"),
+    ],
+    "alias prefix": [
+        ("LIKE", "SELECT note_id FROM intel_notes WHERE note LIKE '%kestrel41%'"),
+        ("MATCH", FTS_JOIN + "WHERE intel_notes_fts MATCH 'kestrel41*'"),
+    ],
+    "two keywords": [
+        ("LIKE", "SELECT note_id FROM intel_notes WHERE note LIKE '%thermos%' AND note LIKE '%harbor%'"),
+        ("MATCH", FTS_JOIN + "WHERE intel_notes_fts MATCH 'thermos AND harbor'"),
+    ],
+    "common word": [
+        ("LIKE", "SELECT note_id FROM intel_notes WHERE note LIKE '%toolbox%'"),
+        ("MATCH", FTS_JOIN + "WHERE intel_notes_fts MATCH 'toolbox'"),
+    ],
+    "alias with suspect names": [
+        ("LIKE",
+         "SELECT n.note_id FROM intel_notes n JOIN suspects s ON s.suspect_id = n.suspect_id "
+         "WHERE n.note LIKE '%\"viper7\"%' AND s.access_level >= 4"),
+        ("MATCH",
+         "SELECT n.note_id FROM intel_notes_fts JOIN intel_notes n ON n.note_id = intel_notes_fts.rowid "
+         "JOIN suspects s ON s.suspect_id = n.suspect_id "
+         "WHERE intel_notes_fts MATCH 'viper7' AND s.access_level >= 4"),
+    ],
+}
+
+def run(engine, conn, query):
+    """One run: (elapsed ms, VM steps, sorted note ids)"""
+    cost = {'vm_steps': 0, 'aborted': False}
+    start = time.perf_counter()
+    cursor = engine.execute(conn, query, cost)
+    try:
+        notes = sorted(row[0] for row in cursor)
+    finally:
+        engine.finish(conn, cursor)
+    return (time.perf_counter() - start) * 1000, cost['vm_steps'], notes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=5)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = get_engine('sqlite')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_large_database(os.path.join(tmp, 'large.db'), scale=args.scale)
+        print(f"intel_notes: {int(LARGE_INTEL_NOTES * args.scale):,} generated notes")
+        with closing(engine.connect(db_path, read_only=True)) as conn:
+            for search, variants in SEARCHES.items():
+                print(search)
+                answers = set()
+                for label, query in variants:
+                    runs = [run(engine, conn, query) for _ in range(args.runs)]
+                    elapsed = statistics.median(ms for ms, _, _ in runs)
+                    _, steps, notes = runs[-1]
+                    answers.add(tuple(notes))
+                    print(f"  {label:<6} {elapsed:9.1f} ms  {steps:>12,} VM steps  {len(notes):>8,} notes")
+                if len(answers) > 1:
+                    print("  RESULTS DIFFER")
+
+if __name__ == '__main__':
+    main()
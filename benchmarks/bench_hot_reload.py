@@ -0,0 +1,96 @@
+"""
+Query latency across a scenario reload: players keep running graded queries
+in threads while the scenario sources change, and the latency percentiles
+before, during and after the snapshot swap are compared.
+
+Runs on copies of the scenario sources in a temporary directory.
+
+Usage: python -m benchmarks.bench_hot_reload [--threads 4] [--seconds 6]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+QUERIES = {
+    1: "SELECT * FROM bombs WHERE location = 'Central Station'",
+    2: "SELECT * FROM bomb_components WHERE bomb_id = 3",
+    3: "SELECT * FROM access_logs WHERE bomb_id = 3 AND action_performed = 'Installation'",
+}
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=6)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    source_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+    for source in ('schema.sql', 'sample_data.sql'):
+        shutil.copy(os.path.join(source_dir, source), tmp)
+    os.environ.update(SQLBOMB_HOT_RELOAD='1', SQLBOMB_SCENARIO_DIR=tmp, SQLBOMB_SNAPSHOT_POLL='0.2',
+                      SQLBOMB_SNAPSHOT_DIR=os.path.join(tmp, 'snapshots'))
+    if 'backend.scenario' in sys.modules:
+        sys.exit("Run this benchmark in a fresh interpreter")
+
+    from backend.game_logic import new_game_state
+    from backend.result_cache import cached_graded_query
+    from backend.snapshots import get_snapshots
+
+    try:
+        old_version = new_game_state()['scenario_version']
+        reload_at = time.perf_counter() + args.seconds / 3
+        swapped_at = []
+        timings = []  # (finished_at, ms, version)
+        stop = threading.Event()
+
+        def player(n):
+            while not stop.is_set():
+                # A new player starts every few queries, so sessions on both versions overlap
+                state = new_game_state()
+                for stage, query in QUERIES.items():
+                    start = time.perf_counter()
+                    # Vary the text so every query misses the result cache
+                    cached_graded_query(f"{query} AND {n} = {n} AND {start!r} > 0", stage,
+                                        version=state['scenario_version'])
+                    timings.append((time.perf_counter(), (time.perf_counter() - start) * 1000,
+                                    state['scenario_version']))
+
+        threads = [threading.Thread(target=player, args=(n,)) for n in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(max(0, reload_at - time.perf_counter()))
+        with open(os.path.join(tmp, 'sample_data.sql'), 'a') as sample_data:
+            sample_data.write("\n-- reload\n")
+        while get_snapshots().current_version('standard') == old_version:
+            time.sleep(0.01)
+        swapped_at.append(time.perf_counter())
+        time.sleep(args.seconds * 2 / 3)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        phases = {
+            'before reload': [ms for at, ms, _ in timings if at < reload_at],
+            'during build/swap': [ms for at, ms, _ in timings if reload_at <= at < swapped_at[0]],
+            'after swap': [ms for at, ms, _ in timings if at >= swapped_at[0]],
+        }
+        print(f"Swap took {(swapped_at[0] - reload_at) * 1000:.0f} ms after the source change")
+        for label, values in phases.items():
+            if values:
+                print(f"{label:<18} {len(values):6d} queries   p50 {percentile(values, 0.5):7.2f} ms   "
+                      f"p99 {percentile(values, 0.99):7.2f} ms   max {max(values):7.2f} ms")
+        versions = {version for _, _, version in timings}
+        print(f"Sessions served from {len(versions)} snapshot versions: {', '.join(sorted(versions))}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
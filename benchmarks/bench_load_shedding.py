@@ -0,0 +1,93 @@
+"""
+Load shedding under a workshop peak: a synthetic trace of players who query
+calmly, then all at once, then calmly again, is replayed through the app's
+query path (backend.replay --scheduled) with the load controller off and on.
+Most queries are ones many players run (sample and canonical queries), the
+rest are unique, expensive recursive queries. PERFORMANCE_SHARE of the
+players are in performance mode, whose queries run on the large dataset.
+Each mode runs in its own process so caches and counters start empty.
+
+Usage: python -m benchmarks.bench_load_shedding [--players 40] [--calm 15] [--peak 30]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+
+HEAVY_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {}) SELECT COUNT(*) FROM n"
+# Seconds between a player's queries when calm and during the peak
+CALM_INTERVAL = 10.0
+PEAK_INTERVAL = 1.0
+HEAVY_SHARE = 0.4
+PERFORMANCE_SHARE = 0.25
+
+def make_trace(path, players, calm, peak, seed=7):
+    """Write a trace of `calm` seconds of calm play, a `peak` second rush and calm play again"""
+    from backend.game_logic import CANONICAL_QUERIES
+    from backend.story import SAMPLE_QUERIES
+
+    rng = random.Random(seed)
+    known = list(SAMPLE_QUERIES.items()) + list(CANONICAL_QUERIES.items())
+    end = 2 * calm + peak
+    with open(path, 'w', encoding='utf-8') as trace:
+        for player in range(players):
+            mode = 'performance' if rng.random() < PERFORMANCE_SHARE else 'standard'
+            t = rng.uniform(0, CALM_INTERVAL)
+            while t < end:
+                if rng.random() < HEAVY_SHARE:
+                    stage, query = rng.randint(1, 3), HEAVY_QUERY.format(rng.randint(200_000, 400_000))
+                else:
+                    stage, query = rng.choice(known)
+                trace.write(json.dumps({'s': f"player-{player}", 't': t, 'a': 'query', 'g': stage, 'q': query,
+                                        'm': mode}) + '\n')
+                interval = PEAK_INTERVAL if calm <= t < calm + peak else CALM_INTERVAL
+                t += rng.expovariate(1 / interval)
+
+def run(shedding, trace_path, players, results):
+    os.environ['SQLBOMB_LOAD_SHEDDING'] = '1' if shedding else '0'
+    # Each simulated player sends one query at a time, the per-player limit isn't what is measured
+    os.environ['SQLBOMB_MAX_PENDING'] = '1000'
+    from backend.replay import replay, percentile
+    from backend.trace import read_trace
+
+    report = replay(read_trace(trace_path), speed=1, concurrency=players, scheduled=True)
+    latencies = sorted(report['latencies'])
+    results.put({
+        'served': len(latencies),
+        'outcomes': dict(report['outcomes']),
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'load': report['load'],
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--calm', type=float, default=15)
+    parser.add_argument('--peak', type=float, default=30)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = os.path.join(tmp, 'peak.jsonl')
+        make_trace(trace_path, args.players, args.calm, args.peak)
+        for shedding in (False, True):
+            results = context.Queue()
+            process = context.Process(target=run, args=(shedding, trace_path, args.players, results))
+            process.start()
+            report = results.get()
+            process.join()
+
+            outcomes = report['outcomes']
+            print(f"\nshedding {'on' if shedding else 'off'}: {report['served']} answered, "
+                  f"{outcomes.get('shed', 0)} shed, {outcomes.get('stopped', 0)} stopped")
+            print(f"  latency p50 {report['p50']:7.0f} ms   p95 {report['p95']:7.0f} ms   p99 {report['p99']:7.0f} ms")
+            load = report['load']
+            print(f"  {load['load_transitions']} level changes: " +
+                  ", ".join(f"{name} {seconds:.0f}s" for name, seconds in load['load_level_seconds'].items() if seconds))
+
+if __name__ == '__main__':
+    main()
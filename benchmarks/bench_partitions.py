@@ -0,0 +1,106 @@
+"""
+Time-partitioned access_logs (one attached file per day behind an
+access_logs view) against the monolithic table: build time, the upkeep
+after a day of new logs (ANALYZE and backup of only the newest partition),
+and query latency. Builds both datasets in a temporary directory. Both
+layouts must return the same rows.
+
+Usage: python -m benchmarks.bench_partitions [--scale 3] [--days 1] [--runs 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from backend.engines import get_engine
+from backend.partitions import partition_files
+from backend.scenario import build_large_database, LARGE_ACCESS_LOGS
+
+QUERIES = {
+    "6 hour window": "SELECT log_id, bomb_id FROM access_logs "
+                     "WHERE access_epoch >= unixepoch('2025-03-05 06:00') AND access_epoch < unixepoch('2025-03-05 12:00')",
+    "last day, by action": "SELECT action_performed, COUNT(*) FROM access_logs "
+                           "WHERE access_epoch >= unixepoch('2025-03-08') GROUP BY action_performed",
+    "stage 3 canonical": "SELECT s.name, a.action_performed, a.bomb_id FROM access_logs a "
+                         "JOIN suspects s ON s.suspect_id = a.suspect_id "
+                         "WHERE a.bomb_id = 2 AND a.action_performed = 'Installation'",
+    "accesses after maintenance on the 7th": "SELECT b.bomb_id, a.log_id FROM bombs b JOIN access_logs a ON a.bomb_id = b.bomb_id "
+                                             "WHERE b.maintained_epoch >= unixepoch('2025-03-07') "
+                                             "AND b.maintained_epoch < unixepoch('2025-03-08') "
+                                             "AND a.access_epoch >= b.maintained_epoch",
+    "all logs, by action": "SELECT action_performed, COUNT(*) FROM access_logs GROUP BY action_performed",
+    "latest 5 logs": "SELECT log_id FROM access_logs ORDER BY access_epoch DESC, log_id DESC LIMIT 5",
+}
+
+def run(engine, conn, query):
+    """One run: (elapsed ms, VM steps, sorted rows)"""
+    cost = {'vm_steps': 0, 'aborted': False}
+    start = time.perf_counter()
+    cursor = engine.execute(conn, query, cost)
+    try:
+        rows = sorted(cursor)
+    finally:
+        engine.finish(conn, cursor)
+    return (time.perf_counter() - start) * 1000, cost['vm_steps'], rows
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def upkeep(engine, db_path, tmp):
+    """Seconds to re-analyze and back up access_logs after a day of new logs"""
+    files = partition_files(db_path)
+    with closing(engine.connect(db_path)) as conn:
+        if files:
+            newest = conn.execute("SELECT schema_name FROM access_log_partitions ORDER BY epoch_from DESC").fetchone()[0]
+            analyze = timed(conn.execute, f"ANALYZE {newest}.access_logs")
+        else:
+            analyze = timed(conn.execute, "ANALYZE access_logs")
+    # Older partitions never change, so only the newest one needs a fresh backup
+    source = sorted(files)[-1] if files else db_path
+    backup = timed(shutil.copyfile, source, os.path.join(tmp, 'backup.db'))
+    return analyze, backup, os.path.getsize(source)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=3)
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = get_engine('sqlite')
+    with tempfile.TemporaryDirectory() as tmp:
+        layouts = {}
+        for label, days in (('table', 0), ('partitioned', args.days)):
+            db_path = os.path.join(tmp, f"{label}.db")
+            seconds = timed(build_large_database, db_path, args.scale, 1337, days)
+            analyze, backup, backup_bytes = upkeep(engine, db_path, tmp)
+            layouts[label] = db_path
+            print(f"{label:<12} build {seconds:6.1f} s   ANALYZE access_logs {analyze * 1000:7.0f} ms   "
+                  f"backup {backup_bytes / 2**20:6.0f} MiB in {backup * 1000:5.0f} ms   "
+                  f"{len(partition_files(db_path))} partition files")
+        print(f"access_logs: {int(LARGE_ACCESS_LOGS * args.scale):,} generated rows")
+
+        connections = {label: engine.connect(path, read_only=True) for label, path in layouts.items()}
+        try:
+            for question, query in QUERIES.items():
+                print(f"\n{question}")
+                answers = set()
+                for label, conn in connections.items():
+                    runs = [run(engine, conn, query) for _ in range(args.runs)]
+                    elapsed = statistics.median(ms for ms, _, _ in runs)
+                    _, steps, rows = runs[-1]
+                    answers.add(tuple(rows))
+                    print(f"  {label:<12} {elapsed:9.1f} ms  {steps:>12,} VM steps  {len(rows):>7,} rows")
+                if len(answers) > 1:
+                    print("  RESULTS DIFFER")
+        finally:
+            for conn in connections.values():
+                conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Reading queries on the large scenario, three ways: string matching on the
+comma-separated columns, the list functions (backend.sql_functions), and
+the normalized bomb_readings table. Each variant of a question must return
+the same bombs.
+
+Usage: python -m benchmarks.bench_readings [--runs 5]
+"""
+import argparse
+import statistics
+import time
+from contextlib import closing
+
+from backend.scenario import get_scenario
+
+QUESTIONS = {
+    "consistent frequency, strong signal": [
+        ("string matching",
+         "SELECT bomb_id FROM bombs WHERE signal_strength > 95 "
+         "AND substr(frequency_pattern, 1, 3) = substr(frequency_pattern, 5, 3) "
+         "AND substr(frequency_pattern, 5, 3) = substr(frequency_pattern, 9, 3)"),
+        ("list functions",
+         "SELECT bomb_id FROM bombs WHERE signal_strength > 95 "
+         "AND list_min(frequency_pattern) = list_max(frequency_pattern)"),
+        ("bomb_readings",
+         "SELECT b.bomb_id FROM bombs b JOIN bomb_readings r ON r.bomb_id = b.bomb_id AND r.kind = 'frequency' "
+         "WHERE b.signal_strength > 95 GROUP BY b.bomb_id HAVING MIN(r.value) = MAX(r.value)"),
+    ],
+    "consistent frequency, all bombs": [
+        ("string matching",
+         "SELECT bomb_id FROM bombs "
+         "WHERE substr(frequency_pattern, 1, 3) = substr(frequency_pattern, 5, 3) "
+         "AND substr(frequency_pattern, 5, 3) = substr(frequency_pattern, 9, 3)"),
+        ("list functions",
+         "SELECT bomb_id FROM bombs WHERE list_min(frequency_pattern) = list_max(frequency_pattern)"),
+        ("bomb_readings",
+         "SELECT bomb_id FROM bomb_readings WHERE kind = 'frequency' "
+         "GROUP BY bomb_id HAVING MIN(value) = MAX(value)"),
+    ],
+    "any voltage above 224": [
+        ("string matching",
+         "SELECT bomb_id FROM bombs WHERE CAST(substr(voltage_readings, 1, 3) AS INTEGER) > 224 "
+         "OR CAST(substr(voltage_readings, 5, 3) AS INTEGER) > 224 "
+         "OR CAST(substr(voltage_readings, 9, 3) AS INTEGER) > 224"),
+        ("list functions",
+         "SELECT bomb_id FROM bombs WHERE list_max(voltage_readings) > 224"),
+        ("bomb_readings",
+         "SELECT bomb_id FROM bombs WHERE bomb_id IN "
+         "(SELECT bomb_id FROM bomb_readings WHERE kind = 'voltage' AND value > 224)"),
+    ],
+    "unsteady voltage (stddev > 3)": [
+        ("list functions",
+         "SELECT bomb_id FROM bombs WHERE list_stddev(voltage_readings) > 3"),
+        ("bomb_readings",
+         "SELECT bomb_id FROM bomb_readings WHERE kind = 'voltage' GROUP BY bomb_id HAVING stddev(value) > 3"),
+    ],
+}
+
+def run(engine, conn, query):
+    """One run: (elapsed ms, VM steps, sorted bomb ids)"""
+    cost = {'vm_steps': 0, 'aborted': False}
+    start = time.perf_counter()
+    cursor = engine.execute(conn, query, cost)
+    try:
+        bombs = sorted(row[0] for row in cursor)
+    finally:
+        engine.finish(conn, cursor)
+    return (time.perf_counter() - start) * 1000, cost['vm_steps'], bombs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # The list functions are only registered on SQLite connections
+    engine, db_path = get_scenario('large', engine_name='sqlite')
+    with closing(engine.connect(db_path, read_only=True)) as conn:
+        for question, variants in QUESTIONS.items():
+            print(question)
+            answers = set()
+            for label, query in variants:
+                runs = [run(engine, conn, query) for _ in range(args.runs)]
+                elapsed = statistics.median(ms for ms, _, _ in runs)
+                _, steps, bombs = runs[-1]
+                answers.add(tuple(bombs))
+                print(f"  {label:<18} {elapsed:9.1f} ms  {steps:>12,} VM steps  {len(bombs):>7,} bombs")
+            if len(answers) > 1:
+                print("  RESULTS DIFFER")
+
+if __name__ == '__main__':
+    main()
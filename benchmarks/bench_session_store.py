@@ -0,0 +1,89 @@
+"""
+Throughput of the per-interaction work (load session, run a query, grade it,
+save session) as the number of worker processes grows. All workers share one
+SQLite session store, the same way deploy/run_workers.sh runs the app.
+
+Usage: python -m benchmarks.bench_session_store [--workers 4] [--duration 5]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+QUERIES = [
+    "SELECT * FROM bombs WHERE signal_strength > 95",
+    "SELECT * FROM bomb_components WHERE bomb_id = 2",
+    "SELECT s.name, a.action_performed, a.bomb_id FROM suspects s "
+    "JOIN access_logs a ON s.suspect_id = a.suspect_id",
+]
+
+def _worker(session_db, duration, players, counter):
+    # Configure the store before importing it
+    os.environ['SQLBOMB_SESSION_DB'] = session_db
+    os.environ['SQLBOMB_SESSION_STORE'] = 'sqlite'
+    from backend.db import execute_graded_query
+    from backend.game_logic import apply_stage_match, new_game_state
+    from backend.session_store import get_session_store
+
+    store = get_session_store()
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        token = f"player-{random.randrange(players)}"
+        session = store.load(token) or {
+            'game_state': new_game_state(),
+            'verification_needed': False,
+            'verification_stage': 0,
+        }
+        game_state = session['game_state']
+        stage = random.randint(1, 3)
+        query = QUERIES[stage - 1]
+
+        results, matched_row, _, _ = execute_graded_query(query, stage)
+        game_state['last_query'] = query
+        game_state['last_query_results'] = results
+        game_state['clues_found'] = []
+        apply_stage_match(stage, matched_row, game_state)
+
+        store.save(token, session)
+        done += 1
+
+    with counter.get_lock():
+        counter.value += done
+
+def run(workers, duration, players, session_db):
+    counter = multiprocessing.Value('q', 0)
+    procs = [
+        multiprocessing.Process(target=_worker, args=(session_db, duration, players, counter))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    return counter.value / duration
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--players', type=int, default=1000)
+    args = parser.parse_args()
+
+    # Make sure the game database exists before the workers race to create it
+    import backend.db  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session_db = os.path.join(tmp, 'sessions.db')
+        baseline = None
+        counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i < args.workers], args.workers})
+        print(f"{'workers':>8} {'ops/s':>10} {'speedup':>8}")
+        for workers in counts:
+            ops = run(workers, args.duration, args.players, session_db)
+            baseline = baseline or ops
+            print(f"{workers:>8} {ops:>10.0f} {ops / baseline:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
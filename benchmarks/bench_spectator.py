@@ -0,0 +1,86 @@
+"""
+Cost of the live spectator feed on the players' hot path: simulated players
+publish query and stage events from several threads while 0, 1 or 20
+spectators read them, and the publish() latency and the spectators' lag
+are compared.
+
+Usage: python -m benchmarks.bench_spectator [--players 8] [--events 20000]
+"""
+import argparse
+import random
+import threading
+import time
+
+from backend.spectator import SpectatorBus
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def simulate(spectators, players, events):
+    bus = SpectatorBus()
+    stop = threading.Event()
+    subscriptions = [bus.subscribe('default') for _ in range(spectators)]
+    lags = []
+    received = [0]
+
+    def spectator(subscription):
+        while not stop.is_set():
+            batch = subscription.poll(0.1)
+            now = time.time()
+            lags.extend(now - event['time'] for event in batch)
+            received[0] += len(batch)
+            # A spectator page redraws, then collects the next batch
+            time.sleep(0.05)
+
+    def player(n, latencies):
+        rng = random.Random(n)
+        stage = 1
+        for i in range(events // players):
+            start = time.perf_counter()
+            if rng.random() < 0.02 and stage < 3:
+                bus.publish('stage_completed', f"player-{n}", 'default', stage, mode='standard')
+                stage += 1
+            else:
+                bus.publish('query', f"player-{n}", 'default', stage, mode='standard',
+                            query=f"SELECT * FROM bombs WHERE bomb_id = {i}", outcome='ok', rows=1, elapsed_ms=1.0)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            if i % 100 == 0:
+                time.sleep(0.001)
+
+    readers = [threading.Thread(target=spectator, args=(s,)) for s in subscriptions]
+    for reader in readers:
+        reader.start()
+    latencies = [[] for _ in range(players)]
+    writers = [threading.Thread(target=player, args=(n, latencies[n])) for n in range(players)]
+    start = time.perf_counter()
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.3)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    all_latencies = [us for per_player in latencies for us in per_player]
+    coalesced = sum(s.coalesced for s in subscriptions)
+    dropped = sum(s.dropped for s in subscriptions)
+    line = (f"{spectators:>3} spectators  publish p50 {percentile(all_latencies, 0.5):6.1f} us  "
+            f"p99 {percentile(all_latencies, 0.99):7.1f} us  {len(all_latencies) / elapsed:9,.0f} events/s")
+    if spectators:
+        line += (f"   delivered {received[0] // spectators:,}/spectator, coalesced {coalesced // spectators:,}, "
+                 f"dropped {dropped // spectators:,}, lag p95 {percentile(lags, 0.95) * 1000:.0f} ms")
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--events', type=int, default=20_000)
+    args = parser.parse_args()
+    for spectators in (0, 1, 20):
+        simulate(spectators, args.players, args.events)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Cold start time of the terminal client, measured in fresh interpreters.
+Also checks that streamlit and pandas stay out of the import graph.
+
+Usage: python -m benchmarks.bench_terminal_startup [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import sys, frontend.terminal; "
+    "heavy = [m for m in ('streamlit', 'pandas') if m in sys.modules]; "
+    "sys.exit(1 if heavy else 0)"
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            print("FAIL: streamlit or pandas was imported by frontend.terminal")
+            sys.exit(1)
+
+    print(f"Cold start over {args.runs} runs: median {statistics.median(timings):.0f} ms, "
+          f"min {min(timings):.0f} ms, max {max(timings):.0f} ms")
+    print("No streamlit/pandas imports on the terminal path")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Time range queries on the TEXT timestamps against the generated epoch
+columns (access_epoch, maintained_epoch, login_epoch) and their indexes.
+Builds a large dataset with multi-million row access_logs in a temporary
+directory, then prints the plan, latency and VM steps of each variant.
+Both variants of a question must return the same rows.
+
+Usage: python -m benchmarks.bench_timestamps [--scale 3] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from backend.engines import get_engine
+from backend.scenario import build_large_database, LARGE_ACCESS_LOGS
+
+QUESTIONS = {
+    "accesses in a 6 hour window": [
+        ("TEXT",
+         "SELECT log_id FROM access_logs WHERE access_time >= '2025-03-05 06:00' AND access_time < '2025-03-05 12:00'"),
+        ("epoch",
+         "SELECT log_id FROM access_logs "
+         "WHERE access_epoch >= unixepoch('2025-03-05 06:00') AND access_epoch < unixepoch('2025-03-05 12:00')"),
+    ],
+    "suspects logged in since the 8th": [
+        ("TEXT", "SELECT suspect_id FROM suspects WHERE last_login >= '2025-03-08'"),
+        ("epoch", "SELECT suspect_id FROM suspects WHERE login_epoch >= unixepoch('2025-03-08')"),
+    ],
+    "installs within 24h of maintenance": [
+        ("TEXT",
+         "SELECT a.log_id FROM bombs b JOIN access_logs a ON a.bomb_id = b.bomb_id "
+         "AND a.access_time BETWEEN b.last_maintained AND datetime(b.last_maintained, '+1 day') "
+         "WHERE a.action_performed = 'Installation'"),
+        ("epoch",
+         "SELECT a.log_id FROM bombs b JOIN access_logs a ON a.bomb_id = b.bomb_id "
+         "AND a.access_epoch BETWEEN b.maintained_epoch AND b.maintained_epoch + 86400 "
+         "WHERE a.action_performed = 'Installation'"),
+    ],
+    "bombs maintained on the 7th, with their accesses": [
+        ("TEXT",
+         "SELECT b.bomb_id, a.log_id FROM bombs b JOIN access_logs a ON a.bomb_id = b.bomb_id "
+         "WHERE b.last_maintained >= '2025-03-07' AND b.last_maintained < '2025-03-08' "
+         "AND a.access_time >= b.last_maintained"),
+        ("epoch",
+         "SELECT b.bomb_id, a.log_id FROM bombs b JOIN access_logs a ON a.bomb_id = b.bomb_id "
+         "WHERE b.maintained_epoch >= unixepoch('2025-03-07') AND b.maintained_epoch < unixepoch('2025-03-08') "
+         "AND a.access_epoch >= b.maintained_epoch"),
+    ],
+}
+
+def run(engine, conn, query):
+    """One run: (elapsed ms, VM steps, sorted rows)"""
+    cost = {'vm_steps': 0, 'aborted': False}
+    start = time.perf_counter()
+    cursor = engine.execute(conn, query, cost)
+    try:
+        rows = sorted(cursor)
+    finally:
+        engine.finish(conn, cursor)
+    return (time.perf_counter() - start) * 1000, cost['vm_steps'], rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=3)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = get_engine('sqlite')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_large_database(os.path.join(tmp, 'large.db'), scale=args.scale)
+        print(f"access_logs: {int(LARGE_ACCESS_LOGS * args.scale):,} generated rows")
+        with closing(engine.connect(db_path, read_only=True)) as conn:
+            for question, variants in QUESTIONS.items():
+                print(f"\n{question}")
+                answers = set()
+                for label, query in variants:
+                    plan = '; '.join(engine.explain(conn, query))
+                    runs = [run(engine, conn, query) for _ in range(args.runs)]
+                    elapsed = statistics.median(ms for ms, _, _ in runs)
+                    _, steps, rows = runs[-1]
+                    answers.add(tuple(rows))
+                    print(f"  {label:<6} {elapsed:9.1f} ms  {steps:>12,} VM steps  {len(rows):>8,} rows   {plan}")
+                if len(answers) > 1:
+                    print("  RESULTS DIFFER")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Memory per worker process as workers scale: each worker runs the same
+full-scan queries over the large scenario, then all workers report their
+RSS (anonymous and file-backed) and PSS at the same time. PSS splits
+shared pages between the processes mapping them, so its total is the real
+memory cost of N workers.
+
+Modes:
+  default    connection per query, SQLite's default page cache (the app's normal path)
+  page-cache long-lived connection with a page cache as big as the database
+  immutable  connection per query with SQLBOMB_IMMUTABLE_DB=1 (immutable=1, memory-mapped)
+  mmap-kept  one long-lived immutable, memory-mapped connection (mapped pages stay resident)
+
+Linux only (reads /proc). Usage: python -m benchmarks.bench_worker_memory [--workers 1,2,4,8]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+
+WORKLOAD = [
+    "SELECT action_performed, COUNT(*) FROM access_logs GROUP BY action_performed",
+    "SELECT COUNT(*), AVG(signal_strength) FROM bombs WHERE location LIKE '%Harbor%'",
+    "SELECT COUNT(*) FROM intel_notes WHERE note LIKE '%toolbox%'",
+    "SELECT material, COUNT(*) FROM bomb_components GROUP BY material",
+    "SELECT kind, AVG(value) FROM bomb_readings GROUP BY kind",
+]
+ROUNDS = 3
+
+def memory_kib():
+    """(RSS, anonymous RSS, file RSS, PSS) of this process in KiB"""
+    status = {}
+    with open('/proc/self/status') as status_file:
+        for line in status_file:
+            key, _, value = line.partition(':')
+            status[key] = value.split()[0] if value.split() else '0'
+    pss = 0
+    with open('/proc/self/smaps_rollup') as rollup:
+        for line in rollup:
+            if line.startswith('Pss:'):
+                pss = int(line.split()[1])
+    return int(status['VmRSS']), int(status['RssAnon']), int(status['RssFile']), pss
+
+def worker(mode, db_path, ready, done, results):
+    if mode in ('immutable', 'mmap-kept'):
+        os.environ['SQLBOMB_IMMUTABLE_DB'] = '1'
+    from backend.db import connect_read_only, execute_graded_query
+    from backend.engines import get_engine
+
+    conn = None
+    if mode == 'mmap-kept':
+        conn = connect_read_only(db_path)
+    elif mode == 'page-cache':
+        conn = get_engine('sqlite').connect(db_path, read_only=True)
+        conn.execute(f"PRAGMA cache_size = -{os.path.getsize(db_path) // 1024}")
+
+    timings = []
+    for _ in range(ROUNDS):
+        for query in WORKLOAD:
+            start = time.perf_counter()
+            execute_graded_query(query, 3, db_path=db_path, conn=conn, early_exit=False)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    # Measure while every worker is still alive, so shared pages are shared
+    ready.wait()
+    results.put((*memory_kib(), statistics.median(timings)))
+    done.wait()
+
+def measure(mode, workers, db_path):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Barrier(workers)
+    done = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, db_path, ready, done, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in range(workers)]
+    done.wait()
+    for process in processes:
+        process.join()
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--modes', default='default,page-cache,immutable,mmap-kept')
+    args = parser.parse_args()
+
+    from backend.scenario import ensure_large_database
+    db_path = ensure_large_database()
+    print(f"Large scenario: {os.path.getsize(db_path) / 2**20:.0f} MiB")
+    print(f"{'mode':<11}{'workers':>8}{'RSS/worker':>12}{'anon':>9}{'file':>9}{'PSS/worker':>12}"
+          f"{'PSS total':>11}{'query p50':>11}")
+    for mode in args.modes.split(','):
+        for workers in (int(n) for n in args.workers.split(',')):
+            reports = measure(mode, workers, db_path)
+            rss, anon, file_rss, pss, query_ms = (statistics.mean(column) for column in zip(*reports))
+            print(f"{mode:<11}{workers:>8}{rss / 1024:>10.0f}Mi{anon / 1024:>7.0f}Mi{file_rss / 1024:>7.0f}Mi"
+                  f"{pss / 1024:>10.0f}Mi{pss * workers / 1024**2:>9.2f}Gi{query_ms:>9.1f}ms")
+
+if __name__ == '__main__':
+    main()
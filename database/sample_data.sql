@@ -68,3 +68,14 @@ VALUES
     (3, 1, '2025-03-01 10:30', 'Installation'),
     (1, 3, '2025-03-02 13:15', 'Testing'),
     (2, 6, '2025-03-04 15:30', 'Installation');
+
+-- Insert intel notes
+INSERT INTO intel_notes (suspect_id, bomb_id, noted_at, note)
+VALUES
+    (1, 1, '2025-03-06 15:00', 'Routine maintenance visit, nothing unusual reported by the warehouse guard'),
+    (2, NULL, '2025-03-07 22:10', 'Informant overheard the alias "Spade" on a call about an airport delivery'),
+    (3, 3, '2025-03-07 12:00', 'Inspection badge checked twice at the train station gate, cleared by security'),
+    (2, 2, '2025-03-08 10:05', 'Camera shows a technician with a toolbox leaving the airport service corridor'),
+    (4, NULL, '2025-03-06 18:30', 'Known associate of a courier network, no link to explosives found'),
+    (5, NULL, '2025-03-05 09:15', 'Level 5 clearance renewed last month, alibi confirmed for March 8'),
+    (6, 8, '2025-03-06 12:40', 'Hospital visitor log lists a contractor using the alias "Lotus"');
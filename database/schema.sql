@@ -6,14 +6,17 @@ CREATE TABLE bombs (
   signal_strength INTEGER,
   battery_level INTEGER,
   frequency_pattern TEXT,
-  device_signature TEXT
+  device_signature TEXT,
+  -- Timestamps as Unix epoch seconds, computed from the TEXT columns (compare with unixepoch('2025-03-08'))
+  maintained_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', last_maintained) AS INTEGER)) VIRTUAL
 );
 
 CREATE TABLE suspects (
   suspect_id INTEGER PRIMARY KEY AUTOINCREMENT,
   name TEXT,
   access_level INTEGER,
-  last_login TEXT  -- SQLite doesn't have timestamp, using TEXT
+  last_login TEXT,  -- SQLite doesn't have timestamp, using TEXT
+  login_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', last_login) AS INTEGER)) VIRTUAL
 );
 
 CREATE TABLE bomb_components (
@@ -31,6 +34,75 @@ CREATE TABLE access_logs (
   bomb_id INTEGER,
   access_time TEXT,  -- SQLite doesn't have timestamp, using TEXT
   action_performed TEXT,
+  access_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', access_time) AS INTEGER)) VIRTUAL,
   FOREIGN KEY (suspect_id) REFERENCES suspects(suspect_id),
   FOREIGN KEY (bomb_id) REFERENCES bombs(bomb_id)
 );
+
+-- Free-text intelligence about suspects and bombs
+CREATE TABLE intel_notes (
+  note_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  suspect_id INTEGER,
+  bomb_id INTEGER,
+  noted_at TEXT,
+  note TEXT,
+  FOREIGN KEY (suspect_id) REFERENCES suspects(suspect_id),
+  FOREIGN KEY (bomb_id) REFERENCES bombs(bomb_id)
+);
+
+-- Time range queries on the epoch columns are index-driven
+CREATE INDEX idx_bombs_maintained ON bombs(maintained_epoch);
+CREATE INDEX idx_suspects_login ON suspects(login_epoch);
+CREATE INDEX idx_access_logs_time ON access_logs(access_epoch);
+
+-- voltage_readings and frequency_pattern as one row per value, kept in sync by the triggers below
+CREATE TABLE bomb_readings (
+  bomb_id INTEGER,
+  kind TEXT,     -- 'voltage' or 'frequency'
+  seq INTEGER,   -- position in the list, from 1
+  value REAL,
+  FOREIGN KEY (bomb_id) REFERENCES bombs(bomb_id)
+);
+CREATE INDEX idx_bomb_readings_bomb ON bomb_readings(bomb_id, kind, seq);
+CREATE INDEX idx_bomb_readings_value ON bomb_readings(kind, value, bomb_id);
+
+-- Lists that aren't numbers get no readings instead of failing the insert
+CREATE TRIGGER bomb_readings_insert AFTER INSERT ON bombs BEGIN
+  INSERT INTO bomb_readings (bomb_id, kind, seq, value)
+  SELECT new.bomb_id, 'voltage', key + 1, value FROM json_each(
+    CASE WHEN json_valid('[' || new.voltage_readings || ']') THEN '[' || new.voltage_readings || ']' ELSE '[]' END);
+  INSERT INTO bomb_readings (bomb_id, kind, seq, value)
+  SELECT new.bomb_id, 'frequency', key + 1, value FROM json_each(
+    CASE WHEN json_valid('[' || new.frequency_pattern || ']') THEN '[' || new.frequency_pattern || ']' ELSE '[]' END);
+END;
+
+CREATE TRIGGER bomb_readings_delete AFTER DELETE ON bombs BEGIN
+  DELETE FROM bomb_readings WHERE bomb_id = old.bomb_id;
+END;
+
+CREATE TRIGGER bomb_readings_update AFTER UPDATE OF bomb_id, voltage_readings, frequency_pattern ON bombs BEGIN
+  DELETE FROM bomb_readings WHERE bomb_id = old.bomb_id;
+  INSERT INTO bomb_readings (bomb_id, kind, seq, value)
+  SELECT new.bomb_id, 'voltage', key + 1, value FROM json_each(
+    CASE WHEN json_valid('[' || new.voltage_readings || ']') THEN '[' || new.voltage_readings || ']' ELSE '[]' END);
+  INSERT INTO bomb_readings (bomb_id, kind, seq, value)
+  SELECT new.bomb_id, 'frequency', key + 1, value FROM json_each(
+    CASE WHEN json_valid('[' || new.frequency_pattern || ']') THEN '[' || new.frequency_pattern || ']' ELSE '[]' END);
+END;
+
+-- Full-text index over intel_notes.note: WHERE intel_notes_fts MATCH 'alias' instead of LIKE '%alias%'.
+-- It stores no copy of the text (external content) and is kept in sync by the triggers below.
+CREATE VIRTUAL TABLE intel_notes_fts USING fts5(note, content='intel_notes', content_rowid='note_id');
+
+CREATE TRIGGER intel_notes_fts_insert AFTER INSERT ON intel_notes BEGIN
+  INSERT INTO intel_notes_fts (rowid, note) VALUES (new.note_id, new.note);
+END;
+
+CREATE TRIGGER intel_notes_fts_delete AFTER DELETE ON intel_notes BEGIN
+  INSERT INTO intel_notes_fts (intel_notes_fts, rowid, note) VALUES ('delete', old.note_id, old.note);
+END;
+
+CREATE TRIGGER intel_notes_fts_update AFTER UPDATE OF note_id, note ON intel_notes BEGIN
+  INSERT INTO intel_notes_fts (intel_notes_fts, rowid, note) VALUES ('delete', old.note_id, old.note);
+  INSERT INTO intel_notes_fts (rowid, note) VALUES (new.note_id, new.note);
+END;
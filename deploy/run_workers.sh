@@ -0,0 +1,27 @@
+#!/bin/bash
+# Start several Streamlit workers that share player progress through the
+# SQLite session store, so a local load balancer can spread players across cores.
+#
+# Usage: sh deploy/run_workers.sh [WORKERS] [FIRST_PORT]
+
+WORKERS=${1:-$(nproc)}
+FIRST_PORT=${2:-8501}
+
+# Every worker must point at the same session database
+export SQLBOMB_SESSION_STORE=sqlite
+export SQLBOMB_SESSION_DB=${SQLBOMB_SESSION_DB:-$(pwd)/database/sessions.db}
+
+# Open the scenario databases immutable and memory-mapped, so the workers share
+# one copy of the data in the OS page cache
+export SQLBOMB_IMMUTABLE_DB=${SQLBOMB_IMMUTABLE_DB:-1}
+
+# Build the game database once before the workers start
+python init_database.py
+
+for i in $(seq 0 $((WORKERS - 1))); do
+    PORT=$((FIRST_PORT + i))
+    echo "Starting worker $i on port $PORT"
+    streamlit run app.py --server.port "$PORT" --server.headless true &
+done
+
+wait
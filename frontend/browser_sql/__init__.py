@@ -0,0 +1,28 @@
+"""
+Streamlit component that runs player queries in the browser with WASM SQLite.
+
+The component downloads a gzip snapshot of the scenario database once (the
+snapshot name carries a content hash, so browsers cache it), runs queries
+locally and returns a small payload for backend.client_execution to grade.
+"""
+import os
+
+import streamlit.components.v1 as components
+
+from backend.client_execution import export_client_snapshot
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Snapshots live next to index.html so Streamlit serves them with the component
+SNAPSHOT_DIR = os.path.join(STATIC_DIR, 'data')
+
+_component = components.declare_component('browser_sql', path=STATIC_DIR)
+
+def browser_sql(db_path, stage, default_query='', key=None):
+    """
+    Render the in-browser SQL editor.
+    Returns: the payload of the last executed query, or None
+    """
+    snapshot = export_client_snapshot(db_path, SNAPSHOT_DIR)
+    return _component(stage=stage, snapshot_url=f"data/{snapshot}",
+                      default_query=default_query, key=key, default=None)
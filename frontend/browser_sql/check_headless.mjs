@@ -0,0 +1,48 @@
+// Headless check of browser execution against the server.
+//
+//   python -m backend.client_execution --expected /tmp/expected.json
+//   node frontend/browser_sql/check_headless.mjs /tmp/expected.json
+//
+// Always checks that grading.js finds the same candidate row and fingerprint
+// as the Python grader for the reference results. When the sql.js package is
+// installed (npm install sql.js), the queries are also run in WASM SQLite
+// against the gzip snapshot and compared with the server's rows.
+import { readFileSync } from "node:fs";
+import { dirname, join } from "node:path";
+import { gunzipSync } from "node:zlib";
+import { findCandidate, resultFingerprint } from "./static/grading.js";
+import { registerFunctions } from "./static/sql_functions.js";
+
+const expectedPath = process.argv[2];
+if (!expectedPath) {
+  console.error("usage: node check_headless.mjs EXPECTED_JSON");
+  process.exit(2);
+}
+const expected = JSON.parse(readFileSync(expectedPath, "utf8"));
+
+let db = null;
+try {
+  const initSqlJs = (await import("sql.js")).default;
+  const SQL = await initSqlJs();
+  db = registerFunctions(new SQL.Database(gunzipSync(readFileSync(join(dirname(expectedPath), expected.snapshot)))));
+} catch (e) {
+  console.log(`sql.js not available (${e.code || e.message}), checking grading only`);
+}
+
+let failures = 0;
+for (const ref of expected.queries) {
+  let { columns, rows } = ref;
+  if (db) {
+    const [result] = db.exec(ref.query);
+    columns = result ? result.columns : [];
+    rows = result ? result.values : [];
+  }
+  const fingerprint = await resultFingerprint(columns, rows);
+  const candidate = findCandidate(ref.stage, columns, rows);
+  const ok = fingerprint === ref.fingerprint &&
+    JSON.stringify(candidate) === JSON.stringify(ref.candidate);
+  if (!ok) failures += 1;
+  console.log(`${ok ? "ok  " : "FAIL"} stage ${ref.stage}: ${ref.query}`);
+}
+console.log(`${expected.queries.length - failures}/${expected.queries.length} results match the server`);
+process.exit(failures ? 1 : 0);
@@ -0,0 +1,73 @@
+// Grading helpers shared by the browser component and the headless Node check.
+// rowCompletesStage mirrors row_completes_stage in backend/utils.py (dict rows)
+// and resultFingerprint mirrors result_fingerprint in backend/client_execution.py.
+
+function str(value) {
+  return value === null || value === undefined ? "" : String(value);
+}
+
+// Values of a comma-separated number list, or null if it isn't one (parse_list in backend/sql_functions.py)
+export function parseList(text) {
+  if (text === null || text === undefined) return null;
+  const items = String(text).split(",").filter((item) => item.trim());
+  const values = items.map(Number);
+  return values.some(Number.isNaN) ? null : values;
+}
+
+function isConsistent(text) {
+  const values = parseList(text);
+  return values !== null && values.length > 0 && Math.min(...values) === Math.max(...values);
+}
+
+export function rowCompletesStage(stage, row) {
+  if (stage === 1) {
+    // The real bomb: Airport, strong signal and battery, consistent frequency,
+    // B9Z signature and maintained on 2025-03-08
+    return (
+      str(row.location).includes("Airport") &&
+      (row.signal_strength ?? 0) > 95 &&
+      (row.battery_level ?? 0) > 90 &&
+      isConsistent(row.frequency_pattern) &&
+      str(row.device_signature).startsWith("B9Z") &&
+      str(row.last_maintained).includes("2025-03-08")
+    );
+  }
+  if (stage === 2) {
+    // The defusal code: 221 on the Airport bomb's Detonator or Circuit
+    const component = str(row.component_name);
+    const material = str(row.material);
+    return (
+      row.bomb_id === 2 &&
+      str(row.activation_code) === "221" &&
+      (component === "Detonator" || component === "Circuit") &&
+      (material === "Titanium" || material === "Gold")
+    );
+  }
+  if (stage === 3) {
+    // The culprit: Sarah Connor installed the Airport bomb
+    return (
+      str(row.name) === "Sarah Connor" &&
+      str(row.action_performed) === "Installation" &&
+      (row.bomb_id === 2 || str(row.location).includes("Airport"))
+    );
+  }
+  return false;
+}
+
+// First row (as a column -> value object) that completes the stage, or null
+export function findCandidate(stage, columns, rows) {
+  for (const values of rows) {
+    const row = {};
+    columns.forEach((column, i) => { row[column] = values[i]; });
+    if (rowCompletesStage(stage, row)) {
+      return row;
+    }
+  }
+  return null;
+}
+
+export async function resultFingerprint(columns, rows) {
+  const text = JSON.stringify([columns, rows]);
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("");
+}
@@ -0,0 +1,133 @@
+// Streamlit component that runs player queries in WASM SQLite (sql.js).
+// Only the query, a fingerprint of the result, the row count and the
+// candidate row are sent back; the server grades the candidate.
+import { findCandidate, resultFingerprint } from "./grading.js";
+import { registerFunctions } from "./sql_functions.js";
+
+const SQL_JS_URL = "https://cdnjs.cloudflare.com/ajax/libs/sql.js/1.10.3/";
+const SNAPSHOT_CACHE = "sqlbomb-snapshots";
+const MAX_DISPLAY_ROWS = 500;
+
+const queryBox = document.getElementById("query");
+const runButton = document.getElementById("run");
+const statusLine = document.getElementById("status");
+const resultsBox = document.getElementById("results");
+
+let args = null;
+// Default query last put into the editor
+let loadedQuery = null;
+let dbPromise = null;
+
+function send(type, data) {
+  window.parent.postMessage({ isStreamlitMessage: true, type, ...data }, "*");
+}
+
+function setHeight() {
+  send("streamlit:setFrameHeight", { height: document.body.scrollHeight + 10 });
+}
+
+function loadScript(url) {
+  return new Promise((resolve, reject) => {
+    const script = document.createElement("script");
+    script.src = url;
+    script.onload = resolve;
+    script.onerror = () => reject(new Error(`could not load ${url}`));
+    document.head.appendChild(script);
+  });
+}
+
+async function fetchSnapshot(url) {
+  // Snapshot names carry a content hash, so a cached copy never goes stale
+  const cache = "caches" in window ? await caches.open(SNAPSHOT_CACHE) : null;
+  let response = cache ? await cache.match(url) : undefined;
+  if (!response) {
+    response = await fetch(url);
+    if (!response.ok) throw new Error(`snapshot download failed (${response.status})`);
+    if (cache) await cache.put(url, response.clone());
+  }
+  const stream = response.body.pipeThrough(new DecompressionStream("gzip"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+async function openDatabase(snapshotUrl) {
+  await loadScript(`${SQL_JS_URL}sql-wasm.js`);
+  const [SQL, bytes] = await Promise.all([
+    window.initSqlJs({ locateFile: (file) => `${SQL_JS_URL}${file}` }),
+    fetchSnapshot(snapshotUrl),
+  ]);
+  return registerFunctions(new SQL.Database(bytes));
+}
+
+function renderTable(columns, rows) {
+  const table = document.createElement("table");
+  const head = table.insertRow();
+  for (const column of columns) {
+    const th = document.createElement("th");
+    th.textContent = column;
+    head.appendChild(th);
+  }
+  for (const values of rows.slice(0, MAX_DISPLAY_ROWS)) {
+    const tr = table.insertRow();
+    for (const value of values) {
+      tr.insertCell().textContent = value === null ? "NULL" : String(value);
+    }
+  }
+  resultsBox.replaceChildren(table);
+}
+
+async function runQuery() {
+  const query = queryBox.value;
+  runButton.disabled = true;
+  try {
+    const db = await dbPromise;
+    const started = performance.now();
+    const [result] = db.exec(query);
+    const elapsedMs = performance.now() - started;
+    const columns = result ? result.columns : [];
+    const rows = result ? result.values : [];
+
+    renderTable(columns, rows);
+    statusLine.textContent = `${rows.length} rows in ${elapsedMs.toFixed(1)} ms (in your browser)` +
+      (rows.length > MAX_DISPLAY_ROWS ? `, showing the first ${MAX_DISPLAY_ROWS}` : "");
+    send("streamlit:setComponentValue", {
+      dataType: "json",
+      value: {
+        nonce: crypto.randomUUID(),
+        query,
+        columns,
+        row_count: rows.length,
+        fingerprint: await resultFingerprint(columns, rows),
+        candidate: findCandidate(args.stage, columns, rows),
+        elapsed_ms: elapsedMs,
+      },
+    });
+  } catch (e) {
+    statusLine.textContent = `Error executing query: ${e.message}`;
+    resultsBox.replaceChildren();
+  } finally {
+    runButton.disabled = false;
+    setHeight();
+  }
+}
+
+window.addEventListener("message", (event) => {
+  if (event.data.type !== "streamlit:render") return;
+  const first = args === null;
+  args = event.data.args;
+  // A new default query (e.g. picked from the history) replaces the editor's text
+  if (first || args.default_query !== loadedQuery) {
+    loadedQuery = args.default_query;
+    queryBox.value = args.default_query || "";
+  }
+  if (first) {
+    dbPromise = openDatabase(args.snapshot_url);
+    dbPromise.then(
+      () => { statusLine.textContent = "Scenario database loaded. Queries run in your browser."; runButton.disabled = false; setHeight(); },
+      (e) => { statusLine.textContent = `Could not load the scenario database: ${e.message}`; setHeight(); },
+    );
+  }
+  setHeight();
+});
+
+runButton.addEventListener("click", runQuery);
+send("streamlit:componentReady", { apiVersion: 1 });
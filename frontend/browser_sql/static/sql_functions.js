@@ -0,0 +1,35 @@
+// The game's SQL functions for sql.js, mirroring backend/sql_functions.py so
+// queries that use them run the same in the browser.
+import { parseList } from "./grading.js";
+
+function sampleStddev(values) {
+  if (values.length < 2) return null;
+  const mean = values.reduce((a, b) => a + b, 0) / values.length;
+  return Math.sqrt(values.reduce((sum, v) => sum + (v - mean) ** 2, 0) / (values.length - 1));
+}
+
+const LIST_FUNCTIONS = {
+  list_count: (values) => values.length,
+  list_min: (values) => (values.length ? Math.min(...values) : null),
+  list_max: (values) => (values.length ? Math.max(...values) : null),
+  list_avg: (values) => (values.length ? values.reduce((a, b) => a + b, 0) / values.length : null),
+  list_stddev: sampleStddev,
+};
+
+export function registerFunctions(db) {
+  for (const [name, fn] of Object.entries(LIST_FUNCTIONS)) {
+    db.create_function(name, (text) => {
+      const values = parseList(text);
+      return values === null ? null : fn(values);
+    });
+  }
+  db.create_aggregate("stddev", {
+    init: () => [],
+    step: (values, value) => {
+      if (value !== null) values.push(Number(value));
+      return values;
+    },
+    finalize: sampleStddev,
+  });
+  return db;
+}
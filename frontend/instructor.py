@@ -0,0 +1,144 @@
+"""
+Instructor view of cohort progress: app.py shows it for ?view=instructor&key=...
+
+Every panel reads the rollup tables and indexes in backend.analytics, so a
+page load costs the same with 50 players or 50,000. The live panel is fed by
+backend.spectator instead of polling player sessions.
+"""
+import os
+import time
+from collections import deque
+
+import streamlit as st
+
+from backend.analytics import get_analytics, histogram_median, DEFAULT_COHORT, STAGES
+from backend.spectator import get_spectator_bus
+from backend.story import STORYLINE
+from backend.utils import format_time
+
+# The instructor page is only served when this key is set and given as ?key=
+INSTRUCTOR_KEY = os.environ.get('SQLBOMB_INSTRUCTOR_KEY')
+
+# The live panels redraw at most this often, and at least this often when nothing happens
+LIVE_REDRAW_INTERVAL = 0.5
+LIVE_IDLE_REFRESH = 10
+
+# Events shown in the live feed
+LIVE_FEED_EVENTS = 30
+
+def _bucket_label(bucket):
+    low, high = 2 ** bucket, 2 ** (bucket + 1)
+    return f"{format_time(low if bucket else 0)}-{format_time(high)}"
+
+def _feed_row(event):
+    if event['type'] == 'query':
+        what = f"{event['outcome']}: {event['query']}"
+    elif event['type'] == 'start':
+        what = "started the mission"
+    elif event['type'] == 'stage_completed':
+        what = f"solved stage {event['stage']}"
+    else:
+        what = "completed the mission 🎉"
+    return {'time': time.strftime('%H:%M:%S', time.localtime(event['time'])), 'player': event['player'][:8],
+            'stage': event['stage'], 'event': what}
+
+def _player_row(state, now):
+    return {'player': state['player'][:8], 'stage': state['stage'], 'queries': state['queries'],
+            'last query': state['last_query'], 'outcome': state['last_outcome'],
+            'idle': format_time(int(now - state['last_seen']))}
+
+def _watch_live(cohort):
+    """
+    Redraw the live panels from the spectator bus as events arrive. The
+    script keeps running (no reruns or polling of player sessions) until the
+    page is closed or the toggle is turned off.
+    """
+    bus = get_spectator_bus()
+    subscription = bus.subscribe(cohort)
+    players_panel = st.empty()
+    feed_panel = st.empty()
+    status = st.empty()
+    recent = deque(maxlen=LIVE_FEED_EVENTS)
+    try:
+        while True:
+            now = time.time()
+            players = [_player_row(state, now) for state in bus.players(cohort)]
+            if players:
+                players_panel.dataframe(players, use_container_width=True)
+            else:
+                players_panel.info("No players active in this cohort since the server started.")
+            if recent:
+                feed_panel.dataframe(list(recent), use_container_width=True)
+            status.caption(f"{len(players)} players · {subscription.coalesced} queries coalesced · "
+                           f"{subscription.dropped} events dropped")
+            recent.extendleft(_feed_row(event) for event in subscription.poll(LIVE_IDLE_REFRESH))
+            # Let bursts of events collect (and coalesce) before the next redraw
+            time.sleep(LIVE_REDRAW_INTERVAL)
+    finally:
+        subscription.close()
+
+def instructor_app():
+    st.set_page_config(page_title="SQL Bomb Defusal - Instructor", page_icon="📋", layout="wide")
+    st.title("📋 Instructor Dashboard")
+
+    if not INSTRUCTOR_KEY or st.query_params.get("key") != INSTRUCTOR_KEY:
+        st.error("The instructor dashboard needs SQLBOMB_INSTRUCTOR_KEY on the server and a matching ?key= in the URL.")
+        return
+    analytics = get_analytics()
+    if analytics is None:
+        st.error("Progress analytics are disabled (SQLBOMB_ANALYTICS=0).")
+        return
+
+    page_start = time.perf_counter()
+    cohorts = analytics.cohorts() or [DEFAULT_COHORT]
+    requested = st.query_params.get("cohort")
+    cohort = st.selectbox("Cohort", cohorts, index=cohorts.index(requested) if requested in cohorts else 0)
+
+    # Funnel by stage
+    funnel = {row['stage']: row for row in analytics.funnel(cohort)}
+    started = funnel.get(1, {}).get('reached', 0)
+    columns = st.columns(len(STAGES) + 1)
+    columns[0].metric("Players", f"{started:,}")
+    for column, stage in zip(columns[1:], STAGES):
+        completed = funnel.get(stage, {}).get('completed', 0)
+        column.metric(f"Stage {stage} solved", f"{completed:,}",
+                      f"{completed / started:.0%} of players" if started else None, delta_color="off")
+        queries = funnel.get(stage, {}).get('queries_per_completion')
+        if queries is not None:
+            column.caption(f"{queries:.1f} queries per solve")
+
+    # Time to solve
+    st.subheader("⏱️ Time to Solve")
+    histogram = analytics.solve_times(cohort)
+    for column, stage in zip(st.columns(len(STAGES)), STAGES):
+        with column:
+            st.markdown(f"**{STORYLINE[stage]['title']}**")
+            median = histogram_median(histogram[stage])
+            st.caption(f"Median about {format_time(int(median))}" if median else "No solves yet")
+            if histogram[stage]:
+                st.bar_chart({_bucket_label(bucket): players for bucket, players in histogram[stage]})
+
+    # Common wrong queries
+    st.subheader("❌ Most Common Wrong Queries")
+    for tab, stage in zip(st.tabs([f"Stage {stage}" for stage in STAGES]), STAGES):
+        with tab:
+            wrong = analytics.common_wrong_queries(cohort, stage)
+            if wrong:
+                st.dataframe(wrong, use_container_width=True)
+            else:
+                st.info("No wrong queries recorded yet.")
+
+    # Struggling players
+    st.subheader("🆘 Struggling Players")
+    struggling = analytics.struggling_players(cohort)
+    if struggling:
+        st.dataframe(struggling, use_container_width=True)
+    else:
+        st.info("Nobody is stuck right now.")
+
+    st.caption(f"Loaded in {(time.perf_counter() - page_start) * 1000:.1f} ms")
+
+    # Live spectator feed (players on this server process)
+    st.subheader("🔴 Live")
+    if st.toggle("Watch players live", key="watch_live"):
+        _watch_live(cohort)
@@ -1,80 +1,85 @@
 import streamlit as st
+import math
+import os
 import time  # Still needed for sleep function
-from backend.db import execute_query
-from backend.game_logic import validate_query, update_game_state
-from backend.utils import format_time
-
-# Game storyline with rich narrative
-STORYLINE = {
-    1: {
-        "title": "Stage 1: Identify the Real Bomb",
-        "description": "There are multiple bombs planted across the city. Use SQL queries to analyze the data and identify the real explosive device.",
-        "story": """Agent, this is Commander Hayes from Central Command. We've detected multiple explosive devices across the city, but our intel suggests only one is real - the others are decoys designed to mislead us.
-
-The Ace of Spades terrorist cell is known for their signature bomb design. Their devices always have cutting-edge components with high signal strength and battery levels. They also use a consistent frequency pattern to ensure detonation, and each bomb has a unique device signature code.
-
-Most importantly, their bombs are always maintained right before deployment - usually within 24 hours. The timestamp in our database will help you identify when each bomb was last serviced.
-
-Your mission is to find the real bomb and save the city.""",
-        "hint": "INTELLIGENCE REPORT #A-7: Our bomb squad technicians report that the Ace of Spades' real bombs always have signal strength above 95, battery levels above 90, and a perfectly consistent frequency pattern (all values identical). Their device signatures typically start with 'B9Z'. Check maintenance logs for recent activity - likely within the last day or two."
-    },
-    2: {
-        "title": "Stage 2: Defuse the Bomb",
-        "description": "You've found the bomb! Now analyze its components to discover the defusal passcode.",
-        "story": """Excellent work locating the real bomb, Agent! Our EOD (Explosive Ordnance Disposal) team is on site, but they need your help to safely defuse the device.
-
-The bomb has multiple components, but our specialists believe the deactivation mechanism is connected to either the detonator or the main circuit board. Each component has an activation code, but only one will safely disarm the bomb.
-
-The Ace of Spades always uses premium materials for their critical components - typically titanium or gold for the parts that control deactivation. The other components are made of cheaper materials to save costs.
-
-Find the defusal code hidden in the activation_code field of the critical component to safely disarm the bomb!""",
-        "hint": "FIELD REPORT #C-12: I've analyzed the bomb's construction. Look for components made of either titanium or gold - those are the high-value parts. The defusal code will be in the activation_code field of either the Detonator or Circuit component. Be precise - entering the wrong code could trigger immediate detonation."
-    },
-    3: {
-        "title": "Stage 3: Find the Culprit",
-        "description": "The bomb has technical fingerprints. Trace them back to the suspect using maintenance records.",
-        "story": """The bomb is defused! Great work, Agent. Now we need to catch whoever planted it before they escape the city.
-
-Each bomb in the Ace of Spades' arsenal requires specialized knowledge to install. Our database contains access logs that record who interacted with each bomb and what actions they performed.
-
-We believe the person who performed the 'Installation' action on our target bomb is the culprit. Cross-reference the access logs with our suspect database to identify who we're looking for.
-
-This is our chance to finally bring a key member of the Ace of Spades to justice. Find the name of the person responsible for planting the bomb at the Airport.""",
-        "hint": "CONFIDENTIAL MEMO #F-23: The access_logs table contains records of all interactions with the bombs. The action_performed field will show 'Installation' for the person who planted the device. You'll need to join the suspects table with access_logs and filter for the bomb_id you identified in Stage 1. The suspect's name is what we need to make an arrest."
-    }
-}
-
-# Advanced sample queries that teach SQL concepts without revealing solutions
-SAMPLE_QUERIES = {
-    1: "-- Finding patterns in data\nSELECT location, signal_strength, battery_level, frequency_pattern\nFROM bombs\nWHERE signal_strength > 80 AND battery_level > 60\nORDER BY signal_strength DESC;",
-    2: "-- Analyzing relationships between entities\nSELECT bc.component_name, bc.material, bc.activation_code\nFROM bomb_components bc\nJOIN bombs b ON bc.bomb_id = b.bomb_id\nWHERE b.location = 'Train Station'\nAND bc.material IN ('Steel', 'Copper');",
-    3: "-- Complex multi-table join with filtering\nSELECT s.name, s.access_level, a.action_performed, b.location\nFROM suspects s\nJOIN access_logs a ON s.suspect_id = a.suspect_id\nJOIN bombs b ON a.bomb_id = b.bomb_id\nWHERE s.access_level >= 3\nAND a.access_time > '2025-03-01'\nORDER BY a.access_time DESC;"
-}
-
-# Character profiles to enhance the storyline
-CHARACTERS = {
-    "commander": {
-        "name": "Commander Hayes",
-        "role": "Your mission director at Central Command",
-        "description": "A veteran intelligence officer with 25 years of experience. Known for his calm demeanor in crisis situations."
-    },
-    "tech": {
-        "name": "Dr. Eliza Chen",
-        "role": "Technical Specialist",
-        "description": "The agency's leading expert on explosive devices and database forensics. She provides technical guidance throughout your mission."
-    },
-    "field": {
-        "name": "Agent Rodriguez",
-        "role": "Field Operative",
-        "description": "Your eyes on the ground. Rodriguez is at the bomb sites, relaying information back to you as you work to solve the case."
-    },
-    "villain": {
-        "name": "The Ace of Spades",
-        "role": "Terrorist Organization",
-        "description": "A sophisticated cyber-terrorist group known for combining explosive devices with digital triggers. They've evaded capture for years."
-    }
-}
-
+from backend.game_logic import validate_query, apply_stage_match, new_game_state, get_stage_budget, run_performance_query
+from backend.session_store import get_session_store, new_player_token, SESSION_KEYS
+from backend.trace import get_recorder
+from backend.analytics import get_analytics, DEFAULT_COHORT
+from backend.spectator import get_spectator_bus
+from backend.scheduler import get_rate_limiter, RateLimited
+from backend.load_shedding import get_load_controller, submit_query, Overloaded, SHEDDING
+from backend.profiling import profile_rerun
+from backend.result_cache import cached_graded_query
+from backend.history import add_history_entry
+from backend.feedback import feedback_message
+from backend.utils import format_time, format_vm_steps
+from backend.story import STORYLINE, SAMPLE_QUERIES, CHARACTERS, VERIFICATION_QUESTIONS
+from backend.scenario import get_scenario, SCENARIO_ENGINES
+from backend.client_execution import verify_client_result
+
+# Opt-in: run standard mode queries in the player's browser (WASM SQLite)
+CLIENT_EXECUTION = os.environ.get('SQLBOMB_CLIENT_EXECUTION') == '1'
+if CLIENT_EXECUTION:
+    from frontend.browser_sql import browser_sql
+
+def _player_token():
+    """Return the player token from the URL, creating one for new players"""
+    token = st.query_params.get("player")
+    if not token:
+        token = new_player_token()
+        st.query_params["player"] = token
+    return token
+
+def _save_session():
+    """Write this player's progress to the shared session store"""
+    session = {key: st.session_state[key] for key in SESSION_KEYS if key in st.session_state}
+    get_session_store().save(_player_token(), session)
+
+def _record_action(action, stage, text, outcome, rows=None, elapsed_ms=None):
+    """Add a player action to the query trace, the instructor analytics and the live spectator feed"""
+    recorder = get_recorder()
+    if recorder is not None:
+        game_state = st.session_state.game_state
+        recorder.record(_player_token(), action, stage, text, outcome, rows, elapsed_ms,
+                        game_state.get('mode', 'standard'), game_state.get('scenario_version'))
+    _publish_action(action, stage, text, outcome, rows, elapsed_ms)
+
+    analytics = _progress_analytics()
+    if analytics is not None:
+        if action == "query":
+            analytics.record_query(_player_token(), stage, text, outcome == "completed")
+        elif action == "verify" and outcome == "correct":
+            analytics.record_stage_completion(_player_token(), stage)
+
+def _publish_action(action, stage, text, outcome, rows, elapsed_ms):
+    cohort = st.query_params.get("cohort") or DEFAULT_COHORT
+    mode = st.session_state.game_state.get('mode', 'standard')
+    if action == "query":
+        get_spectator_bus().publish("query", _player_token(), cohort, stage, mode=mode, query=text,
+                                    outcome=outcome, rows=rows, elapsed_ms=elapsed_ms)
+    elif action == "verify" and outcome == "correct":
+        get_spectator_bus().publish("stage_completed" if stage < 3 else "mission_completed",
+                                    _player_token(), cohort, stage, mode=mode)
+
+def _progress_analytics():
+    """The analytics store for standard mode play (performance challenge runs aren't counted)"""
+    if st.session_state.game_state.get('mode', 'standard') != 'standard':
+        return None
+    return get_analytics()
+
+def _start_mission():
+    """Start the mission from the landing page"""
+    st.session_state.game_state['game_started'] = True
+    analytics = _progress_analytics()
+    if analytics is not None:
+        analytics.record_start(_player_token(), st.query_params.get("cohort") or DEFAULT_COHORT)
+    get_spectator_bus().publish("start", _player_token(), st.query_params.get("cohort") or DEFAULT_COHORT, 1,
+                                mode=st.session_state.game_state.get('mode', 'standard'))
+    _save_session()
+    st.rerun()
+
+@profile_rerun
 def main_app():
     # Set page configuration for better layout
     st.set_page_config(
@@ -260,18 +265,18 @@ def main_app():
     </style>
     """, unsafe_allow_html=True)
 
+    # Restore this player's progress from the shared session store, so any
+    # app process can pick up where another one left off
+    player_token = _player_token()
+    saved_session = get_session_store().load(player_token)
+    if saved_session:
+        for key in SESSION_KEYS:
+            if key in saved_session:
+                st.session_state[key] = saved_session[key]
+
     # Initialize session state first
     if 'game_state' not in st.session_state:
-        st.session_state.game_state = {
-            'game_started': False,
-            'current_stage': 1,
-            'bomb_id': None,
-            'clues_found': [],
-            'game_completed': False,
-            'last_query_results': None,
-            'last_query': None,
-            'last_query_error': None
-        }
+        st.session_state.game_state = new_game_state()
 
     # Simple, clean header - only show on landing page
     if not st.session_state.game_state['game_started'] and not st.session_state.game_state['game_completed']:
@@ -307,8 +312,7 @@ def main_app():
         _, center_col, _ = st.columns([1, 2, 1])
         with center_col:
             if st.button("🚀 START MISSION", key="start_mission", use_container_width=True):
-                st.session_state.game_state['game_started'] = True
-                st.rerun()
+                _start_mission()
 
         # Mission briefing with storyline elements
         st.markdown("""
@@ -400,7 +404,11 @@ def main_app():
                 </tr>
                 <tr>
                     <td><b>bombs</b></td>
-                    <td>bomb_id, location, voltage_readings, last_maintained, signal_strength, battery_level, frequency_pattern, device_signature</td>
+                    <td>bomb_id, location, voltage_readings, last_maintained, signal_strength, battery_level, frequency_pattern, device_signature, maintained_epoch</td>
+                </tr>
+                <tr>
+                    <td><b>bomb_readings</b></td>
+                    <td>bomb_id, kind, seq, value</td>
                 </tr>
                 <tr>
                     <td><b>bomb_components</b></td>
@@ -408,11 +416,19 @@ def main_app():
                 </tr>
                 <tr>
                     <td><b>suspects</b></td>
-                    <td>suspect_id, name, access_level, last_login</td>
+                    <td>suspect_id, name, access_level, last_login, login_epoch</td>
                 </tr>
                 <tr>
                     <td><b>access_logs</b></td>
-                    <td>log_id, suspect_id, bomb_id, access_time, action_performed</td>
+                    <td>log_id, suspect_id, bomb_id, access_time, action_performed, access_epoch</td>
+                </tr>
+                <tr>
+                    <td><b>intel_notes</b></td>
+                    <td>note_id, suspect_id, bomb_id, noted_at, note</td>
+                </tr>
+                <tr>
+                    <td><b>intel_notes_fts</b></td>
+                    <td>note (full-text index of intel_notes, rowid = note_id)</td>
                 </tr>
             </table>
             """
@@ -423,14 +439,14 @@ def main_app():
         _, center_col, _ = st.columns([1, 2, 1])
         with center_col:
             if st.button("🚀 START MISSION", key="start_mission_bottom", use_container_width=True):
-                st.session_state.game_state['game_started'] = True
-                st.rerun()
+                _start_mission()
 
     # Game completed screen with simple dark theme
     elif st.session_state.game_state['game_completed']:
 
-        # Show balloons for celebration
-        st.balloons()
+        # Show balloons for celebration, unless the server is under load
+        if get_load_controller().policy()['extras']:
+            st.balloons()
 
         # Create a story-based mission completion screen with card theme
         st.markdown("""
@@ -526,26 +542,49 @@ def main_app():
         with center_col:
             if st.button("🔄 PLAY AGAIN", key="play_again", use_container_width=True):
                 # Reset game state
-                st.session_state.game_state = {
-                    'game_started': False,
-                    'current_stage': 1,
-                    'bomb_id': None,
-                    'clues_found': [],
-                    'game_completed': False,
-                    'last_query_results': None,
-                    'last_query': None,
-                    'last_query_error': None
-                }
+                st.session_state.game_state = new_game_state()
 
                 # Reset verification state
                 st.session_state.verification_needed = False
                 st.session_state.verification_stage = 0
                 st.session_state.verification_answer = ""
 
+                _save_session()
                 st.rerun()
 
+        # Offer the performance challenge once the standard mission is cleared
+        if st.session_state.game_state.get('mode', 'standard') == 'standard':
+            st.markdown("""
+            <div style="background-color: #343a40; padding: 15px; border-radius: 5px; border-left: 4px solid #ffd43b; margin: 20px 0; text-align: center;">
+                <h3 style="color: #ffd43b; margin-top: 0;">⚡ Performance Challenge</h3>
+                <p style="color: #f8f9fa;">Replay the mission against a database with millions of rows. Every query is measured in SQLite VM steps and time - you need the right answer <b>and</b> an efficient query to pass.</p>
+            </div>
+            """, unsafe_allow_html=True)
+            _, challenge_col, _ = st.columns([2, 1, 2])
+            with challenge_col:
+                if st.button("⚡ PERFORMANCE CHALLENGE", key="performance_challenge", use_container_width=True):
+                    with st.spinner("Preparing the large dataset..."):
+                        for budget_stage in STORYLINE:
+                            get_stage_budget(budget_stage)
+
+                    st.session_state.game_state = new_game_state(mode='performance')
+                    st.session_state.game_state['game_started'] = True
+                    st.session_state.verification_needed = False
+                    st.session_state.verification_stage = 0
+                    st.session_state.verification_answer = ""
+
+                    _save_session()
+                    st.rerun()
+
     # Gameplay
     else:
+        # At the top load level the game page is replaced by a short retry screen
+        load = get_load_controller().policy()
+        if load['level'] >= SHEDDING:
+            st.warning(f"⏳ HQ is flooded with agents right now. Retry in {math.ceil(load['retry_after'])}s, Agent.")
+            st.button("↻ Retry", key="load_retry")
+            st.stop()
+
         # Current stage info
         current_stage = st.session_state.game_state['current_stage']
         stage = STORYLINE[current_stage]
@@ -567,6 +606,16 @@ def main_app():
         # Create a progress indicator for the stage
         st.progress(current_stage / 3)  # 3 stages total
 
+        performance_mode = st.session_state.game_state.get('mode') == 'performance'
+        if performance_mode:
+            budget = get_stage_budget(current_stage, st.session_state.game_state.get('scenario_version'))
+            st.markdown(f"""
+            <div style="background-color: #343a40; padding: 10px 15px; border-radius: 5px; border-left: 4px solid #ffd43b; margin-bottom: 15px;">
+                <p style="color: #ffd43b; margin: 0;"><b>⚡ PERFORMANCE CHALLENGE</b> - budget for this stage:
+                {format_vm_steps(budget['vm_steps'])} VM steps and {budget['elapsed_ms']:.0f} ms</p>
+            </div>
+            """, unsafe_allow_html=True)
+
         # Check if verification is needed
         if st.session_state.verification_needed:
             # Create a verification form
@@ -580,22 +629,18 @@ def main_app():
             # Create verification questions based on stage
             verification_stage = st.session_state.verification_stage
 
-            if verification_stage == 1:
-                verification_question = "Which location contains the real bomb? (Enter the exact location)"
-                correct_answer = "Airport"
-            elif verification_stage == 2:
-                verification_question = "What is the defusal code for the bomb? (Enter the exact code)"
-                correct_answer = "221"
-            elif verification_stage == 3:
-                verification_question = "Who is the culprit behind the bomb? (Enter the exact name)"
-                correct_answer = "Sarah Connor"
+            verification_question = VERIFICATION_QUESTIONS[verification_stage]["question"]
+            correct_answer = VERIFICATION_QUESTIONS[verification_stage]["answer"]
 
             # Display the verification form
             verification_answer = st.text_input(verification_question, key="verification_input")
 
             # Verify button
             if st.button("VERIFY", key="verify_button", use_container_width=True):
-                if verification_answer.strip() == correct_answer:
+                is_correct = verification_answer.strip() == correct_answer
+                _record_action("verify", verification_stage, verification_answer.strip(),
+                               "correct" if is_correct else "incorrect")
+                if is_correct:
                     # Correct answer
                     st.success(f"✅ Correct! Moving to the next stage...")
 
@@ -612,6 +657,7 @@ def main_app():
 
                     # Rerun to update the UI
                     time.sleep(1)
+                    _save_session()
                     st.rerun()
                 else:
                     # Incorrect answer
@@ -742,7 +788,7 @@ def main_app():
                         st.code("-- Joining tables with relationship filters\nSELECT b.location, bc.component_name, bc.material\nFROM bombs b\nJOIN bomb_components bc ON b.bomb_id = bc.bomb_id\nWHERE bc.material IN ('Titanium', 'Gold')\nORDER BY b.signal_strength DESC;", language="sql")
 
                     if current_stage >= 3:
-                        st.code("-- Complex multi-table join with time filtering\nSELECT s.name, a.action_performed, b.location, a.access_time\nFROM suspects s\nJOIN access_logs a ON s.suspect_id = a.suspect_id\nJOIN bombs b ON a.bomb_id = b.bomb_id\nWHERE a.action_performed = 'Installation'\nAND a.access_time > '2025-03-01'\nORDER BY a.access_time DESC;", language="sql")
+                        st.code("-- Complex multi-table join with time filtering\nSELECT s.name, a.action_performed, b.location, a.access_time\nFROM suspects s\nJOIN access_logs a ON s.suspect_id = a.suspect_id\nJOIN bombs b ON a.bomb_id = b.bomb_id\nWHERE a.action_performed = 'Installation'\nAND a.access_epoch > unixepoch('2025-03-01')\nORDER BY a.access_epoch DESC;", language="sql")
 
             # SCHEMA TAB - Contains database schema information
             with schema_tab:
@@ -754,7 +800,11 @@ def main_app():
                     </tr>
                     <tr>
                         <td><b>bombs</b></td>
-                        <td>bomb_id, location, voltage_readings, last_maintained, signal_strength, battery_level, frequency_pattern, device_signature</td>
+                        <td>bomb_id, location, voltage_readings, last_maintained, signal_strength, battery_level, frequency_pattern, device_signature, maintained_epoch</td>
+                    </tr>
+                    <tr>
+                        <td><b>bomb_readings</b></td>
+                        <td>bomb_id, kind, seq, value</td>
                     </tr>
                     <tr>
                         <td><b>bomb_components</b></td>
@@ -762,11 +812,19 @@ def main_app():
                     </tr>
                     <tr>
                         <td><b>suspects</b></td>
-                        <td>suspect_id, name, access_level, last_login</td>
+                        <td>suspect_id, name, access_level, last_login, login_epoch</td>
                     </tr>
                     <tr>
                         <td><b>access_logs</b></td>
-                        <td>log_id, suspect_id, bomb_id, access_time, action_performed</td>
+                        <td>log_id, suspect_id, bomb_id, access_time, action_performed, access_epoch</td>
+                    </tr>
+                    <tr>
+                        <td><b>intel_notes</b></td>
+                        <td>note_id, suspect_id, bomb_id, noted_at, note</td>
+                    </tr>
+                    <tr>
+                        <td><b>intel_notes_fts</b></td>
+                        <td>note (full-text index of intel_notes, rowid = note_id)</td>
                     </tr>
                 </table>
                 """
@@ -777,6 +835,10 @@ def main_app():
                 <div style="background-color: #343a40; padding: 15px; border-radius: 5px; margin-top: 15px;">
                     <h3 style="color: #4dabf7; margin-top: 0;">Table Relationships</h3>
                     <pre style="color: #f8f9fa; background-color: #212529; padding: 10px; border-radius: 5px;">
+bomb_readings
+  ↑
+  | bomb_id
+  ↓
 bombs
   ↑
   | bomb_id
@@ -788,12 +850,21 @@ suspects
   | suspect_id
   ↓
 access_logs → bombs (via bomb_id)
+
+intel_notes → suspects, bombs
+intel_notes_fts.rowid = intel_notes.note_id
                     </pre>
                 </div>
                 """, unsafe_allow_html=True)
 
+                # The list functions are only registered on SQLite connections (see backend.sql_functions)
+                scenario = 'large' if performance_mode else 'standard'
+                list_functions = ("" if SCENARIO_ENGINES[scenario] == 'duckdb' else
+                                  "<li><b>List functions:</b> list_count, list_min, list_max, list_avg, list_stddev "
+                                  "of a comma-separated column, and the stddev() aggregate</li>")
+
                 # Data types explanation
-                st.markdown("""
+                st.markdown(f"""
                 <div style="background-color: #343a40; padding: 15px; border-radius: 5px; margin-top: 15px;">
                     <h3 style="color: #4dabf7; margin-top: 0;">Data Types</h3>
                     <ul style="color: #f8f9fa;">
@@ -801,8 +872,11 @@ access_logs → bombs (via bomb_id)
                         <li><b>location, name, material, action_performed:</b> TEXT</li>
                         <li><b>signal_strength, battery_level, access_level:</b> INTEGER</li>
                         <li><b>last_maintained, last_login, access_time:</b> TEXT (Date/Time format: 'YYYY-MM-DD HH:MM')</li>
-                        <li><b>frequency_pattern, voltage_readings:</b> TEXT (Comma-separated values)</li>
+                        <li><b>maintained_epoch, login_epoch, access_epoch:</b> INTEGER (the same times in Unix epoch seconds, indexed - compare with unixepoch('2025-03-08'))</li>
+                        <li><b>frequency_pattern, voltage_readings:</b> TEXT (Comma-separated values, also one row per value in bomb_readings with kind 'frequency' or 'voltage')</li>
+                        {list_functions}
                         <li><b>device_signature, activation_code:</b> TEXT (Alphanumeric codes)</li>
+                        <li><b>Full-text search:</b> WHERE intel_notes_fts MATCH 'alias' (also 'ali*' or '"service corridor"') is much faster than note LIKE '%alias%'</li>
                     </ul>
                 </div>
                 """, unsafe_allow_html=True)
@@ -816,17 +890,59 @@ access_logs → bombs (via bomb_id)
             </div>
             """, unsafe_allow_html=True)
 
-            # SQL editor with syntax highlighting - make it larger
-            query = st.text_area(
-                "Enter your SQL query:",
-                height=200,
-                placeholder=SAMPLE_QUERIES[current_stage],
-                key="sql_query_input",
-                help="Write a SQL query to solve the current mission stage"
-            )
-
-            # Execute button - make it more prominent
-            execute_btn = st.button("⚡ EXECUTE QUERY", key="execute_query_button", use_container_width=True)
+            client_payload = None
+            if CLIENT_EXECUTION and not performance_mode:
+                # The query runs in the browser; only a summary of the result comes back
+                _, scenario_path = get_scenario('standard', version=st.session_state.game_state.get('scenario_version'))
+                # A query picked from the history is loaded into the browser's editor
+                client_payload = browser_sql(scenario_path, current_stage, key="browser_sql",
+                                             default_query=st.session_state.get('browser_sql_query', ''))
+                query = ""
+                execute_btn = False
+            else:
+                # SQL editor with syntax highlighting - make it larger
+                query = st.text_area(
+                    "Enter your SQL query:",
+                    height=200,
+                    placeholder=SAMPLE_QUERIES[current_stage],
+                    key="sql_query_input",
+                    help="Write a SQL query to solve the current mission stage"
+                )
+
+                # Execute button - make it more prominent
+                execute_btn = st.button("⚡ EXECUTE QUERY", key="execute_query_button", use_container_width=True)
+
+            # Query history - re-running an entry takes the same path as EXECUTE,
+            # so it is served from the shared result cache when possible. With
+            # client execution the entry goes to the browser's editor instead.
+            history = st.session_state.game_state.get('query_history') or []
+            if history:
+                with st.expander(f"🕘 Query History ({len(history)})"):
+                    for index, entry in enumerate(reversed(history)):
+                        text_col, button_col = st.columns([5, 1])
+                        with text_col:
+                            preview = " ".join(entry['query'].split())
+                            if len(preview) > 80:
+                                preview = preview[:77] + "..."
+                            st.markdown(f"`{preview}`  \n<span style='color: #adb5bd;'>Stage {entry['stage']} · {entry['rows']} rows · {entry['elapsed_ms']:.1f} ms</span>", unsafe_allow_html=True)
+                        with button_col:
+                            if entry.get('truncated'):
+                                st.button("↻", key=f"history_rerun_{index}", disabled=True,
+                                          help="Too long to keep in full, so it can't be run again from here")
+                            elif CLIENT_EXECUTION and not performance_mode:
+                                if st.button("↻", key=f"history_rerun_{index}", help="Load this query into the editor"):
+                                    st.session_state['browser_sql_query'] = entry['query']
+                                    st.rerun()
+                            elif st.button("↻", key=f"history_rerun_{index}", help="Run this query again"):
+                                query = entry['query']
+                                execute_btn = True
+
+            # Per-session rate limit - a throttled click doesn't touch the database
+            if execute_btn:
+                retry_after = get_rate_limiter().try_acquire(_player_token())
+                if retry_after:
+                    execute_btn = False
+                    st.warning(f"⏳ Terminal cooling down. Try again in {math.ceil(retry_after)}s, Agent.")
 
             # Display previous query results if they exist
             if st.session_state.game_state.get('last_query') and st.session_state.game_state.get('last_query_results') is not None:
@@ -852,12 +968,36 @@ access_logs → bombs (via bomb_id)
                         # Display results in a styled dataframe
                         st.markdown("<p style='color: #f8f9fa;'><b>Results:</b></p>", unsafe_allow_html=True)
                         st.dataframe(data=results, use_container_width=True, height=400)
+                        if st.session_state.game_state.get('last_query_truncated'):
+                            st.caption(f"Showing the first {len(results)} rows. Add a WHERE clause or LIMIT to narrow your results.")
                     except Exception as e:
                         st.error(f"Error displaying results: {str(e)}")
                         st.json(results)  # Fallback to JSON display
                 else:
                     st.info("Query executed successfully, but returned no results.")
 
+                # How close a query that missed came to the answer (counts and column names, no values)
+                feedback = st.session_state.game_state.get('last_query_feedback')
+                if feedback:
+                    st.markdown(f"""
+                    <div style="background-color: #2b3035; padding: 10px; border-radius: 5px; margin-top: 15px; border-left: 4px solid #ffd43b;">
+                        <p style="color: #ffd43b; margin: 0;"><b>🧭 How close:</b> {feedback_message(feedback)}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+                # Show the query cost against the canonical solution
+                cost = st.session_state.game_state.get('last_query_cost')
+                budget = st.session_state.game_state.get('last_query_budget')
+                if performance_mode and cost and budget:
+                    verdict_color = "#69db7c" if st.session_state.game_state.get('last_query_within_budget') else "#ff6b6b"
+                    st.markdown(f"""
+                    <div style="background-color: #2b3035; padding: 10px; border-radius: 5px; margin-top: 15px; border-left: 4px solid {verdict_color};">
+                        <p style="color: #f8f9fa; margin: 0;"><b>Query cost:</b> {format_vm_steps(cost['vm_steps'])} VM steps, {cost['elapsed_ms']:.1f} ms{" (interrupted)" if cost['aborted'] else ""}</p>
+                        <p style="color: #adb5bd; margin: 0;">Canonical query: {format_vm_steps(budget['canonical_vm_steps'])} VM steps, {budget['canonical_elapsed_ms']:.1f} ms</p>
+                        <p style="color: {verdict_color}; margin: 0;">Budget: {format_vm_steps(budget['vm_steps'])} VM steps, {budget['elapsed_ms']:.0f} ms</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+
                 # Display error if there was one
                 if st.session_state.game_state.get('last_query_error'):
                     st.markdown("""
@@ -876,11 +1016,46 @@ access_logs → bombs (via bomb_id)
                     st.session_state.game_state['last_query'] = query
                     st.session_state.game_state['last_query_error'] = None
 
-                    # Execute the query
-                    results = execute_query(query)
+                    # Execute the query and grade the rows as they are fetched
+                    query_start = time.perf_counter()
+                    # Queries run on the shared worker pool, taking turns between players,
+                    # with lower limits while the server is under load
+                    policy = get_load_controller().admit()
+                    if performance_mode:
+                        # Large dataset, graded on cost as well as the answer
+                        results, matched_row, truncated, cost, budget, within_budget = submit_query(
+                            _player_token(), policy, run_performance_query, query, current_stage,
+                            st.session_state.game_state.get('scenario_version')
+                        ).result()
+                        st.session_state.game_state['last_query_cost'] = cost
+                        st.session_state.game_state['last_query_budget'] = budget
+                        st.session_state.game_state['last_query_within_budget'] = within_budget
+                        if matched_row is not None and not within_budget:
+                            st.session_state.game_state['last_query_error'] = "Right answer, but the query is over budget. Try to make it cheaper!"
+                            matched_row = None
+                        # Costs are measured on every run, so these results are never cached
+                        result_ref = None
+                    else:
+                        results, matched_row, truncated, cost, result_ref = submit_query(
+                            _player_token(), policy, cached_graded_query, query, current_stage,
+                            version=st.session_state.game_state.get('scenario_version')
+                        ).result()
+                    query_ms = (time.perf_counter() - query_start) * 1000
+                    if cost.get('rejected') or cost.get('capped'):
+                        # Not run at all (the estimate explains what makes it so expensive), or a
+                        # recursive query that didn't stop
+                        st.session_state.game_state['last_query_error'] = cost['error']
+
+                    # Remember the query (not its rows) in the session's bounded history
+                    add_history_entry(
+                        st.session_state.game_state.setdefault('query_history', []),
+                        query, current_stage, len(results), cost['elapsed_ms'], result_ref
+                    )
 
                     # Store the results in session state
                     st.session_state.game_state['last_query_results'] = results
+                    st.session_state.game_state['last_query_truncated'] = truncated
+                    st.session_state.game_state['last_query_feedback'] = cost.get('feedback')
 
                     if results:
                         # Create a success message
@@ -890,13 +1065,17 @@ access_logs → bombs (via bomb_id)
                         </div>
                         """, unsafe_allow_html=True)
 
-                        # Update game state based on query results
-                        stage_completed = update_game_state(
+                        # Update game state based on the row graded during the fetch
+                        stage_completed = apply_stage_match(
                             current_stage,
-                            results,
+                            matched_row,
                             st.session_state.game_state
                         )
 
+                        _record_action("query", current_stage, query,
+                                       "completed" if stage_completed else "rows",
+                                       len(results), query_ms)
+
                         # Handle stage completion with verification step
                         if stage_completed:
                             # Set verification needed flag
@@ -905,21 +1084,58 @@ access_logs → bombs (via bomb_id)
 
                             # Show verification form
                             st.success(f"🎯 You've found something important! Please verify your findings to proceed.")
+                            _save_session()
                             st.rerun()
                     else:
+                        _record_action("query", current_stage, query, "empty", 0, query_ms)
                         st.info("Query executed successfully, but returned no results.")
                 else:
+                    _record_action("query", current_stage, query, "invalid")
                     st.error("Invalid query. Only SELECT statements are allowed, and certain operations are restricted for security.")
+            except Overloaded as e:
+                st.session_state.game_state['last_query_error'] = f"⏳ HQ is flooded with queries. Try again in {math.ceil(e.retry_after)}s."
+            except RateLimited as e:
+                st.session_state.game_state['last_query_error'] = f"⏳ Terminal busy with your earlier queries. Try again in {math.ceil(e.retry_after)}s."
             except Exception as e:
                 error_msg = str(e)
+                _record_action("query", current_stage, query, "error")
                 st.error(f"Error executing query: {error_msg}")
                 # Store the error in session state
                 st.session_state.game_state['last_query_results'] = []
+                st.session_state.game_state['last_query_feedback'] = None
                 st.session_state.game_state['last_query_error'] = error_msg
 
             # Force a rerun to update the display
+            _save_session()
             st.rerun()
 
+        # Grade a result reported by the browser - the component keeps its last
+        # value across reruns, so each execution is graded once by its nonce
+        if client_payload and client_payload.get('nonce') != st.session_state.game_state.get('last_client_nonce'):
+            st.session_state.game_state['last_client_nonce'] = client_payload.get('nonce')
+            query = str(client_payload.get('query', ''))
+            matched_row, error = verify_client_result(current_stage, client_payload, scenario_path)
+            if error:
+                _record_action("query", current_stage, query, "invalid")
+                st.error(error)
+            else:
+                row_count = int(client_payload.get('row_count') or 0)
+                elapsed_ms = float(client_payload.get('elapsed_ms') or 0.0)
+                add_history_entry(
+                    st.session_state.game_state.setdefault('query_history', []),
+                    query, current_stage, row_count, elapsed_ms, None
+                )
+                stage_completed = apply_stage_match(current_stage, matched_row, st.session_state.game_state)
+                _record_action("query", current_stage, query,
+                               "completed" if stage_completed else ("rows" if row_count else "empty"),
+                               row_count, elapsed_ms)
+                if stage_completed:
+                    st.session_state.verification_needed = True
+                    st.session_state.verification_stage = current_stage
+                    _save_session()
+                    st.rerun()
+            _save_session()
+
         # No game over condition needed since we removed the timer
 
 
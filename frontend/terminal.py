@@ -0,0 +1,184 @@
+"""
+Terminal version of the SQL Bomb Defusal Game.
+
+Usage: python -m frontend.terminal [--mode performance]
+
+Plays the same three stages as the Streamlit app straight through
+backend.game_logic and backend.db. Streamlit and pandas are never imported,
+so the game starts in a fraction of a second.
+"""
+import argparse
+import sys
+import textwrap
+
+from backend.db import execute_graded_query
+from backend.feedback import feedback_message
+from backend.game_logic import validate_query, apply_stage_match, new_game_state, run_performance_query, get_answer_key
+from backend.query_cost import MAX_ESTIMATED_COST
+from backend.scenario import get_scenario
+from backend.utils import format_vm_steps
+from backend.story import STORYLINE, SAMPLE_QUERIES, VERIFICATION_QUESTIONS, SCHEMA_TABLES
+
+# Result tables show at most this many rows and this many characters per cell
+MAX_TABLE_ROWS = 25
+MAX_CELL_WIDTH = 30
+
+HELP = """Commands:
+  <SQL ending with ;>  run a query (it can span several lines)
+  :story               show the mission briefing again
+  :hint                show the intelligence hint for this stage
+  :sample              show an example query
+  :schema              show the database tables
+  :quit                leave the game"""
+
+def _wrap(text):
+    return "\n\n".join(textwrap.fill(paragraph, width=88) for paragraph in text.split("\n\n"))
+
+def format_table(results, max_rows=MAX_TABLE_ROWS):
+    """Render result rows (dicts or tuples) as a plain-text table"""
+    if not results:
+        return "(no rows)"
+
+    if isinstance(results[0], dict):
+        columns = list(results[0].keys())
+        rows = [[row.get(col) for col in columns] for row in results[:max_rows]]
+    else:
+        columns = [f"col{i + 1}" for i in range(len(results[0]))]
+        rows = [list(row) for row in results[:max_rows]]
+
+    def cell(value):
+        text = "NULL" if value is None else str(value)
+        return text if len(text) <= MAX_CELL_WIDTH else text[:MAX_CELL_WIDTH - 3] + "..."
+
+    cells = [[cell(value) for value in row] for row in rows]
+    widths = [max([len(col)] + [len(row[i]) for row in cells]) for i, col in enumerate(columns)]
+    line = "+-" + "-+-".join("-" * w for w in widths) + "-+"
+
+    out = [line, "| " + " | ".join(col.ljust(w) for col, w in zip(columns, widths)) + " |", line]
+    out += ["| " + " | ".join(value.ljust(w) for value, w in zip(row, widths)) + " |" for row in cells]
+    out.append(line)
+    if len(results) > max_rows:
+        out.append(f"... {len(results) - max_rows} more rows")
+    return "\n".join(out)
+
+def _read_query(prompt):
+    """Read a command or a (possibly multi-line) SQL query ending with ';'"""
+    lines = []
+    while True:
+        line = input(prompt if not lines else "   ...> ")
+        if not lines and line.strip().startswith(":"):
+            return line.strip()
+        lines.append(line)
+        if line.rstrip().endswith(";"):
+            return "\n".join(lines).strip()
+
+def _show_stage(stage):
+    info = STORYLINE[stage]
+    print(f"\n=== {info['title']} ===\n")
+    print(_wrap(info['story']))
+    print(f"\nObjective: {info['description']}\n")
+
+def _verify(stage):
+    """Ask the verification question until the player gets it right"""
+    question = VERIFICATION_QUESTIONS[stage]
+    print("\n🔍 VERIFICATION REQUIRED - based on your query results, what did you discover?")
+    while True:
+        answer = input(f"{question['question']}\n> ").strip()
+        if answer == question['answer']:
+            print("✅ Correct!")
+            return
+        print("❌ Incorrect. Please review your query results and try again.")
+
+def play(mode='standard'):
+    game_state = new_game_state(mode)
+    game_state['game_started'] = True
+
+    print("💣 SQL Bomb Defusal Challenge - use your SQL skills to save the city!")
+    if mode == 'performance':
+        print("⚡ PERFORMANCE CHALLENGE: queries must also stay within the stage's cost budget.")
+    print(HELP)
+
+    while not game_state['game_completed']:
+        stage = game_state['current_stage']
+        _show_stage(stage)
+
+        while True:
+            command = _read_query(f"stage{stage}> ")
+            if command == ":quit":
+                return
+            if command == ":story":
+                _show_stage(stage)
+                continue
+            if command == ":hint":
+                print(_wrap(STORYLINE[stage]['hint']))
+                continue
+            if command == ":sample":
+                print(SAMPLE_QUERIES[stage])
+                continue
+            if command == ":schema":
+                for table, columns in SCHEMA_TABLES.items():
+                    print(f"  {table}: {', '.join(columns)}")
+                continue
+            if command.startswith(":"):
+                print(HELP)
+                continue
+
+            if not validate_query(command):
+                print("Invalid query. Only SELECT statements are allowed, and certain operations are restricted for security.")
+                continue
+
+            if mode == 'performance':
+                results, matched_row, truncated, cost, budget, within_budget = run_performance_query(
+                    command, stage, game_state['scenario_version']
+                )
+                if not cost.get('rejected'):
+                    print(f"Cost: {format_vm_steps(cost['vm_steps'])} VM steps, {cost['elapsed_ms']:.1f} ms "
+                          f"(canonical {format_vm_steps(budget['canonical_vm_steps'])} steps, budget {format_vm_steps(budget['vm_steps'])} steps "
+                          f"and {budget['elapsed_ms']:.0f} ms)")
+                if matched_row is not None and not within_budget:
+                    print("Right answer, but the query is over budget. Try to make it cheaper!")
+                    matched_row = None
+            else:
+                engine, db_path = get_scenario('standard', version=game_state['scenario_version'])
+                results, matched_row, truncated, cost = execute_graded_query(
+                    command, stage, db_path=db_path, engine=engine, max_estimated_cost=MAX_ESTIMATED_COST,
+                    answer_key=get_answer_key(stage, version=game_state['scenario_version'])
+                )
+
+            if cost.get('rejected') or cost.get('capped'):
+                print(_wrap(cost['error']))
+                continue
+
+            print(format_table(results))
+            if truncated:
+                print(f"(showing the first {len(results)} rows)")
+
+            if apply_stage_match(stage, matched_row, game_state):
+                print("🎯 You've found something important!")
+                _verify(stage)
+                break
+            if cost.get('feedback'):
+                print(_wrap(feedback_message(cost['feedback'])))
+
+        if stage < 3:
+            game_state['current_stage'] += 1
+        else:
+            game_state['game_completed'] = True
+
+    print("\n🎉 Mission Accomplished! The bomb has been defused and the city is safe!")
+    for clue in game_state['clues_found']:
+        print(f"  ✓ {clue}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the SQL Bomb Defusal Game in the terminal")
+    parser.add_argument('--mode', choices=['standard', 'performance'], default='standard')
+    args = parser.parse_args()
+
+    try:
+        play(args.mode)
+    except (EOFError, KeyboardInterrupt):
+        print()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -72,3 +72,8 @@ def init_database():
 
 if __name__ == "__main__":
     init_database()
+
+    # Optionally build the large dataset used by the performance challenge
+    if "--large" in sys.argv:
+        from backend.scenario import build_large_database
+        build_large_database()